@@ -5,17 +5,51 @@ import plotly.express as px
 import dash
 from dash import dcc, html, Input, Output, State
 import dash_bootstrap_components as dbc
-from flask import Flask, request, jsonify, render_template_string, send_from_directory
+from flask import Flask, request, jsonify, render_template_string, send_from_directory, send_file
 from flask_restful import Api, Resource
 from flasgger import Swagger
 from flasgger.utils import swag_from
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 import time
 import random
 import datetime
+import sys
+import hashlib
+import threading
+import re
+import struct
+import queue
+import argparse
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 本機 Parquet 快照（由 mapping/article_snapshot.py 定期同步）；未安裝 pyarrow 時直接查詢資料庫
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "mapping"))
+try:
+    import article_snapshot
+except ImportError:
+    article_snapshot = None
+
+# 搜尋準確度分析用的商品標題字元索引（取代逐次 REGEXP 比對）與每次爬取的準確度快照
+import accuracy_index
+import accuracy_snapshots
+# momo / PChome 搜尋結果的多頁爬取（JSON / HTML 優先，必要時才以瀏覽器讀取）
+import product_search
+
+# mapping/ 的圖表腳本（以 Agg backend 繪圖），供即時繪製圖表 API 使用
+try:
+    import matplotlib
+    import render_charts
+except ImportError:
+    render_charts = None
+
+# 全文檢索索引（mapping/search_index.py，需 jieba）
+try:
+    import search_index
+except ImportError:
+    search_index = None
 
 
 ##############################################
@@ -414,31 +448,236 @@ PICTURE_DIRS = [
 ]
 
 
+# 圖片目錄索引：以 mtime 掃描更新，避免每個請求都 listdir / 逐一探測檔案
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif")
+PICTURE_VARIANT_DIR = "./cache/pictures"   # 預先產生的縮圖與 WebP
+PICTURE_RESCAN_INTERVAL = 30               # 兩次掃描目錄的最短間隔（秒）
+PICTURE_THUMBNAIL_SIZE = (320, 320)
+PICTURE_MAX_AGE = 3600
+PICTURE_PAGE_SIZE = 50
+
+# 依檔名前綴判斷圖表類型（檔名由 mapping/ 底下的腳本產生）
+PICTURE_CHART_TYPES = [
+    (re.compile(r"^score_table_"), "score_table"),
+    (re.compile(r"^sentiment_analysis_pie_chart_"), "donut"),
+    (re.compile(r"^sentiment_analysis_time_series_"), "yearly_average"),
+    (re.compile(r"^sentiment_analysis_by_year_"), "scatter"),
+    (re.compile(r"^Quarter_Stats_"), "quarterly"),
+    (re.compile(r"_bar_chart_\d{8}_\d{6}"), "bar_chart"),
+    (re.compile(r"^(PChome|momo)_\d{8}_\d{6}"), "word_cloud"),
+]
+PICTURE_TIMESTAMP = re.compile(r"(\d{8}_\d{6})")
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None  # 未安裝 Pillow 時不提供縮圖與 WebP，PNG / GIF 仍可讀取尺寸
+
+
+def read_image_size(path):
+    """讀取圖片寬高；PNG / GIF 直接解析檔頭，其餘格式使用 Pillow"""
+    with open(path, "rb") as f:
+        header = f.read(26)
+    if header[:8] == b"\x89PNG\r\n\x1a\n":
+        return struct.unpack(">II", header[16:24])
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack("<HH", header[6:10])
+    if Image is not None:
+        try:
+            with Image.open(path) as image:
+                return image.size
+        except OSError:
+            pass
+    return None, None
+
+
+class PictureCatalog:
+    """PICTURE_DIRS 底下圖片的索引：檔名、大小、尺寸、圖表類型、時間戳
+
+    目錄的 mtime 有變化（新增 / 刪除檔案）或超過掃描間隔時才重新掃描，
+    只有新增或修改過的檔案會重新讀取尺寸並在背景產生縮圖與 WebP。
+    """
+
+    def __init__(self, directories):
+        self.directories = directories
+        self.entries = {}
+        self._dir_mtimes = {}
+        self._last_scan = 0
+        self._lock = threading.Lock()
+        self._variant_executor = ThreadPoolExecutor(max_workers=2)
+
+    def refresh(self, force=False):
+        with self._lock:
+            now = time.time()
+            dir_mtimes = {d: os.stat(d).st_mtime for d in self.directories if os.path.isdir(d)}
+            if not force and dir_mtimes == self._dir_mtimes and now - self._last_scan < PICTURE_RESCAN_INTERVAL:
+                return
+            self._dir_mtimes = dir_mtimes
+            self._last_scan = now
+
+            entries = {}
+            for directory in dir_mtimes:
+                for item in os.scandir(directory):
+                    if not item.is_file() or not item.name.lower().endswith(IMAGE_EXTENSIONS):
+                        continue
+                    if item.name in entries:  # 同名檔案以 PICTURE_DIRS 中較前面的目錄為準
+                        continue
+                    stat = item.stat()
+                    previous = self.entries.get(item.name)
+                    if previous and previous["path"] == item.path and previous["mtime"] == stat.st_mtime:
+                        entries[item.name] = previous
+                        continue
+                    entries[item.name] = self._build_entry(item, stat)
+                    self._variant_executor.submit(self.generate_variants, entries[item.name])
+            self.entries = entries
+
+    def _build_entry(self, item, stat):
+        width, height = read_image_size(item.path)
+        chart_type = next((name for pattern, name in PICTURE_CHART_TYPES if pattern.search(item.name)), "other")
+        match = PICTURE_TIMESTAMP.search(item.name)
+        if match:
+            timestamp = datetime.datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+        else:
+            timestamp = datetime.datetime.fromtimestamp(stat.st_mtime)
+        return {
+            "name": item.name,
+            "path": item.path,
+            "size": stat.st_size,
+            "width": width,
+            "height": height,
+            "chart_type": chart_type,
+            "timestamp": timestamp.isoformat(timespec="seconds"),
+            "mtime": stat.st_mtime,
+        }
+
+    def list(self, chart_type=None, query=None, since=None, until=None):
+        """依條件篩選，新到舊排序"""
+        self.refresh()
+        entries = list(self.entries.values())
+        if chart_type:
+            entries = [e for e in entries if e["chart_type"] == chart_type]
+        if query:
+            entries = [e for e in entries if query.lower() in e["name"].lower()]
+        if since:
+            entries = [e for e in entries if e["timestamp"] >= since]
+        if until:
+            entries = [e for e in entries if e["timestamp"] <= until]
+        return sorted(entries, key=lambda e: e["timestamp"], reverse=True)
+
+    def get(self, name):
+        self.refresh()
+        entry = self.entries.get(name)
+        if entry is None or not os.path.exists(entry["path"]):
+            self.refresh(force=True)  # 檔案可能剛產生或剛被刪除
+            entry = self.entries.get(name)
+        return entry
+
+    # ---------- 縮圖 / WebP ----------
+    @staticmethod
+    def variant_path(entry, variant, image_format):
+        stem = hashlib.md5(f"{entry['path']}|{entry['mtime']}".encode("utf-8")).hexdigest()
+        return os.path.join(PICTURE_VARIANT_DIR, f"{stem}.{variant}.{image_format}")
+
+    def generate_variants(self, entry):
+        """產生縮圖（WebP / PNG）與全尺寸 WebP；已存在者略過"""
+        if Image is None:
+            return
+        os.makedirs(PICTURE_VARIANT_DIR, exist_ok=True)
+        for variant, image_format in [("thumb", "webp"), ("thumb", "png"), ("full", "webp")]:
+            self.variant(entry, variant, image_format)
+
+    def variant(self, entry, variant, image_format):
+        """回傳指定版本的檔案路徑（不存在時立即產生）；無法產生時回傳 None"""
+        if Image is None:
+            return None
+        path = self.variant_path(entry, variant, image_format)
+        if os.path.exists(path):
+            return path
+        try:
+            with Image.open(entry["path"]) as image:
+                image = image.convert("RGBA") if image.mode in ("P", "LA") else image
+                if variant == "thumb":
+                    image.thumbnail(PICTURE_THUMBNAIL_SIZE)
+                os.makedirs(PICTURE_VARIANT_DIR, exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                image.save(tmp_path, format=image_format.upper(), **({"quality": 80} if image_format == "webp" else {}))
+                os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"無法產生 {entry['name']} 的 {variant}.{image_format}：{e}")
+            return None
+        return path
+
+
+picture_catalog = PictureCatalog(PICTURE_DIRS)
+
+
 class PictureList(Resource):
     def get(self):
         """
-        列出所有圖片名稱
+        列出圖片（可分頁與篩選）
         ---
+        parameters:
+          - name: page
+            in: query
+            type: integer
+            required: false
+            description: 頁碼 (預設 1)
+          - name: per_page
+            in: query
+            type: integer
+            required: false
+            description: 每頁筆數 (預設 50，最多 500)
+          - name: chart_type
+            in: query
+            type: string
+            required: false
+            description: 圖表類型，例如 donut、yearly_average、scatter、quarterly、score_table、bar_chart、word_cloud、other
+          - name: q
+            in: query
+            type: string
+            required: false
+            description: 檔名包含的文字
+          - name: since
+            in: query
+            type: string
+            required: false
+            description: 起始時間 (ISO 格式，例如 2025-01-01)
+          - name: until
+            in: query
+            type: string
+            required: false
+            description: 結束時間 (ISO 格式)
         responses:
           200:
-            description: 返回目錄中所有圖片的檔名
+            description: 返回圖片檔名與檔案資訊（大小、尺寸、圖表類型、時間戳）
         tags:
           - 視覺化圖形彙整
         """
-        result = []
-
-        for PICTURE_DIR in PICTURE_DIRS:
-            if not os.path.exists(PICTURE_DIR):
-                continue
-
-            files = os.listdir(PICTURE_DIR)
-            image_extensions = (".png", ".jpg", ".jpeg", ".gif")
-            image_files = [f for f in files if f.lower().endswith(image_extensions)]
-            result.extend(image_files)
-        if not result:
+        try:
+            page = max(int(request.args.get("page", 1)), 1)
+            per_page = min(max(int(request.args.get("per_page", PICTURE_PAGE_SIZE)), 1), 500)
+        except ValueError:
+            return jsonify({"error": "page and per_page must be integers"}), 400
+
+        entries = picture_catalog.list(
+            chart_type=request.args.get("chart_type"),
+            query=request.args.get("q"),
+            since=request.args.get("since"),
+            until=request.args.get("until"),
+        )
+        if not entries and not picture_catalog.entries:
             return jsonify({"error": "No pictures found in all directories."}), 404
 
-        return jsonify({"pictures": result})
+        items = entries[(page - 1) * per_page: page * per_page]
+        return jsonify(
+            {
+                "pictures": [e["name"] for e in items],
+                "items": [{k: v for k, v in e.items() if k not in ("path", "mtime")} for e in items],
+                "total": len(entries),
+                "page": page,
+                "per_page": per_page,
+            }
+        )
 
 
 class Picture(Resource):
@@ -452,23 +691,373 @@ class Picture(Resource):
             type: string
             required: true
             description: 圖片檔名
+          - name: variant
+            in: query
+            type: string
+            required: false
+            enum: [full, thumb]
+            description: full 為原圖 (預設)，thumb 為縮圖
+          - name: format
+            in: query
+            type: string
+            required: false
+            enum: [webp, png]
+            description: 指定輸出格式；未指定時原圖維持原格式、縮圖為 WebP
         responses:
           200:
-            description: 直接傳回該圖片檔
+            description: 直接傳回該圖片檔（支援 If-None-Match / If-Modified-Since 條件請求）
         tags:
           - 視覺化圖形彙整        
         """
-        for picture_dir in PICTURE_DIRS:
-            file_path = os.path.join(picture_dir, filename)
-            if os.path.exists(file_path):
-                return send_from_directory(picture_dir, filename)
+        entry = picture_catalog.get(filename)
+        if entry is None:
+            return jsonify({"error": f"File not found: {filename}"}), 404
+
+        variant = request.args.get("variant", "full")
+        image_format = request.args.get("format")
+        if variant not in ("full", "thumb") or image_format not in (None, "webp", "png"):
+            return jsonify({"error": "variant must be full/thumb and format must be webp/png"}), 400
 
-        return jsonify({"error": f"File not found: {filename}"}), 404
+        path = entry["path"]
+        if variant == "thumb" or image_format == "webp" or (image_format == "png" and not path.lower().endswith(".png")):
+            path = picture_catalog.variant(entry, variant, image_format or "webp") or path
+
+        # send_file 交由 WSGI server 的 file_wrapper（sendfile）傳送，並處理 ETag / Last-Modified 條件請求
+        return send_file(os.path.abspath(path), conditional=True, max_age=PICTURE_MAX_AGE)
+
+
+##############################################
+# 2-1-3. 即時繪製圖表 API
+##############################################
+# 依目前資料即時繪圖；同樣的 (圖表, 參數, 資料版本) 只繪製一次，圖檔以 LRU 保存在磁碟
+CHART_TABLE = "judy_db"              # PTT 文章表（與 PttArticles 等 API 相同）
+CHART_CACHE_DIR = "./cache/charts"
+CHART_CACHE_MAX_FILES = 200          # 超過時刪除最久未使用的圖檔
+CHART_DATA_TTL = 60                  # 沒有本機快照時，每隔幾秒向資料庫確認一次資料版本
+CHART_MAX_AGE = 300                  # Cache-Control max-age（秒）
+CHART_DPI_RANGE = (50, 300)
+
+CHART_TYPES = {
+    # 圖表類型: (腳本檔名, 繪圖函式, 資料整理函式名稱)
+    "donut": ("Interval_Scor_ Donut_Chart.py", "plot_pie_chart", "prepare_donut_chart"),
+    "yearly_average": ("Average_scores_per_year_line_chart.py", "plot_line_chart", "prepare_yearly_average"),
+    "quarterly": ("Quarterly_frequency_line_chart.py", "plot_quarter_counts", "prepare_quarterly"),
+    "scatter": ("Score_flip_scatter_chart.py", "plot_scatter", "prepare_scatter"),
+}
+
+_chart_data = {"version": None, "df": None, "records": None, "checked_at": 0}
+_chart_data_lock = threading.Lock()
+_chart_render_lock = threading.Lock()  # pyplot 不是 thread-safe，一次只繪製一張
+
+
+def chart_data_version(conn):
+    """資料庫中圖表資料的版本：筆數、最大 id 與圖表用欄位的 CRC32 總和，資料未變動時版本不變"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT COUNT(*), MAX(id), SUM(CRC32(CONCAT_WS('|', id, keyword, article_date, sentiment_score, "
+            f"article_content IS NOT NULL))) FROM {CHART_TABLE}"
+        )
+        return ("db",) + tuple(str(value) for value in cursor.fetchone())
+
+
+def load_chart_data():
+    """回傳 {"version", "df", ...}：優先讀本機快照（state.json 變動才重讀），否則依資料庫中的資料版本重讀"""
+    with _chart_data_lock:
+        version = None
+        if article_snapshot is not None and os.path.exists(article_snapshot.STATE_PATH):
+            version = ("snapshot", os.path.getmtime(article_snapshot.STATE_PATH))
+            if _chart_data["version"] != version:
+                try:
+                    df = article_snapshot.load_table(CHART_TABLE, render_charts.SNAPSHOT_COLUMNS)
+                except FileNotFoundError:
+                    version = None
+                else:
+                    _chart_data.update(version=version, df=df, records=None)
+
+        if version is None:
+            # 每 CHART_DATA_TTL 秒最多確認一次版本；版本相同時沿用已載入的資料（快取 key 與 ETag 也不變）
+            if (_chart_data["version"] is not None and _chart_data["version"][0] != "snapshot"
+                    and time.time() - _chart_data["checked_at"] < CHART_DATA_TTL):
+                return _chart_data
+            conn = pymysql.connect(**db_config)
+            try:
+                try:
+                    version = chart_data_version(conn)
+                except pymysql.MySQLError as e:
+                    print(f"無法取得圖表資料版本，改為每 {CHART_DATA_TTL} 秒重讀：{e}")
+                    version = ("ttl", int(time.time() // CHART_DATA_TTL))
+                if _chart_data["version"] != version:
+                    df = pd.read_sql(
+                        f"SELECT id, keyword, article_date, sentiment_score, "
+                        f"article_content IS NOT NULL AS has_content FROM {CHART_TABLE}",
+                        conn,
+                    )
+                    df["sentiment_score"] = pd.to_numeric(df["sentiment_score"], errors="coerce")
+                    df["has_content"] = df["has_content"].astype(bool)
+                    _chart_data.update(version=version, df=df, records=None)
+            finally:
+                conn.close()
+            _chart_data["checked_at"] = time.time()
+
+        return _chart_data
+
+
+def chart_records(data):
+    """散佈圖使用 dict 列表，第一次需要時才轉換"""
+    with _chart_data_lock:
+        if data["records"] is None:
+            data["records"] = data["df"].to_dict("records")
+        return data["records"]
+
+
+def touch_chart_cache(path):
+    os.utime(path)  # 以修改時間記錄最後使用時間
+
+
+def evict_chart_cache():
+    files = [os.path.join(CHART_CACHE_DIR, f) for f in os.listdir(CHART_CACHE_DIR) if f.endswith(".png")]
+    if len(files) <= CHART_CACHE_MAX_FILES:
+        return
+    files.sort(key=os.path.getmtime)
+    for path in files[: len(files) - CHART_CACHE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class ChartImage(Resource):
+    def get(self, chart_type):
+        """
+        依目前資料即時繪製圖表
+        ---
+        parameters:
+          - name: chart_type
+            in: path
+            type: string
+            required: true
+            enum: [donut, yearly_average, quarterly, scatter]
+            description: 圖表類型
+          - name: dpi
+            in: query
+            type: integer
+            required: false
+            description: 解析度 (50-300，預設 100)
+          - name: keywords
+            in: query
+            type: string
+            required: false
+            description: 僅 quarterly 使用，以逗號分隔的關鍵字 (預設 PCHOME,MOMO；all 為全部)
+        responses:
+          200:
+            description: PNG 圖檔（含 ETag / Cache-Control，可用 If-None-Match 取得 304）
+          404:
+            description: 未知的圖表類型或沒有可繪製的資料
+        tags:
+          - 視覺化圖形彙整
+        """
+        if render_charts is None:
+            return jsonify({"error": "Chart rendering is not available (missing dependencies)."}), 503
+        if chart_type not in CHART_TYPES:
+            return jsonify({"error": f"Unknown chart type: {chart_type}", "chart_types": list(CHART_TYPES)}), 404
+
+        try:
+            dpi = int(request.args.get("dpi", 100))
+        except ValueError:
+            return jsonify({"error": "dpi must be an integer"}), 400
+        dpi = min(max(dpi, CHART_DPI_RANGE[0]), CHART_DPI_RANGE[1])
+        keywords = request.args.get("keywords", "PCHOME,MOMO")
+
+        script, function_name, prepare_name = CHART_TYPES[chart_type]
+        try:
+            data = load_chart_data()
+        except pymysql.MySQLError as e:
+            return jsonify({"error": str(e)}), 500
+
+        selected = None
+        if chart_type == "quarterly" and keywords.lower() != "all":
+            selected = [k.strip().upper() for k in keywords.split(",") if k.strip()]
+        # 快取 key = 圖表類型 + 參數 + 資料版本；只比對 key，命中時不必整理資料或計算資料 hash。
+        # ETag 同為此 key（同一資料版本、同樣參數的圖），而非圖檔內容的 hash
+        key = hashlib.sha256(
+            f"{chart_type}|dpi={dpi}|keywords={'all' if selected is None else ','.join(selected)}"
+            f"|version={data['version']}".encode("utf-8")
+        ).hexdigest()
+        os.makedirs(CHART_CACHE_DIR, exist_ok=True)
+        path = os.path.join(CHART_CACHE_DIR, f"{key}.png")
+
+        if os.path.exists(path):
+            touch_chart_cache(path)
+        else:
+            with _chart_render_lock:
+                if not os.path.exists(path):
+                    df = data["df"]
+                    if chart_type == "quarterly":
+                        table = render_charts.load_chart_module(script).count_by_quarter(df, selected)
+                        kwargs = {"table": table} if not table.empty else None
+                    else:
+                        records = chart_records(data) if chart_type == "scatter" else None
+                        kwargs = getattr(render_charts, prepare_name)(df, records, None)
+                    if kwargs is None:
+                        return jsonify({"error": "No data to plot."}), 404
+
+                    tmp_path = os.path.join(CHART_CACHE_DIR, f"{key}.tmp.png")
+                    with matplotlib.rc_context({"savefig.dpi": dpi}):
+                        render_charts.render_chart(script, function_name, dict(kwargs, filename=tmp_path))
+                    os.replace(tmp_path, path)
+                    evict_chart_cache()
+
+        response = send_file(os.path.abspath(path), mimetype="image/png", etag=key, max_age=CHART_MAX_AGE)
+        response.cache_control.public = True
+        return response
+
+
+##############################################
+# 2-1-4. 全文檢索 API
+##############################################
+# PTT / Dcard / 平台公告文章的 BM25 全文檢索；索引為本機 SQLite FTS5，由寫入端（filtered_news、Dcard 爬蟲）提交後同步，
+# 收到查詢時也會在背景增量同步（新增、修改與刪除的文章）
+SEARCH_SYNC_INTERVAL = 60  # 距上次同步超過幾秒才再同步（只取回新增與修改的文章）
+SEARCH_MAX_PER_PAGE = 100
+
+_search_state = {"index": None, "synced_at": 0, "ready": False, "thread": None}
+_search_lock = threading.Lock()  # SQLite 連線由所有請求共用，一次只允許一個執行緒使用
+
+
+def _sync_search_index():
+    """背景執行緒：以另一條 SQLite 連線同步索引（WAL 模式下寫入不會阻擋查詢）"""
+    index = search_index.SearchIndex()
+    try:
+        index.sync(db_config)
+        _search_state["ready"] = True
+    except pymysql.MySQLError as e:
+        print(f"全文檢索索引同步失敗，沿用現有索引：{e}")
+    finally:
+        index.close()
+        _search_state["synced_at"] = time.time()
+
+
+def get_search_index():
+    """回傳查詢用的索引，尚未完成第一次建立時回傳 None
+
+    同步在背景執行緒進行，不佔用 _search_lock；第一次建立完成前沿用磁碟上既有的索引（若有）。
+    """
+    if _search_state["index"] is None:
+        _search_state["index"] = search_index.SearchIndex()
+        _search_state["ready"] = _search_state["index"].count() > 0
+    thread = _search_state["thread"]
+    if (thread is None or not thread.is_alive()) and time.time() - _search_state["synced_at"] >= SEARCH_SYNC_INTERVAL:
+        _search_state["thread"] = threading.Thread(target=_sync_search_index, daemon=True)
+        _search_state["thread"].start()
+    return _search_state["index"] if _search_state["ready"] else None
+
+
+class ArticleSearch(Resource):
+    def get(self):
+        """
+        以關鍵字全文檢索 PTT、Dcard 與平台公告文章（BM25 排序）
+        ---
+        parameters:
+          - name: q
+            in: query
+            type: string
+            required: true
+            description: 查詢詞，以空白分隔多個詞，例如 "退貨 客服"
+          - name: mode
+            in: query
+            type: string
+            required: false
+            enum: [and, or]
+            description: and 為所有查詢詞都需出現 (預設)，or 為任一出現即可
+          - name: sources
+            in: query
+            type: string
+            required: false
+            description: 以逗號分隔的來源 (ptt,dcard,news)，預設全部
+          - name: start_date
+            in: query
+            type: string
+            required: false
+            description: 起始日期 (YYYY-MM-DD)
+          - name: end_date
+            in: query
+            type: string
+            required: false
+            description: 結束日期 (YYYY-MM-DD)
+          - name: page
+            in: query
+            type: integer
+            required: false
+            description: 頁碼 (預設 1)
+          - name: per_page
+            in: query
+            type: integer
+            required: false
+            description: 每頁筆數 (預設 20，最多 100)
+        responses:
+          200:
+            description: 依相關度排序的文章列表（source、id、title、date、label、url、score）
+          400:
+            description: 缺少查詢詞或參數格式錯誤
+          503:
+            description: 索引尚未建立完成（第一次同步在背景進行中）
+        tags:
+          - 全文檢索
+        """
+        if search_index is None:
+            return jsonify({"error": "Full-text search is not available (missing dependencies)."}), 503
+
+        query = request.args.get("q", "").strip()
+        if not query:
+            return jsonify({"error": "Query parameter 'q' is required."}), 400
+        mode = request.args.get("mode", "and").lower()
+        if mode not in ("and", "or"):
+            return jsonify({"error": "mode must be 'and' or 'or'"}), 400
+
+        sources = [s.strip() for s in request.args.get("sources", "").split(",") if s.strip()]
+        unknown = [s for s in sources if s not in search_index.SEARCH_SOURCES]
+        if unknown:
+            return jsonify({"error": f"Unknown sources: {unknown}", "sources": list(search_index.SEARCH_SOURCES)}), 400
+
+        start_date = request.args.get("start_date")
+        end_date = request.args.get("end_date")
+        for value in (start_date, end_date):
+            if value and search_index.normalize_date(value) is None:
+                return jsonify({"error": f"Invalid date: {value} (expected YYYY-MM-DD)"}), 400
+
+        try:
+            page = max(int(request.args.get("page", 1)), 1)
+            per_page = min(max(int(request.args.get("per_page", 20)), 1), SEARCH_MAX_PER_PAGE)
+        except ValueError:
+            return jsonify({"error": "page and per_page must be integers"}), 400
+
+        with _search_lock:
+            index = get_search_index()
+            if index is None:
+                return jsonify({"error": "Search index is being built, please retry later."}), 503
+            total, results = index.search(
+                query, sources=sources or None, start_date=start_date, end_date=end_date,
+                mode=mode, page=page, per_page=per_page,
+            )
+
+        return jsonify({
+            "query": query,
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "results": results,
+        })
 
 
 ##############################################
 # 2-2-1. 搜尋結果準確度API
 ##############################################
+# 準確度以記憶體中的標題字元索引計算；設為 False 則改回由資料庫以 REGEXP 計算
+# 新的爬取結果只寫入快照，索引只服務尚未以 accuracy_snapshots.py 轉成快照的舊關鍵字
+USE_TITLE_INDEX = True
+title_index = accuracy_index.AccuracyIndex()
+
+
 def connect_to_db():
     return pymysql.connect(**db_config)
 
@@ -478,7 +1067,12 @@ def create_table(db_connection, platform):
         cursor.execute(
             f"CREATE TABLE IF NOT EXISTS `yuting_{platform}_dynamique_search_accuracy` (timestamp DATETIME, keyword TEXT, search_result TEXT)"
         )
+        # 標題索引依 timestamp 增量載入新資料
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS timestamp_idx ON `yuting_{platform}_dynamique_search_accuracy` (timestamp)"
+        )
     db_connection.commit()
+    accuracy_snapshots.initialize_table(db_connection)
 
 
 def check_table_has_data(db_connection, platform, keyword):
@@ -490,83 +1084,80 @@ def check_table_has_data(db_connection, platform, keyword):
         return cursor.fetchone()[0] > 0
 
 
-def insert_data(db_connection, platform, keyword, data):
-    with db_connection.cursor() as cursor:
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        for row in data:
-            cursor.execute(
-                f"""
-            INSERT INTO `yuting_{platform}_dynamique_search_accuracy` (timestamp, keyword, search_result)
-            VALUES (%s, %s, %s)
-            """,
-                (timestamp, keyword, row["search_result"]),
-            )
-    db_connection.commit()
+class DriverPool:
+    """共用的 headless Chrome，用完放回池中，不必每次爬取都重新啟動瀏覽器
 
+    同時最多借出 size 個瀏覽器；爬取過程發生例外時該瀏覽器直接關閉，不放回池中。
+    """
 
-def crawler_momo(db_connection, keyword, max_pages=1):
-    service = Service(ChromeDriverManager().install())
-    options = webdriver.ChromeOptions()
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    driver = webdriver.Chrome(service=service, options=options)
-    all_results = []
-    for page in range(1, max_pages + 1):
-        driver.get(
-            f"https://www.momoshop.com.tw/search/searchShop.jsp?keyword={keyword}&page={page}"
-        )
+    def __init__(self, size):
+        self.size = size
+        self._idle = queue.Queue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._driver_path = None
+
+    def _new_driver(self):
+        with self._lock:
+            if self._driver_path is None:
+                self._driver_path = ChromeDriverManager().install()
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--no-sandbox")
+        return webdriver.Chrome(service=Service(self._driver_path), options=options)
+
+    @contextmanager
+    def driver(self):
+        with self._slots:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = self._new_driver()
+            try:
+                yield driver
+            except Exception:
+                driver.quit()
+                raise
+            self._idle.put(driver)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().quit()
+            except queue.Empty:
+                return
+
+
+DRIVER_POOL_SIZE = 3
+driver_pool = DriverPool(DRIVER_POOL_SIZE)
+CRAWL_MAX_PAGES = 5  # 相關比例過低時會提前停止，通常用不到這麼多頁
+
+
+def render_page(url):
+    """以池中的瀏覽器載入頁面並捲到底，回傳產生的 DOM（JSON / HTML 來源失敗時使用）"""
+    with driver_pool.driver() as driver:
+        driver.get(url)
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
         time.sleep(random.uniform(3, 8))
-        titles = driver.find_elements(By.CLASS_NAME, "prdName")
-        results = [
-            {"search_result": title.text}
-            for title in titles
-            if title.text.strip() != ""
-        ]
-        all_results.extend(results)
-    driver.quit()
-
-    # 在執行爬蟲後檢查資料庫是否已經有資料
-    if check_table_has_data(db_connection, "momo", keyword):
-        # 如果資料已存在，就只回傳爬蟲結果，不執行資料庫插入
-        return all_results
-
-    # 如果資料表中沒有資料，就將爬取的資料插入資料庫
-    insert_data(db_connection, "momo", keyword, all_results)
+        return driver.page_source
+
+
+def crawl_search_results(db_connection, platform, keyword, max_pages):
+    result = product_search.crawl(platform, keyword, max_pages, render=render_page)
+    print(f"{platform} {keyword}：{len(result['pages'])} 頁 {len(result['titles'])} 筆（{result['stop_reason']}）")
+    # 每次爬取都存成一筆新的快照（同時算好商品數與準確度），可追蹤準確度的變化
+    accuracy_snapshots.save_snapshot(db_connection, platform, keyword, result["titles"])
     # 回傳爬取的最新資料
-    return all_results
-
-
-def crawler_pchome(db_connection, keyword, max_pages=1):
-    service = Service(ChromeDriverManager().install())
-    options = webdriver.ChromeOptions()
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    driver = webdriver.Chrome(service=service, options=options)
-    all_results = []
-    for page in range(1, max_pages + 1):
-        driver.get(f"https://24h.pchome.com.tw/search/?q={keyword}")
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(random.uniform(5, 9))
-        no_item = driver.find_elements(By.CLASS_NAME, "c-tipsBox")
-        if no_item:
-            no_data = [{"search_result": "No Relevant Item Exists"}]
-            all_results.extend(no_data)
-        else:
-            titles = driver.find_elements(By.CLASS_NAME, "c-prodInfoV2__title")
-            results = [
-                {"search_result": title.text}
-                for title in titles
-                if title.text.strip() != ""
-            ]
-            all_results.extend(results)
-    driver.quit()
-    if check_table_has_data(db_connection, "pchome", keyword):
-        return all_results
-    insert_data(db_connection, "pchome", keyword, all_results)
-    return all_results
+    return [{"search_result": title} for title in result["titles"]]
+
+
+def crawler_momo(db_connection, keyword, max_pages=CRAWL_MAX_PAGES):
+    return crawl_search_results(db_connection, "momo", keyword, max_pages)
+
+
+def crawler_pchome(db_connection, keyword, max_pages=CRAWL_MAX_PAGES):
+    return crawl_search_results(db_connection, "pchome", keyword, max_pages)
 
 
 def get_statistics(db_connection, platform, keyword):
@@ -582,6 +1173,10 @@ def get_statistics(db_connection, platform, keyword):
 def analyze_keyword_with_spacing(
     db_connection, platform, keyword, regex_pattern, exclude_terms
 ):
+    if USE_TITLE_INDEX:
+        # 與下方 REGEXP 相同的判斷（字元依序出現、不含排除詞），但不必重新掃描標題
+        return title_index.precision(db_connection, platform, keyword, exclude_terms)
+
     with db_connection.cursor() as cursor:
         exclude_pattern = "|".join(exclude_terms)
         cursor.execute(
@@ -606,6 +1201,35 @@ def generate_regex_pattern(keyword):
     return r".*?".join(keyword)
 
 
+def keyword_accuracy(db_connection, platform, keyword):
+    """最近一次爬取的 crawl_time、version、product_count 與 precision，沒有資料時回傳 None
+
+    優先讀取快照中預先算好的指標；只有舊資料表（尚未以 accuracy_snapshots.py 轉成快照）有資料的關鍵字，
+    改以標題索引計算舊資料表中的全部結果。
+    """
+    snapshot = accuracy_snapshots.latest_snapshot(db_connection, platform, keyword)
+    if snapshot is not None:
+        return snapshot
+    if not check_table_has_data(db_connection, platform, keyword):
+        return None
+
+    with db_connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT MAX(timestamp) FROM `yuting_{platform}_dynamique_search_accuracy` WHERE keyword = %s",
+            (keyword,),
+        )
+        crawl_time = cursor.fetchone()[0]
+    exclude_terms = ["適用", "專用", "配件", "支援"]
+    return {
+        "crawl_time": crawl_time,
+        "version": None,
+        "product_count": get_statistics(db_connection, platform, keyword)["product_count"],
+        "precision": analyze_keyword_with_spacing(
+            db_connection, platform, keyword, generate_regex_pattern(keyword), exclude_terms
+        ),
+    }
+
+
 class SearchProducts(Resource):
     def post(self):
         """根據指定商品關鍵字，計算MOMO與PChome搜尋結果準確度
@@ -629,33 +1253,172 @@ class SearchProducts(Resource):
         create_table(connection_to_db, "momo")
         create_table(connection_to_db, "pchome")
 
-        if not check_table_has_data(connection_to_db, "momo", keyword):
-            momo_data = crawler_momo(connection_to_db, keyword)
-            insert_data(connection_to_db, "momo", keyword, momo_data)
+        # 沒有任何資料時才即時爬取；已有資料時回傳最近一次爬取的結果
+        momo_result = keyword_accuracy(connection_to_db, "momo", keyword)
+        if momo_result is None:
+            crawler_momo(connection_to_db, keyword)
+            momo_result = keyword_accuracy(connection_to_db, "momo", keyword)
 
-        if not check_table_has_data(connection_to_db, "pchome", keyword):
-            pchome_data = crawler_pchome(connection_to_db, keyword)
-            insert_data(connection_to_db, "pchome", keyword, pchome_data)
-
-        momo_stats = get_statistics(connection_to_db, "momo", keyword)
-        pchome_stats = get_statistics(connection_to_db, "pchome", keyword)
-
-        regex_pattern = generate_regex_pattern(keyword)
-        exclude_terms = ["適用", "專用", "配件", "支援"]
-        momo_precision = f"{float(analyze_keyword_with_spacing(connection_to_db, 'momo', keyword, regex_pattern, exclude_terms))*100}%"
-        pchome_precision = f"{float(analyze_keyword_with_spacing(connection_to_db, 'pchome', keyword, regex_pattern, exclude_terms))*100}%"
+        pchome_result = keyword_accuracy(connection_to_db, "pchome", keyword)
+        if pchome_result is None:
+            crawler_pchome(connection_to_db, keyword)
+            pchome_result = keyword_accuracy(connection_to_db, "pchome", keyword)
 
         connection_to_db.close()
 
         return jsonify(
             {
                 "keyword": keyword,
-                "momo": {"product_count": momo_stats, "accuracy": momo_precision},
-                "pchome": {"product_count": pchome_stats, "accuracy": pchome_precision},
+                "momo": {
+                    "product_count": {"keyword": keyword, "product_count": momo_result["product_count"]},
+                    "accuracy": f"{float(momo_result['precision'])*100}%",
+                    "crawl_time": str(momo_result["crawl_time"]),
+                },
+                "pchome": {
+                    "product_count": {"keyword": keyword, "product_count": pchome_result["product_count"]},
+                    "accuracy": f"{float(pchome_result['precision'])*100}%",
+                    "crawl_time": str(pchome_result["crawl_time"]),
+                },
             }
         )
 
 
+class AccuracyTrend(Resource):
+    def get(self):
+        """
+        查詢關鍵字在各次爬取的商品數與搜尋結果準確度（依爬取時間排序）
+        ---
+        parameters:
+          - name: keyword
+            in: query
+            type: string
+            required: true
+            description: 查詢關鍵字
+          - name: platform
+            in: query
+            type: string
+            required: false
+            enum: [momo, pchome]
+            description: 平台，預設兩個平台都回傳
+          - name: start_date
+            in: query
+            type: string
+            required: false
+            description: 起始日期 (YYYY-MM-DD)
+          - name: end_date
+            in: query
+            type: string
+            required: false
+            description: 結束日期 (YYYY-MM-DD)
+        responses:
+          200:
+            description: 各平台每次爬取的 crawl_time、version、product_count、matched_count、precision
+          400:
+            description: 缺少關鍵字或參數格式錯誤
+        tags:
+          - 準確度計算: 平台搜尋結果準確度分析
+        """
+        keyword = request.args.get("keyword", "").strip()
+        if not keyword:
+            return jsonify({"error": "Query parameter 'keyword' is required."}), 400
+        platform = request.args.get("platform")
+        if platform and platform not in accuracy_index.PLATFORMS:
+            return jsonify({"error": f"Unknown platform: {platform}", "platforms": list(accuracy_index.PLATFORMS)}), 400
+
+        start_date = request.args.get("start_date")
+        end_date = request.args.get("end_date")
+        for value in (start_date, end_date):
+            if value:
+                try:
+                    datetime.datetime.strptime(value, "%Y-%m-%d")
+                except ValueError:
+                    return jsonify({"error": f"Invalid date: {value} (expected YYYY-MM-DD)"}), 400
+
+        connection_to_db = connect_to_db()
+        accuracy_snapshots.initialize_table(connection_to_db)
+        result = {}
+        for name in [platform] if platform else accuracy_index.PLATFORMS:
+            rows = accuracy_snapshots.trend(connection_to_db, name, keyword, start_date, end_date)
+            for row in rows:
+                row["crawl_time"] = str(row["crawl_time"])
+            result[name] = rows
+        connection_to_db.close()
+        return jsonify({"keyword": keyword, "trend": result})
+
+
+##############################################
+# 2-2-2. 批次準確度分析（關鍵字清單）
+##############################################
+# 定期（例如 cron）對關鍵字清單中的每個關鍵字爬取兩個平台並存成快照，
+# Dash 的「查詢過去資料」與 /search_accuracy 即可直接讀取預先算好的準確度：
+#
+#     python API_Serve.py --sweep accuracy_keywords.txt --max-pages 3
+SWEEP_MAX_PAGES = 3           # 每個關鍵字爬取的頁數
+SWEEP_MIN_INTERVAL_HOURS = 20  # 最近一次快照在此時間內的關鍵字不重新爬取（0 表示全部重爬）
+CRAWLERS = {"momo": crawler_momo, "pchome": crawler_pchome}
+
+
+def load_keyword_catalog(path):
+    """每行一個關鍵字，# 之後為註解，空行與重複的關鍵字略過"""
+    keywords = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            keyword = line.split("#", 1)[0].strip()
+            if keyword and keyword not in keywords:
+                keywords.append(keyword)
+    return keywords
+
+
+def sweep_keyword(platform, keyword, max_pages, min_interval):
+    """爬取一個平台、一個關鍵字並存成快照；回傳 (最新快照, 是否重新爬取)"""
+    connection_to_db = connect_to_db()  # pymysql 連線不可跨執行緒共用，每個工作各自連線
+    try:
+        latest = accuracy_snapshots.latest_snapshot(connection_to_db, platform, keyword)
+        if latest and min_interval and datetime.datetime.now() - latest["crawl_time"] < min_interval:
+            return latest, False
+        CRAWLERS[platform](connection_to_db, keyword, max_pages=max_pages)
+        return accuracy_snapshots.latest_snapshot(connection_to_db, platform, keyword), True
+    finally:
+        connection_to_db.close()
+
+
+def run_accuracy_sweep(catalog_path, max_pages=SWEEP_MAX_PAGES, workers=DRIVER_POOL_SIZE,
+                       min_interval_hours=SWEEP_MIN_INTERVAL_HOURS):
+    keywords = load_keyword_catalog(catalog_path)
+    connection_to_db = connect_to_db()
+    create_table(connection_to_db, "momo")
+    create_table(connection_to_db, "pchome")
+    connection_to_db.close()
+
+    min_interval = datetime.timedelta(hours=min_interval_hours)
+    crawled = skipped = failed = 0
+    # 需要改用瀏覽器時，同時使用的瀏覽器數量受 driver_pool 限制，其餘工作排隊等待
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(sweep_keyword, platform, keyword, max_pages, min_interval): (platform, keyword)
+            for keyword in keywords
+            for platform in CRAWLERS
+        }
+        for future in as_completed(futures):
+            platform, keyword = futures[future]
+            try:
+                snapshot, is_new = future.result()
+            except Exception as e:  # 單一關鍵字失敗不影響其他關鍵字
+                failed += 1
+                print(f"[失敗] {platform} {keyword}：{e}")
+                continue
+            if is_new:
+                crawled += 1
+            else:
+                skipped += 1
+            print(
+                f"[{'完成' if is_new else '略過'}] {platform} {keyword}：商品數 {snapshot['product_count']}，"
+                f"準確度 {float(snapshot['precision'])*100:.2f}%（{snapshot['crawl_time']}）"
+            )
+    driver_pool.close()
+    print(f"關鍵字 {len(keywords)} 個：爬取 {crawled} 次，略過 {skipped} 次，失敗 {failed} 次")
+
+
 ##############################################
 # 3-1. 建立 Dash 應用並掛載在同一個 Flask 上 / 準確度查詢
 ##############################################
@@ -683,6 +1446,28 @@ dash_app.layout = dbc.Container(
 
 
 
+def accuracy_trend_graphs(db_connection, keyword):
+    """兩個平台各次爬取的準確度與商品數折線圖；快照少於兩次時不顯示"""
+    rows = []
+    for platform, label in [("momo", "MOMO"), ("pchome", "PChome")]:
+        for row in accuracy_snapshots.trend(db_connection, platform, keyword):
+            rows.append({
+                "平台": label,
+                "爬取時間": row["crawl_time"],
+                "準確度 (%)": row["precision"] * 100,
+                "商品數量": row["product_count"],
+            })
+    df = pd.DataFrame(rows)
+    if df.empty or df.groupby("平台").size().max() < 2:
+        return []
+
+    precision_fig = px.line(df, x="爬取時間", y="準確度 (%)", color="平台", markers=True,
+                            title=f"「{keyword}」搜尋結果準確度趨勢")
+    count_fig = px.line(df, x="爬取時間", y="商品數量", color="平台", markers=True,
+                        title=f"「{keyword}」搜尋結果商品數量趨勢")
+    return [dcc.Graph(figure=precision_fig), dcc.Graph(figure=count_fig)]
+
+
 @dash_app.callback( 
     Output("search-result", "children"),
     [Input("search-history-button", "n_clicks"), Input("search-live-button", "n_clicks")],
@@ -701,24 +1486,11 @@ def update_search_result(history_clicks, live_clicks, keyword):
 
     # 查詢過去資料
     if history_clicks:
-        # momo
-        if check_table_has_data(connection_to_db, "momo", keyword):
-            momo_stats = get_statistics(connection_to_db, "momo", keyword)
-            # 取得 timestamp
-            with connection_to_db.cursor() as cursor:
-                cursor.execute(
-                    """
-                    SELECT timestamp FROM yuting_momo_dynamique_search_accuracy
-                    WHERE keyword = %s ORDER BY timestamp DESC LIMIT 1
-                    """, 
-                    (keyword,)
-                )
-                momo_timestamp = cursor.fetchone()
+        # momo（最近一次爬取的快照，指標已預先算好）
+        momo_result = keyword_accuracy(connection_to_db, "momo", keyword)
+        if momo_result:
+            momo_precision = f"{float(momo_result['precision'])*100}%"
 
-            regex_pattern = generate_regex_pattern(keyword)
-            exclude_terms = ["適用", "專用", "配件", "支援"]
-            momo_precision = f"{float(analyze_keyword_with_spacing(connection_to_db, 'momo', keyword, regex_pattern, exclude_terms))*100}%"
-            
             result_divs.append(html.Div(
                 [
                     html.H3(f"您搜尋的關鍵字：{keyword}"),
@@ -731,7 +1503,7 @@ def update_search_result(history_clicks, live_clicks, keyword):
                         }
                     ),
                     html.P(
-                        f"◆ 商品數量：{momo_stats['product_count']}",
+                        f"◆ 商品數量：{momo_result['product_count']}",
                         style={
                             'margin-left': '15px', 
                             'font-size': '18px'
@@ -745,7 +1517,7 @@ def update_search_result(history_clicks, live_clicks, keyword):
                         }
                     ),
                     html.P(
-                        f"（資料分析時間：{momo_timestamp[0] if momo_timestamp else '無紀錄'}）",
+                        f"（資料分析時間：{momo_result['crawl_time'] or '無紀錄'}）",
                         style={
                             'margin-left': '15px', 
                             'font-size': '16px', 
@@ -766,23 +1538,10 @@ def update_search_result(history_clicks, live_clicks, keyword):
             result_divs.append(html.P("MOMO 無歷史資料，請點擊 '即時查詢' 以獲取最新資料。"))
 
         # pchome
-        if check_table_has_data(connection_to_db, "pchome", keyword):
-            pchome_stats = get_statistics(connection_to_db, "pchome", keyword)
-            with connection_to_db.cursor() as cursor:
-                cursor.execute(
-                    """
-                    SELECT timestamp FROM yuting_pchome_dynamique_search_accuracy
-                    WHERE keyword = %s ORDER BY timestamp DESC LIMIT 1
-                    """, 
-                    (keyword,)
-                )
-                pchome_timestamp = cursor.fetchone()
+        pchome_result = keyword_accuracy(connection_to_db, "pchome", keyword)
+        if pchome_result:
+            pchome_precision = f"{float(pchome_result['precision'])*100}%"
 
-            regex_pattern = generate_regex_pattern(keyword)
-            exclude_terms = ["適用", "專用", "配件", "支援"]
-            pchome_precision = f"{float(analyze_keyword_with_spacing(connection_to_db, 'pchome', keyword, regex_pattern, exclude_terms))*100}%"
-            
-            
             result_divs.append(html.Div(
                 [
                     html.H4(
@@ -794,7 +1553,7 @@ def update_search_result(history_clicks, live_clicks, keyword):
                         }
                     ),
                     html.P(
-                        f"◇ 商品數量：{pchome_stats['product_count']}",
+                        f"◇ 商品數量：{pchome_result['product_count']}",
                         style={
                             'margin-left': '15px', 
                             'font-size': '18px'
@@ -808,7 +1567,7 @@ def update_search_result(history_clicks, live_clicks, keyword):
                         }
                     ),
                     html.P(
-                        f"（資料分析時間：{pchome_timestamp[0] if pchome_timestamp else '無紀錄'}）",
+                        f"（資料分析時間：{pchome_result['crawl_time'] or '無紀錄'}）",
                         style={
                             'margin-left': '15px', 
                             'font-size': '16px', 
@@ -827,17 +1586,20 @@ def update_search_result(history_clicks, live_clicks, keyword):
         else:
             result_divs.append(html.P("PChome 無歷史資料，請點擊 '即時查詢' 以獲取最新資料。"))
 
+        # 各次爬取的準確度與商品數趨勢
+        result_divs.extend(accuracy_trend_graphs(connection_to_db, keyword))
+
     # 即時查詢
     if live_clicks:
-        momo_data = crawler_momo(connection_to_db, keyword)
-        pchome_data = crawler_pchome(connection_to_db, keyword)
-        momo_count = len(momo_data)
-        pchome_count = len(pchome_data)
-        
-        regex_pattern = generate_regex_pattern(keyword)
-        exclude_terms = ["適用", "專用", "配件", "支援"]
-        momo_precision = f"{float(analyze_keyword_with_spacing(connection_to_db, 'momo', keyword, regex_pattern, exclude_terms))*100}%"
-        pchome_precision = f"{float(analyze_keyword_with_spacing(connection_to_db, 'pchome', keyword, regex_pattern, exclude_terms))*100}%"
+        crawler_momo(connection_to_db, keyword)
+        crawler_pchome(connection_to_db, keyword)
+        # 爬蟲已將本次結果存成快照，直接讀取其中算好的商品數與準確度
+        momo_result = accuracy_snapshots.latest_snapshot(connection_to_db, "momo", keyword)
+        pchome_result = accuracy_snapshots.latest_snapshot(connection_to_db, "pchome", keyword)
+        momo_count = momo_result["product_count"]
+        pchome_count = pchome_result["product_count"]
+        momo_precision = f"{float(momo_result['precision'])*100}%"
+        pchome_precision = f"{float(pchome_result['precision'])*100}%"
 
         # 顯示即時查詢結果
         result_divs.append(html.Div(
@@ -890,6 +1652,14 @@ dash_app_2 = dash.Dash(
 
 
 def fetch_data():
+    # 優先讀取本機快照，只載入需要的兩個欄位，避免對正式資料庫做全表掃描
+    if article_snapshot is not None:
+        try:
+            snapshot = article_snapshot.load_table("judy_db", ["id", "sentiment_score"])
+            return snapshot.rename(columns={"id": "ID", "sentiment_score": "Sentiment Score"})
+        except FileNotFoundError:
+            pass
+
     conn = pymysql.connect(**db_config)
     cursor = conn.cursor()
     cursor.execute("SELECT id, sentiment_score FROM judy_db")
@@ -969,10 +1739,24 @@ api.add_resource(
 )
 api.add_resource(PictureList, "/pictures")
 api.add_resource(Picture, "/pictures/<string:filename>")
+api.add_resource(ChartImage, "/charts/<string:chart_type>")
+api.add_resource(ArticleSearch, "/search")
 api.add_resource(SearchProducts, "/search_accuracy")
+api.add_resource(AccuracyTrend, "/accuracy_trend")
 
 ##############################################
 # 5. 啟動
 ##############################################
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5555, debug=True)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sweep", metavar="CATALOG", help="依關鍵字清單批次爬取並計算準確度，完成後結束")
+    parser.add_argument("--max-pages", type=int, default=SWEEP_MAX_PAGES)
+    parser.add_argument("--workers", type=int, default=DRIVER_POOL_SIZE)
+    parser.add_argument("--min-interval-hours", type=float, default=SWEEP_MIN_INTERVAL_HOURS)
+    args = parser.parse_args()
+
+    if args.sweep:
+        driver_pool = DriverPool(args.workers)
+        run_accuracy_sweep(args.sweep, args.max_pages, args.workers, args.min_interval_hours)
+    else:
+        app.run(host="0.0.0.0", port=5555, debug=True)
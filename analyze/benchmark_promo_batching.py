@@ -0,0 +1,153 @@
+"""
+比較 extract_promo_info 單篇模式與多篇合併模式的吞吐量與每篇成本。
+
+在本機啟動模擬 OpenAI 的 HTTP server（固定每次請求延遲 + 依輸出 token 數增加的延遲），
+不需網路與 API Key。請在 analyze/ 目錄下執行：
+
+    python benchmark_promo_batching.py
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openai import OpenAI
+
+os.makedirs("./log", exist_ok=True)  # filtered_news 匯入時會設定 log 檔
+import filtered_news
+from llm_cache import LLMCache
+
+FIXTURE_SIZE = 200
+REQUEST_OVERHEAD = 0.3         # 模擬每次請求的固定延遲（秒）
+SECONDS_PER_OUTPUT_TOKEN = 0.002
+INPUT_PRICE_PER_1M = 0.15      # gpt-4o-mini 每百萬 input tokens 美元
+OUTPUT_PRICE_PER_1M = 0.60     # gpt-4o-mini 每百萬 output tokens 美元
+PROMO_WORDS = ("折", "優惠", "贈", "滿額")
+
+
+def build_fixtures(size=FIXTURE_SIZE):
+    """產生固定的測試新聞：約三分之一含行銷活動"""
+    promo = "即日起至月底，全館指定商品滿額{n}元現折{m}元，會員再贈購物金{n}點。"
+    plain = "本公司今日公布第{n}季營運概況，物流中心擴建工程進度順利，預計年底前完工啟用。"
+    articles = []
+    for i in range(size):
+        template = promo if i % 3 == 0 else plain
+        body = " ".join(template.format(n=1000 + i, m=100 + i % 50) for _ in range(3 + i % 5))
+        articles.append({
+            "id": i + 1,
+            "platform": "PChome" if i % 2 else "Momo",
+            "title": f"新聞 {i + 1}",
+            "article_url": f"https://example.com/news/{i + 1}",
+            "content": body,
+            "publish_date": f"2024-{i % 12 + 1:02d}-01",
+        })
+    return articles
+
+
+def mock_answer(text):
+    return "活動：指定商品滿額現折並加贈購物金。" if any(w in text for w in PROMO_WORDS) else "無活動"
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    stats = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+
+        items = re.findall(r"### (\d+)（發布於[^）]*）\n(.*?)(?=\n\n### |\Z)", prompt, re.S)
+        if items:
+            content = json.dumps(
+                [{"id": int(i), "summary": mock_answer(text)} for i, text in items], ensure_ascii=False
+            )
+        else:
+            content = mock_answer(prompt.split("\n\n", 1)[-1])
+
+        prompt_tokens = len(prompt)
+        completion_tokens = len(content)
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["completion_tokens"] += completion_tokens
+        time.sleep(REQUEST_OVERHEAD + completion_tokens * SECONDS_PER_OUTPUT_TOKEN)
+
+        payload = json.dumps({
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_mode(articles, batch_mode):
+    """以全新的空快取跑一次，回傳統計"""
+    for key in MockOpenAIHandler.stats:
+        MockOpenAIHandler.stats[key] = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filtered_news.llm_cache = LLMCache(os.path.join(tmp, "cache.sqlite3"))
+        start = time.perf_counter()
+        results = {
+            article["id"]: summary
+            for article, summary in filtered_news.extract_promo_info_concurrently(articles, batch_mode=batch_mode)
+        }
+        elapsed = time.perf_counter() - start
+        filtered_news.llm_cache.close()
+
+    stats = dict(MockOpenAIHandler.stats)
+    cost = (stats["prompt_tokens"] * INPUT_PRICE_PER_1M + stats["completion_tokens"] * OUTPUT_PRICE_PER_1M) / 1e6
+    return results, {
+        "seconds": round(elapsed, 2),
+        "articles_per_second": round(len(articles) / elapsed, 2),
+        "requests": stats["requests"],
+        "prompt_tokens": stats["prompt_tokens"],
+        "completion_tokens": stats["completion_tokens"],
+        "usd_per_article": round(cost / len(articles), 8),
+    }
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    filtered_news.client = OpenAI(api_key="mock", base_url=f"http://127.0.0.1:{server.server_port}/v1")
+    filtered_news.rate_limiter = filtered_news.RateLimiter(10 ** 6, 10 ** 9)
+
+    articles = build_fixtures()
+    single_results, single_stats = run_mode(articles, batch_mode=False)
+    batch_results, batch_stats = run_mode(articles, batch_mode=True)
+    server.shutdown()
+
+    agree = sum(1 for k in single_results if single_results[k] == batch_results.get(k))
+    print(f"文章數: {len(articles)}")
+    print(f"單篇模式: {single_stats}")
+    print(f"批次模式: {batch_stats}")
+    print(f"兩種模式結果一致: {agree}/{len(articles)}")
+    print(f"吞吐量提升: {batch_stats['articles_per_second'] / single_stats['articles_per_second']:.2f}x，"
+          f"每篇成本比: {batch_stats['usd_per_article'] / single_stats['usd_per_article']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,63 @@
+import json
+import os
 import mysql.connector
 import logging
+import re
+import sys
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from openai import OpenAI
+import llm_rate_limit
+from llm_cache import LLMCache
+from llm_rate_limit import RateLimiter, estimate_tokens
+from near_duplicates import NearDuplicateDetector
+from promo_prefilter import PromoPrefilter, load_model
+
+# 全文檢索索引（mapping/search_index.py，需 jieba）；寫入 filtered_news 後同步 news 來源
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mapping"))
+try:
+    import search_index
+except ImportError:
+    search_index = None
 
 # 設定 OpenAI API
 api_key = 'sk-p???'
 
 client = OpenAI(api_key=api_key)
 
+# OpenAI 併發與限流設定（依帳號等級調整）
+MAX_WORKERS = 8              # 同時進行的 API 請求數上限
+REQUESTS_PER_MINUTE = 500    # 每分鐘請求數上限 (RPM)
+TOKENS_PER_MINUTE = 200000   # 每分鐘 token 數上限 (TPM)
+MAX_RETRIES = 5              # 遇到 429 / 5xx 時的最大重試次數
+RETRY_BASE_DELAY = 1.0       # 重試退避的基準秒數
+
+# LLM 回應快取；修改 extract_promo_info 的 prompt 時請調升版本號
+PROMO_MODEL = "gpt-4o-mini"
+PROMO_PROMPT_VERSION = "promo-v1"
+llm_cache = LLMCache()
+
+# 多篇合併送出：一次請求打包多則新聞，超過 token 預算或篇數上限就切下一批
+# 預設關閉：合併送出可減少請求數（較不易碰到 RPM 限制），但實測每篇文章約多耗 1.2 倍 token，
+# 以 token 計費時逐篇送出較便宜；受限於請求頻率時再開啟
+BATCH_MODE = False
+BATCH_TOKEN_BUDGET = 6000
+BATCH_MAX_ARTICLES = 20
+
+# 本機前置篩選：沒有任何行銷用語的新聞不送 LLM（模型由 promo_prefilter.py 訓練，可無）
+USE_PREFILTER = True
+prefilter = PromoPrefilter(load_model())
+
+# 近似重複偵測：同一則公告（例如同時出現在兩個平台的新聞表）只送一篇給 LLM，其餘沿用結果
+USE_NEAR_DUPLICATES = True
+
+# 每處理幾篇文章就提交一次（同時寫入處理紀錄、更新進度並附加 CSV）
+COMMIT_BATCH_SIZE = 20
+CSV_PATH = "../scrape_results/filtered_news.csv"
+# 與原本 pd.DataFrame(文章).to_csv 的欄位順序相同；附加時一律依既有檔案的表頭排列
+CSV_COLUMNS = ['id', 'title', 'article_url', 'content', 'publish_date', 'platform', 'summary']
+
 # MySQL 資料庫設定
 db_config = {
     'host': '',
@@ -27,72 +76,109 @@ logging.basicConfig(
 
 logging.info("===== 啟動 filtered_news.py =====")
 
-def get_latest_urls():
-    """取得 filtered_news 中最新的 PChome 和 Momo 文章 URL（各平台各一筆）"""
+# 新聞來源：(平台, 資料表)
+NEWS_SOURCES = [('PChome', 'wilson_pchome_news'), ('Momo', 'wilson_momo_news')]
+NEWS_TABLES = dict(NEWS_SOURCES)
+
+def initialize_tables():
+    """建立處理進度表，並替 filtered_news 加上 article_url 的雜湊索引"""
     conn = mysql.connector.connect(**db_config)
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor()
 
-    query = """
-        SELECT t.platform, t.article_url
-        FROM wilson_filtered_news t
-        INNER JOIN (
-            SELECT platform, MAX(publish_date) AS max_date
-            FROM wilson_filtered_news
-            WHERE platform IN ('PChome', 'Momo')
-            GROUP BY platform
-        ) m ON t.platform = m.platform AND t.publish_date = m.max_date;
-    """
-    cursor.execute(query)
-    latest_urls = {row['platform']: row['article_url'] for row in cursor.fetchall()}
+    # 每個平台已處理到的來源文章 id（明確記錄，不再由 MAX(publish_date) 推算）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS wilson_filtered_news_progress (
+            platform VARCHAR(50) NOT NULL PRIMARY KEY,
+            last_processed_id INT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 每篇來源文章的處理結果；已記錄者（failed 除外）重跑時不再送 LLM
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS wilson_filtered_news_journal (
+            platform VARCHAR(50) NOT NULL,
+            source_id INT NOT NULL,
+            status ENUM('promo', 'no_promo', 'skipped', 'failed') NOT NULL,
+            processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (platform, source_id)
+        )
+    """)
 
+    # article_url 為 TEXT，改以 16 bytes 的 MD5 欄位建立索引供 anti-join 使用
+    cursor.execute("""
+        ALTER TABLE wilson_filtered_news
+        ADD COLUMN IF NOT EXISTS url_hash BINARY(16) AS (UNHEX(MD5(article_url))) STORED,
+        ADD INDEX IF NOT EXISTS url_hash_idx (url_hash)
+    """)
+
+    if USE_NEAR_DUPLICATES:
+        NearDuplicateDetector(conn).initialize_tables()
+
+    conn.commit()
     cursor.close()
     conn.close()
-    
-    logging.info(f"找到最新的 URL: {latest_urls}")
-    return latest_urls
 
+def get_watermarks(cursor):
+    """讀取各平台已處理的來源 id；第一次執行時以已存在於 filtered_news 的最大來源 id 初始化"""
+    cursor.execute("SELECT platform, last_processed_id FROM wilson_filtered_news_progress")
+    watermarks = {row['platform']: row['last_processed_id'] for row in cursor.fetchall()}
 
-def get_latest_ids(latest_urls):
-    """根據最新的 article_url 找到 PChome 和 Momo News 中的對應 ID"""
-    conn = mysql.connector.connect(**db_config)
-    cursor = conn.cursor(dictionary=True)
+    for platform, table in NEWS_SOURCES:
+        if platform in watermarks:
+            continue
+        cursor.execute(f"""
+            SELECT COALESCE(MAX(n.id), 0) AS last_id
+            FROM {table} n
+            INNER JOIN wilson_filtered_news f ON f.url_hash = UNHEX(MD5(n.article_url))
+        """)
+        watermarks[platform] = cursor.fetchone()['last_id']
+        cursor.execute(
+            "INSERT INTO wilson_filtered_news_progress (platform, last_processed_id) VALUES (%s, %s)",
+            (platform, watermarks[platform])
+        )
 
-    latest_ids = {}
+    logging.info(f"各平台已處理到的 ID: {watermarks}")
+    return watermarks
 
-    for platform, table in [('PChome', 'wilson_pchome_news'), ('Momo', 'wilson_momo_news')]:
-        if platform in latest_urls:
-            query = f"SELECT id FROM {table} WHERE article_url = %s"
-            cursor.execute(query, (latest_urls[platform],))
-            result = cursor.fetchone()
-            if result:
-                latest_ids[platform] = result['id']
+def update_watermarks(cursor, latest_ids):
+    """將各平台已連續處理完成的最大來源 id 寫回進度表（由呼叫端提交）"""
+    if not latest_ids:
+        return
+    cursor.executemany("""
+        UPDATE wilson_filtered_news_progress
+        SET last_processed_id = GREATEST(last_processed_id, %s)
+        WHERE platform = %s
+    """, [(last_id, platform) for platform, last_id in latest_ids.items()])
 
-    cursor.close()
-    conn.close()
-    
-    logging.info(f"找到最新的 ID: {latest_ids}")
-    return latest_ids
+    logging.info(f"更新處理進度: {latest_ids}")
 
-def get_new_articles(latest_ids):
-    """從最新的 ID 之後獲取新文章"""
+def get_new_articles():
+    """以單一查詢取得各平台 watermark 之後、尚未有 summary 且未處理過的新文章"""
     conn = mysql.connector.connect(**db_config)
     cursor = conn.cursor(dictionary=True)
 
-    new_articles = []
+    watermarks = get_watermarks(cursor)
+    conn.commit()
 
-    for platform, table in [('PChome', 'wilson_pchome_news'), ('Momo', 'wilson_momo_news')]:
-        last_id = latest_ids.get(platform, 0)  # 若沒有找到 ID，則從 ID 0 開始
-        query = f"""
-            SELECT id, title, article_url, content, publish_date 
-            FROM {table} 
-            WHERE id > %s 
-            AND article_url NOT IN (SELECT article_url FROM wilson_filtered_news)
-            ORDER BY id ASC
-        """
+    # 以 url_hash 索引做 LEFT JOIN anti-join，取代 NOT IN 子查詢與逐筆 SELECT 檢查
+    subqueries = []
+    params = []
+    for platform, table in NEWS_SOURCES:
+        subqueries.append(f"""
+            SELECT n.id, n.title, n.article_url, n.content, n.publish_date, %s AS platform
+            FROM {table} n
+            LEFT JOIN wilson_filtered_news f
+                ON f.url_hash = UNHEX(MD5(n.article_url)) AND f.summary IS NOT NULL
+            LEFT JOIN wilson_filtered_news_journal j
+                ON j.platform = %s AND j.source_id = n.id AND j.status <> 'failed'
+            WHERE n.id > %s AND f.url_hash IS NULL AND j.source_id IS NULL
+        """)
+        params.extend([platform, platform, watermarks[platform]])
 
-        cursor.execute(query, (last_id,))
-        articles = [{**row, "platform": platform} for row in cursor.fetchall()]
-        new_articles.extend(articles)
+    query = " UNION ALL ".join(subqueries) + " ORDER BY platform, id"
+    cursor.execute(query, tuple(params))
+    new_articles = cursor.fetchall()
 
     cursor.close()
     conn.close()
@@ -100,74 +186,364 @@ def get_new_articles(latest_ids):
     logging.info(f"找到 {len(new_articles)} 篇新文章需處理")
     return new_articles
 
+rate_limiter = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
+
+
+def create_completion_with_retry(**kwargs):
+    """經過共用限流器呼叫 OpenAI，並於暫時性錯誤時重試"""
+    return llm_rate_limit.create_completion_with_retry(
+        client, rate_limiter, max_retries=MAX_RETRIES, base_delay=RETRY_BASE_DELAY, **kwargs
+    )
+
+
+# extract_promo_info 呼叫失敗時的回傳值，與「無活動」的 None 區分，失敗的文章下次會重試
+EXTRACTION_FAILED = "<extraction failed>"
+
+
 def extract_promo_info(text, publish_date):
-    """使用 OpenAI API 提取行銷活動摘要"""
+    """使用 OpenAI API 提取行銷活動摘要；無活動回傳 None，呼叫失敗回傳 EXTRACTION_FAILED"""
     prompt = f"這段發布於{publish_date}的新聞內容是否包含行銷活動（如折扣、促銷、滿額贈、會員優惠）？如果有，請用一句話摘要活動內容，否則回應'無活動'。\n\n{text}"
 
-    try:
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini",
+    def call_api():
+        completion = create_completion_with_retry(
+            model=PROMO_MODEL,
             store=True,
             messages=[{"role": "user", "content": prompt}]
         )
-        summary = completion.choices[0].message.content
+        return completion.choices[0].message.content
+
+    try:
+        # 發布日期也是 prompt 的一部分，一併納入快取 key
+        summary = llm_cache.get_or_call(PROMO_MODEL, PROMO_PROMPT_VERSION, f"{publish_date}\n{text}", call_api)
         return summary if "無活動" not in summary else None
     except Exception as e:
         logging.error(f"OpenAI API 呼叫失敗: {e}")
-        return None
+        return EXTRACTION_FAILED
+
+def make_batches(articles, token_budget=BATCH_TOKEN_BUDGET, max_articles=BATCH_MAX_ARTICLES):
+    """依 token 預算與篇數上限將文章切成多批；單篇超過預算時自成一批"""
+    batches = []
+    current = []
+    current_tokens = 0
+    for article in articles:
+        tokens = estimate_tokens(article['content'] or "")
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_articles):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(article)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def build_batch_prompt(articles):
+    """將多則新聞組成一個要求回傳 JSON 陣列的 prompt，編號從 1 開始"""
+    lines = [
+        f"以下有 {len(articles)} 則新聞，每則以「### 編號」開頭並附上發布日期。"
+        "請逐則判斷內容是否包含行銷活動（如折扣、促銷、滿額贈、會員優惠）。",
+        '只輸出 JSON 陣列，不要任何其他文字，格式為 [{"id": 編號, "summary": "..."}]；'
+        "有活動時 summary 用一句話摘要活動內容，否則 summary 填 '無活動'。",
+    ]
+    for i, article in enumerate(articles, start=1):
+        lines.append(f"### {i}（發布於{article['publish_date']}）\n{article['content']}")
+    return "\n\n".join(lines)
+
+def parse_batch_response(answer, count):
+    """解析批次回應，回傳 {編號: 回答}；格式不符的項目不會出現在結果中"""
+    text = answer.strip()
+    # 去除模型偶爾加上的 ```json 區塊標記
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    answers = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        item_id = item.get("id")
+        summary = item.get("summary")
+        if isinstance(item_id, int) and 1 <= item_id <= count and isinstance(summary, str) and summary.strip():
+            answers[item_id] = summary.strip()
+    return answers
+
+def extract_promo_info_batch(articles):
+    """一次請求處理多篇文章，回傳與 articles 對齊的摘要列表；回應缺漏或格式錯誤的文章改以單篇呼叫"""
+    summaries = [None] * len(articles)
+    uncached = []
+    for i, article in enumerate(articles):
+        cached = llm_cache.get(PROMO_MODEL, PROMO_PROMPT_VERSION, f"{article['publish_date']}\n{article['content']}")
+        if cached is not None:
+            summaries[i] = cached if "無活動" not in cached else None
+        else:
+            uncached.append(i)
+
+    if len(uncached) == 1:
+        i = uncached[0]
+        summaries[i] = extract_promo_info(articles[i]['content'], articles[i]['publish_date'])
+        return summaries
+    if not uncached:
+        return summaries
+
+    batch = [articles[i] for i in uncached]
+    try:
+        completion = create_completion_with_retry(
+            model=PROMO_MODEL,
+            store=True,
+            messages=[{"role": "user", "content": build_batch_prompt(batch)}]
+        )
+        answers = parse_batch_response(completion.choices[0].message.content, len(batch))
+    except Exception as e:
+        logging.error(f"OpenAI API 批次呼叫失敗: {e}")
+        answers = {}
+
+    if len(answers) < len(batch):
+        logging.warning(f"批次回應不完整 ({len(answers)}/{len(batch)})，其餘改為單篇呼叫")
+
+    for n, i in enumerate(uncached, start=1):
+        article = articles[i]
+        if n in answers:
+            llm_cache.set(PROMO_MODEL, PROMO_PROMPT_VERSION, f"{article['publish_date']}\n{article['content']}", answers[n])
+            summaries[i] = answers[n] if "無活動" not in answers[n] else None
+        else:
+            summaries[i] = extract_promo_info(article['content'], article['publish_date'])
+    return summaries
+
+def extract_promo_info_single(articles):
+    return [extract_promo_info(article['content'], article['publish_date']) for article in articles]
+
+def extract_promo_info_concurrently(articles, max_workers=MAX_WORKERS, batch_mode=BATCH_MODE):
+    """以執行緒池併發呼叫 LLM，依完成順序逐篇產出 (article, summary)
+
+    batch_mode 為 True 時每個請求打包多篇文章，否則一篇一個請求。
+    """
+    if batch_mode:
+        units, task = make_batches(articles), extract_promo_info_batch
+    else:
+        units, task = [[article] for article in articles], extract_promo_info_single
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(task, unit): unit for unit in units}
+        for future in as_completed(futures):
+            for article, summary in zip(futures[future], future.result()):
+                yield article, summary
+    finally:
+        # 呼叫端中途離開（例外或關閉 generator）時取消尚未開始的請求，只等待進行中的請求
+        executor.shutdown(cancel_futures=True)
+
+def append_to_csv(articles):
+    """將新寫入的文章附加到 CSV；檔案不存在時寫入表頭，已存在時依其表頭的欄位順序附加"""
+    if not articles:
+        return
+    write_header = not os.path.exists(CSV_PATH) or os.path.getsize(CSV_PATH) == 0
+    columns = CSV_COLUMNS if write_header else pd.read_csv(CSV_PATH, nrows=0).columns.tolist()
+    missing = [column for column in CSV_COLUMNS if column not in columns]
+    if missing:
+        logging.warning(f"filtered_news.csv 的表頭缺少欄位 {missing}，這些欄位不會寫入")
+    df = pd.DataFrame(articles).reindex(columns=columns)
+    df.to_csv(CSV_PATH, mode='a', header=write_header, index=False)
+    logging.info(f"已附加 {len(articles)} 篇文章到 filtered_news.csv")
+
+def sync_search_index():
+    """將剛寫入或重寫的 filtered_news 同步到全文檢索索引；失敗只記錄，下次同步會補上"""
+    if search_index is None:
+        return
+    try:
+        logging.info(f"全文檢索索引同步: {search_index.sync_sources(db_config, ['news'])}")
+    except Exception as e:
+        logging.error(f"全文檢索索引同步失敗: {e}")
+
+def find_previous_result(cursor, cluster_id):
+    """同 cluster 中先前已處理（failed 除外）的新聞結果，回傳 (status, summary)，找不到時回傳 None"""
+    for platform, table in NEWS_SOURCES:
+        cursor.execute(f"""
+            SELECT j.status, f.summary
+            FROM near_duplicate_clusters c
+            INNER JOIN wilson_filtered_news_journal j
+                ON j.platform = %s AND j.source_id = c.source_id AND j.status <> 'failed'
+            INNER JOIN {table} n ON n.id = c.source_id
+            LEFT JOIN wilson_filtered_news f ON f.url_hash = UNHEX(MD5(n.article_url))
+            WHERE c.cluster_id = %s AND c.source_table = %s
+            ORDER BY c.doc_key
+            LIMIT 1
+        """, (platform, cluster_id, table))
+        rows = cursor.fetchall()
+        # promo 但找不到摘要（例如已被手動刪除）時重新處理
+        if rows and (rows[0][0] != 'promo' or rows[0][1]):
+            return rows[0][0], rows[0][1]
+    return None
+
+def group_near_duplicates(conn, cursor, articles):
+    """替新文章指派近似重複的 cluster，每個 cluster 只留一篇送前置篩選與 LLM
+
+    回傳 (leaders, followers, reused)：
+    - leaders：各 cluster 在本次要處理的第一篇文章
+    - followers：{(平台, id): [同 cluster 的其他新文章]}，沿用該 leader 的結果
+    - reused：[(article, status, summary)]，同 cluster 已有先前處理過的新聞，直接沿用其結果
+    """
+    detector = NearDuplicateDetector(conn)
+    leaders, followers, reused = [], {}, []
+    leader_keys = {}  # cluster_id -> leader 的 (平台, id)
+    for article in sorted(articles, key=lambda a: (a['platform'], a['id'])):
+        result = detector.assign(
+            NEWS_TABLES[article['platform']], article['id'], f"{article['title'] or ''}\n{article['content'] or ''}"
+        )
+        cluster_id = result['cluster_id']
+        if cluster_id in leader_keys:
+            followers[leader_keys[cluster_id]].append(article)
+            continue
+        if cluster_id != result['doc_key']:
+            previous = find_previous_result(cursor, cluster_id)
+            if previous is not None:
+                reused.append((article, *previous))
+                continue
+        leader_keys[cluster_id] = (article['platform'], article['id'])
+        followers[leader_keys[cluster_id]] = []
+        leaders.append(article)
+    conn.commit()
+    return leaders, followers, reused
+
+class WatermarkTracker:
+    """追蹤各平台「id 由小到大連續處理完成」的最大來源 id
+
+    文章以完成順序寫入，只有前面的文章都完成後 watermark 才會前進，
+    失敗的文章會擋住 watermark，確保下次執行仍會重試。
+    """
+
+    def __init__(self, articles):
+        self._ids = {}
+        for article in sorted(articles, key=lambda a: a['id']):
+            self._ids.setdefault(article['platform'], []).append(article['id'])
+        self._position = {platform: 0 for platform in self._ids}
+        self._finished = set()
+
+    def finish(self, article):
+        self._finished.add((article['platform'], article['id']))
+
+    def advance(self):
+        """回傳本次可前進的 {平台: 最大連續完成 id}"""
+        latest_ids = {}
+        for platform, ids in self._ids.items():
+            position = self._position[platform]
+            while position < len(ids) and (platform, ids[position]) in self._finished:
+                position += 1
+            if position > self._position[platform]:
+                latest_ids[platform] = ids[position - 1]
+                self._position[platform] = position
+        return latest_ids
 
 def save_to_filtered_news(new_articles):
-    """將處理後的文章存入 filtered_news 並寫入 CSV"""
+    """將處理後的文章逐批存入 filtered_news、記錄處理狀態並附加到 CSV
+
+    每 COMMIT_BATCH_SIZE 篇提交一次，並在同一個交易中寫入 wilson_filtered_news_journal 與進度表；
+    中途當機或 API 中斷時，已提交的 LLM 結果不會遺失，重跑會從中斷處繼續。
+    """
     conn = mysql.connector.connect(**db_config)
     cursor = conn.cursor()
-    inserted_articles = []
-
-    for article in new_articles:
-        # 先檢查是否已存在相同的 article_url 且 summary 不為 NULL
-        cursor.execute("SELECT summary FROM wilson_filtered_news WHERE article_url = %s", (article['article_url'],))
-        existing_summary = cursor.fetchone()
-        
-        if existing_summary and existing_summary[0] is not None:
-            logging.info(f"跳過文章: {article['article_url']}，已有 summary")
-            continue  # 若 summary 已存在則跳過處理
-
-        # 呼叫 OpenAI API 獲取摘要
-        summary = extract_promo_info(article['content'], article['publish_date'])
-        if summary:
-            article['summary'] = summary  
-            query = """
+    tracker = WatermarkTracker(new_articles)
+    batch = []  # (article, status)
+    totals = {'promo': 0, 'no_promo': 0, 'skipped': 0, 'failed': 0}
+
+    def flush():
+        if not batch:
+            return
+        promo_articles = [article for article, status in batch if status == 'promo']
+        if promo_articles:
+            cursor.executemany("""
                 INSERT INTO wilson_filtered_news (platform, title, publish_date, article_url, summary, content)
                 VALUES (%s, %s, %s, %s, %s, %s)
                 ON DUPLICATE KEY UPDATE summary=VALUES(summary), content=VALUES(content)
-            """
-            cursor.execute(query, (
+            """, [(
                 article['platform'],
                 article['title'],
                 article['publish_date'],
                 article['article_url'],
-                summary,
+                article['summary'],
                 article['content']
-            ))
-            inserted_articles.append(article)
+            ) for article in promo_articles])
+        cursor.executemany("""
+            INSERT INTO wilson_filtered_news_journal (platform, source_id, status)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE status=VALUES(status)
+        """, [(article['platform'], article['id'], status) for article, status in batch])
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+        for article, status in batch:
+            if status != 'failed':
+                tracker.finish(article)
+        update_watermarks(cursor, tracker.advance())
 
-    logging.info(f"已儲存 {len(inserted_articles)} 篇文章到 filtered_news")
-    
-    if inserted_articles:
-        df = pd.DataFrame(inserted_articles)
-        df.to_csv("../scrape_results/filtered_news.csv", index=False)
-        logging.info("已更新 filtered_news.csv")
+        # 先附加 CSV 再提交：提交後水位線與處理紀錄即前進，這批文章不會再被處理，
+        # CSV 若在提交後才寫入失敗就永久缺漏；反之 CSV 寫入失敗時不提交，重跑會重新處理（LLM 結果有快取）。
+        # 提交失敗時 CSV 可能多出重複的列，可依 article_url 去重
+        append_to_csv(promo_articles)
+        conn.commit()
+        if promo_articles:
+            sync_search_index()
+        batch.clear()
+
+    followers = {}
+
+    def record(article, status):
+        # 同 cluster 的近似重複文章沿用相同的處理結果（各自以自己的網址寫入）
+        for member in [article] + followers.pop((article['platform'], article['id']), []):
+            if member is not article and status == 'promo':
+                member['summary'] = article['summary']
+            batch.append((member, status))
+            totals[status] += 1
+        if len(batch) >= COMMIT_BATCH_SIZE:
+            flush()
+
+    pending_articles = new_articles
+    if USE_NEAR_DUPLICATES and pending_articles:
+        pending_articles, followers, reused = group_near_duplicates(conn, cursor, pending_articles)
+        duplicate_count = sum(len(members) for members in followers.values()) + len(reused)
+        logging.info(f"近似重複偵測：{duplicate_count} 篇沿用同 cluster 文章的結果（其中 {len(reused)} 篇沿用先前的處理結果），"
+                     f"剩 {len(pending_articles)} 篇待處理")
+        for article, status, summary in reused:
+            if status == 'promo':
+                article['summary'] = summary
+            record(article, status)
+
+    if USE_PREFILTER and pending_articles:
+        candidates = prefilter.filter_articles(pending_articles)
+        logging.info(f"前置篩選略過 {len(pending_articles) - len(candidates)} 篇無行銷用語的文章，"
+                     f"送出 {len(candidates)} 篇給 LLM")
+        candidate_keys = {(a['platform'], a['id']) for a in candidates}
+        for article in pending_articles:
+            if (article['platform'], article['id']) not in candidate_keys:
+                record(article, 'skipped')
+        pending_articles = candidates
+
+    results = extract_promo_info_concurrently(pending_articles)
+    try:
+        # 併發呼叫 OpenAI API 獲取摘要，完成一篇就由主執行緒記錄一篇
+        for article, summary in results:
+            if summary == EXTRACTION_FAILED:
+                record(article, 'failed')
+            elif summary:
+                article['summary'] = summary
+                record(article, 'promo')
+            else:
+                record(article, 'no_promo')
+        flush()
+    finally:
+        results.close()  # 發生例外時取消尚未送出的 LLM 請求
+        cursor.close()
+        conn.close()
+
+    logging.info(f"處理結果: {totals}；已儲存 {totals['promo']} 篇文章到 filtered_news")
 
 def main():
     logging.info("開始處理新文章")
     
     try:
-        latest_urls = get_latest_urls()
-        latest_ids = get_latest_ids(latest_urls)
-        new_articles = get_new_articles(latest_ids)
+        initialize_tables()
+        new_articles = get_new_articles()
 
         if new_articles:
             save_to_filtered_news(new_articles)
@@ -176,6 +552,9 @@ def main():
             logging.info("沒有新文章需要處理")
     except Exception as e:
         logging.error(f"執行過程發生錯誤: {e}")
+    finally:
+        logging.info(f"LLM 快取統計: {llm_cache.stats()}")
+        logging.info(f"前置篩選統計: {prefilter.stats()}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# 快取檔預設位置（相對於執行目錄，與 ./log 相同慣例）
+DEFAULT_CACHE_PATH = "./cache/llm_cache.sqlite3"
+DEFAULT_MAX_ENTRIES = 200000  # 超過此筆數時，依最後使用時間 (LRU) 淘汰
+
+
+def normalize_text(text):
+    """正規化文本：全半形統一 (NFKC)、合併連續空白，讓內容相同但排版不同的文章共用同一筆快取"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class LLMCache:
+    """以 SQLite 保存的 LLM 回應快取，key 為 hash(模型, prompt 版本, 正規化文本)。
+
+    - 同樣內容（跨資料表重複的新聞、失敗後重跑）不會重複計費
+    - 修改 prompt 時請調升 prompt_version，舊快取即自然失效
+    - 多執行緒共用同一個實例是安全的
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        cache_dir = os.path.dirname(path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used_idx ON llm_cache (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    @staticmethod
+    def make_key(model, prompt_version, text):
+        payload = "\x1f".join([model, prompt_version, normalize_text(text)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, model, prompt_version, text):
+        """取得快取的回應，找不到時回傳 None"""
+        key = self.make_key(model, prompt_version, text)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM llm_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE llm_cache SET last_used = ? WHERE cache_key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def set(self, model, prompt_version, text, response):
+        key = self.make_key(model, prompt_version, text)
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                INSERT OR IGNORE INTO llm_cache (cache_key, model, prompt_version, response, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (key, model, prompt_version, response, now, now),
+            )
+            if cursor.rowcount == 0:
+                self._conn.execute(
+                    "UPDATE llm_cache SET response = ?, last_used = ? WHERE cache_key = ?",
+                    (response, now, key),
+                )
+            else:
+                self._size += 1
+            if self._size > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def get_or_call(self, model, prompt_version, text, fn):
+        """命中快取直接回傳；否則呼叫 fn() 取得回應並寫入快取（例外不會被快取）"""
+        cached = self.get(model, prompt_version, text)
+        if cached is not None:
+            return cached
+        response = fn()
+        if response is not None:
+            self.set(model, prompt_version, text, response)
+        return response
+
+    def _evict(self):
+        """一次淘汰到上限的 90%，避免每次寫入都觸發刪除（呼叫端需持有 lock）"""
+        target = int(self.max_entries * 0.9)
+        excess = self._size - target
+        self._conn.execute(
+            """
+            DELETE FROM llm_cache WHERE cache_key IN (
+                SELECT cache_key FROM llm_cache ORDER BY last_used ASC LIMIT ?
+            )
+            """,
+            (excess,),
+        )
+        self._size = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": self._size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
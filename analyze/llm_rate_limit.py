@@ -0,0 +1,60 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from openai import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+
+# 可重試的 OpenAI 錯誤：429、5xx、連線中斷與逾時
+RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APIConnectionError, APITimeoutError)
+
+
+class RateLimiter:
+    """以一分鐘滑動視窗同時限制請求數 (RPM) 與 token 數 (TPM)，供多執行緒共用"""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+        self._events = deque()  # (時間, token 數)
+        self._tokens_in_window = 0
+
+    def acquire(self, tokens):
+        """阻塞直到本次請求可在限額內送出"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._events and now - self._events[0][0] >= 60:
+                    _, used = self._events.popleft()
+                    self._tokens_in_window -= used
+
+                within_rpm = len(self._events) < self.requests_per_minute
+                # 單一請求超過 TPM 時，只要視窗是空的就放行，避免永遠卡住
+                within_tpm = (self._tokens_in_window + tokens <= self.tokens_per_minute
+                              or not self._events)
+                if within_rpm and within_tpm:
+                    self._events.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return
+                wait = 60 - (now - self._events[0][0])
+            time.sleep(max(wait, 0.05))
+
+
+def estimate_tokens(text):
+    """粗估 token 數：中文約一字一 token，保守以字元數計算"""
+    return len(text)
+
+
+def create_completion_with_retry(client, rate_limiter, max_retries=5, base_delay=1.0, **kwargs):
+    """經過限流呼叫 client.chat.completions.create，遇到 429 / 5xx / 連線錯誤時以 jitter 指數退避重試"""
+    tokens = sum(estimate_tokens(m["content"]) for m in kwargs.get("messages", []))
+    for attempt in range(max_retries + 1):
+        rate_limiter.acquire(tokens)
+        try:
+            return client.chat.completions.create(**kwargs)
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            delay = random.uniform(0, min(base_delay * 2 ** attempt, 60))
+            logging.warning(f"OpenAI API 暫時失敗 ({type(e).__name__})，{delay:.1f} 秒後第 {attempt + 1} 次重試")
+            time.sleep(delay)
@@ -0,0 +1,262 @@
+"""
+以 MinHash + LSH 偵測近似重複的文章，並替每篇文章指派 cluster id。
+
+重複的來源包括 PTT 轉貼、Google 以不同網址回傳的同一篇 Dcard 文章，以及同時出現在
+wilson_pchome_news 與 wilson_momo_news 的同一則公告。
+
+- 正規化（NFKC、小寫、去除網址）後，中文每個字、英數每個單字各為一個 token，連續 SHINGLE_SIZE 個 token 為一個 shingle
+- 以 NUM_PERM 個 hash 函式計算 MinHash 簽章，切成 LSH_BANDS 段；任一段完全相同者為候選
+- 候選的簽章相似度（估計的 Jaccard）達 SIMILARITY_THRESHOLD 才視為重複，加入最相似文章的 cluster
+- shingle 少於 MIN_SHINGLES 的短文（一行推文、制式回覆）不計算簽章、各自成群：短文只要共用幾個字
+  相似度就很高，彼此沿用情緒分數或 LLM 結果並不可靠
+- cluster_id 為該 cluster 第一篇文章的 doc_key；cluster_id = doc_key 的文章即為代表
+
+結果存在 MariaDB 的 near_duplicate_clusters / near_duplicate_lsh，寫入文章的程式與下游分析共用。
+各資料表依 id 增量指派：寫入後呼叫 NearDuplicateDetector(conn).assign_new_rows(資料表)，或定期執行：
+
+    python near_duplicates.py
+"""
+import hashlib
+import logging
+import re
+import unicodedata
+import zlib
+
+import mysql.connector
+import numpy as np
+
+# MySQL 資料庫設定
+db_config = {
+    'host': '',
+    'user': '',
+    'password': '',
+    'database': ''
+}
+
+# 以下參數決定簽章與分段方式，修改後需清空兩張資料表重新指派
+SHINGLE_SIZE = 3             # 每個 shingle 的 token 數（中文為逐字）
+NUM_PERM = 128               # MinHash 簽章長度
+LSH_BANDS = 32               # LSH 分段數；每段 4 列，相似度 0.7 的文章成為候選的機率 > 99%
+MINHASH_SEED = 20240101
+SIMILARITY_THRESHOLD = 0.7   # 估計的 Jaccard 相似度達此值才視為重複
+MIN_SHINGLES = 30            # shingle 數少於此值（中文約 30 字以下）的文章不參與比對
+
+FETCH_SIZE = 500             # assign_new_rows 每次取回並提交的文章數
+
+# 資料表 -> 計算相似度的文字欄位
+DEDUP_SOURCES = {
+    "articles": ["article_title", "article_content"],
+    "wilson_search_results": ["title", "content"],
+    "wilson_pchome_news": ["title", "content"],
+    "wilson_momo_news": ["title", "content"],
+}
+
+_rng = np.random.default_rng(MINHASH_SEED)
+# multiply-shift hash：h(x) = ((a * x + b) mod 2^64) >> 32，a 為奇數
+_HASH_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_HASH_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+_ROWS_PER_BAND = NUM_PERM // LSH_BANDS
+
+
+def normalize_tokens(text):
+    """全半形統一、轉小寫並去除網址後，中文逐字、英數逐詞切成 token"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = re.sub(r"https?://\S+", " ", text)
+    return re.findall(r"[\u4e00-\u9fa5]|[a-z0-9]+", text)
+
+
+def shingles(tokens, size=SHINGLE_SIZE):
+    """連續 size 個 token 為一個 shingle；文章短於 size 時整篇為一個 shingle"""
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def minhash_signature(text):
+    """回傳長度 NUM_PERM 的 uint32 簽章；內容過短（shingle 少於 MIN_SHINGLES）時回傳 None，不與其他文章比對"""
+    items = shingles(normalize_tokens(text))
+    if len(items) < MIN_SHINGLES:
+        return None
+    base = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in items), dtype=np.uint64, count=len(items))
+    with np.errstate(over="ignore"):  # 以 uint64 溢位實作 mod 2^64
+        hashed = (_HASH_A[:, None] * base[None, :] + _HASH_B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+def lsh_buckets(signature):
+    """每一段簽章的 hash（有號 64-bit，對應 BIGINT 欄位），回傳 [(段編號, bucket), ...]"""
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND]
+        digest = hashlib.blake2b(rows.tobytes(), digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, "big", signed=True)))
+    return buckets
+
+
+def similarity(signature_a, signature_b):
+    """兩個簽章相同位置相等的比例，即 Jaccard 相似度的估計值"""
+    return float(np.mean(signature_a == signature_b))
+
+
+class NearDuplicateDetector:
+    """以 MariaDB 保存簽章與 LSH bucket 的近似重複偵測器
+
+    conn 可為 pymysql 或 mysql.connector 的連線（使用預設的 tuple cursor）。
+    assign() 不會提交，由呼叫端與自己的寫入一併 commit；assign_new_rows() 每 FETCH_SIZE 篇提交一次。
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def initialize_tables(self):
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS near_duplicate_clusters (
+                doc_key BIGINT AUTO_INCREMENT PRIMARY KEY,
+                source_table VARCHAR(64) NOT NULL,
+                source_id INT NOT NULL,
+                cluster_id BIGINT,
+                similarity FLOAT,
+                signature BLOB,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE KEY source_idx (source_table, source_id),
+                KEY cluster_idx (cluster_id)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS near_duplicate_lsh (
+                band TINYINT NOT NULL,
+                bucket BIGINT NOT NULL,
+                doc_key BIGINT NOT NULL,
+                KEY bucket_idx (band, bucket)
+            )
+        """)
+        self.conn.commit()
+        cursor.close()
+
+    def lookup(self, source_table, source_id):
+        """已指派的文章回傳 {"doc_key", "cluster_id", "similarity"}，否則回傳 None"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT doc_key, cluster_id, similarity FROM near_duplicate_clusters "
+            "WHERE source_table = %s AND source_id = %s",
+            (source_table, source_id),
+        )
+        rows = cursor.fetchall()  # mysql.connector 的 cursor 需讀完結果才能再次使用
+        cursor.close()
+        if not rows:
+            return None
+        return {"doc_key": rows[0][0], "cluster_id": rows[0][1], "similarity": rows[0][2]}
+
+    def representative(self, cluster_id):
+        """cluster 代表文章的 (資料表, id)"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT source_table, source_id FROM near_duplicate_clusters WHERE doc_key = %s", (cluster_id,)
+        )
+        rows = cursor.fetchall()
+        cursor.close()
+        return tuple(rows[0]) if rows else None
+
+    def _best_match(self, cursor, signature, buckets):
+        """LSH 候選中相似度最高且達門檻者，回傳 (cluster_id, 相似度)，沒有則回傳 (None, None)"""
+        conditions = " OR ".join(["(band = %s AND bucket = %s)"] * len(buckets))
+        cursor.execute(
+            f"SELECT DISTINCT doc_key FROM near_duplicate_lsh WHERE {conditions}",
+            [value for bucket in buckets for value in bucket],
+        )
+        candidates = [row[0] for row in cursor.fetchall()]
+        if not candidates:
+            return None, None
+
+        cursor.execute(
+            f"SELECT cluster_id, signature FROM near_duplicate_clusters "
+            f"WHERE doc_key IN ({','.join(['%s'] * len(candidates))})",
+            candidates,
+        )
+        best_cluster, best_score = None, None
+        for cluster_id, blob in cursor.fetchall():
+            score = similarity(signature, np.frombuffer(bytes(blob), dtype=np.uint32))
+            if score >= SIMILARITY_THRESHOLD and (best_score is None or score > best_score):
+                best_cluster, best_score = cluster_id, score
+        return best_cluster, best_score
+
+    def assign(self, source_table, source_id, text):
+        """替一篇文章指派 cluster；已指派過者直接回傳原結果
+
+        回傳 {"doc_key", "cluster_id", "similarity"}；similarity 為與最相似文章的估計值，自成一群時為 None。
+        """
+        existing = self.lookup(source_table, source_id)
+        if existing is not None:
+            return existing
+
+        signature = minhash_signature(text)
+        cursor = self.conn.cursor()
+        cluster_id, score = None, None
+        buckets = []
+        if signature is not None:
+            buckets = lsh_buckets(signature)
+            cluster_id, score = self._best_match(cursor, signature, buckets)
+
+        cursor.execute(
+            "INSERT INTO near_duplicate_clusters (source_table, source_id, cluster_id, similarity, signature) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            (source_table, source_id, cluster_id, score, signature.tobytes() if signature is not None else None),
+        )
+        doc_key = cursor.lastrowid
+        if cluster_id is None:
+            cluster_id = doc_key
+            cursor.execute("UPDATE near_duplicate_clusters SET cluster_id = %s WHERE doc_key = %s", (doc_key, doc_key))
+        if buckets:
+            cursor.executemany(
+                "INSERT INTO near_duplicate_lsh (band, bucket, doc_key) VALUES (%s, %s, %s)",
+                [(band, bucket, doc_key) for band, bucket in buckets],
+            )
+        cursor.close()
+        return {"doc_key": doc_key, "cluster_id": cluster_id, "similarity": score}
+
+    def assign_new_rows(self, source_table):
+        """替 source_table 中 id 大於已指派最大 id 的文章指派 cluster；回傳其中被判定為重複的篇數"""
+        columns = DEDUP_SOURCES[source_table]
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT COALESCE(MAX(source_id), 0) FROM near_duplicate_clusters WHERE source_table = %s",
+            (source_table,),
+        )
+        last_id = cursor.fetchall()[0][0]
+
+        duplicates = 0
+        while True:
+            cursor.execute(
+                f"SELECT id, {', '.join(columns)} FROM {source_table} WHERE id > %s ORDER BY id LIMIT %s",
+                (last_id, FETCH_SIZE),
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            for row in rows:
+                result = self.assign(source_table, row[0], "\n".join(part for part in row[1:] if part))
+                if result["cluster_id"] != result["doc_key"]:
+                    duplicates += 1
+            self.conn.commit()
+            last_id = rows[-1][0]
+        cursor.close()
+        return duplicates
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    conn = mysql.connector.connect(**db_config)
+    detector = NearDuplicateDetector(conn)
+    detector.initialize_tables()
+    for source_table in DEDUP_SOURCES:
+        try:
+            duplicates = detector.assign_new_rows(source_table)
+            logging.info(f"{source_table}: 新增 {duplicates} 篇近似重複的文章")
+        except mysql.connector.Error as e:
+            logging.warning(f"略過 {source_table}: {e}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import logging
+import os
+import pickle
+import random
+import re
+import mysql.connector
+
+# scikit-learn 為選用套件；未安裝時只使用關鍵字規則
+try:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+except ImportError:
+    make_pipeline = None
+
+MODEL_PATH = "./cache/promo_prefilter.pkl"
+NEWS_SOURCES = [('PChome', 'wilson_pchome_news'), ('Momo', 'wilson_momo_news')]  # 與 filtered_news.NEWS_SOURCES 相同
+MODEL_THRESHOLD = 0.2  # 線性模型判定「需要送 LLM」的機率門檻，寧可多送也不要漏掉活動
+VETO_THRESHOLD = 0.02  # 關鍵字命中但模型機率低於此值時視為誤判（例如財報、物流新聞），不送 LLM
+
+# 行銷活動常見用語；命中任何一個就交給 LLM 判斷
+# 單字「送」「會員」「券」與單獨的百分比在一般企業新聞也很常見（配送、會員數、證券、營收年增 15%），只保留活動的固定說法
+PROMO_PATTERNS = [
+    r"折扣", r"折價", r"打折", r"現折", r"\d+\s*折", r"折抵",
+    r"滿額", r"滿\s*\d+\s*[元送折現]", r"滿千", r"滿萬",
+    r"優惠", r"特價", r"促銷", r"下殺", r"限時", r"限量", r"搶購", r"秒殺",
+    r"贈品", r"加贈", r"滿\s*\d*\s*送", r"買\s*\d*\s*送", r"加碼", r"回饋", r"返利", r"紅利", r"點數", r"P幣", r"mo幣",
+    r"(?:折價|優惠|折扣|抵用|購物|現金|兌換|禮)券", r"領券", r"免運", r"抽獎", r"會員日", r"會員獨享", r"刷卡", r"分期", r"\d+\s*%\s*(?:off|回饋)",
+    r"週年慶", r"雙11", r"雙12", r"母親節", r"父親節", r"618",
+]
+PROMO_REGEX = re.compile("|".join(PROMO_PATTERNS), re.IGNORECASE)
+
+
+def lexicon_hits(text):
+    """回傳文本命中的行銷用語數量"""
+    return len(PROMO_REGEX.findall(text or ""))
+
+
+def load_labelled_history(db_config):
+    """從處理紀錄 (wilson_filtered_news_journal) 建立標記資料：LLM 判定有活動者為 1、無活動者為 0
+
+    只取 LLM 實際判斷過的文章；前置篩選略過 (skipped) 與呼叫失敗 (failed) 者不列入，
+    避免模型以自己略過的文章當作負例重新訓練，越訓練越傾向略過。
+    """
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor(dictionary=True)
+    samples = []
+
+    for platform, table in NEWS_SOURCES:
+        cursor.execute(f"""
+            SELECT n.title, n.content, (j.status = 'promo') AS label
+            FROM wilson_filtered_news_journal j
+            INNER JOIN {table} n ON n.id = j.source_id
+            WHERE j.platform = %s AND j.status IN ('promo', 'no_promo')
+        """, (platform,))
+        samples.extend(
+            (f"{row['title'] or ''}\n{row['content'] or ''}", int(row['label']))
+            for row in cursor.fetchall()
+        )
+
+    cursor.close()
+    conn.close()
+    return samples
+
+
+def train_model(samples, path=MODEL_PATH):
+    """以字元 n-gram + 邏輯迴歸訓練輕量模型並存檔 (path 為 None 時不存檔)；未安裝 scikit-learn 時回傳 None"""
+    if make_pipeline is None:
+        logging.warning("未安裝 scikit-learn，僅使用關鍵字規則")
+        return None
+
+    texts = [text for text, _ in samples]
+    labels = [label for _, label in samples]
+    if len(set(labels)) < 2:
+        logging.warning("標記資料只有單一類別，無法訓練模型")
+        return None
+
+    model = make_pipeline(
+        TfidfVectorizer(analyzer="char", ngram_range=(1, 2), min_df=2, max_features=50000),
+        LogisticRegression(class_weight="balanced", max_iter=1000),
+    )
+    model.fit(texts, labels)
+    if path is None:
+        return model
+
+    model_dir = os.path.dirname(path)
+    if model_dir and not os.path.exists(model_dir):
+        os.makedirs(model_dir)
+    with open(path, "wb") as f:
+        pickle.dump(model, f)
+    logging.info(f"已訓練前置篩選模型，樣本數: {len(samples)}，存於 {path}")
+    return model
+
+
+def load_model(path=MODEL_PATH):
+    if make_pipeline is None or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class PromoPrefilter:
+    """本機 CPU 前置篩選：決定哪些文章值得送 LLM 判斷
+
+    沒有模型時關鍵字命中即送出。有模型時：未命中者機率高於 threshold 也送出；
+    命中者機率低於 veto_threshold 時由模型否決（關鍵字誤判），不送出。
+    """
+
+    def __init__(self, model=None, threshold=MODEL_THRESHOLD, veto_threshold=VETO_THRESHOLD):
+        self.model = model
+        self.threshold = threshold
+        self.veto_threshold = veto_threshold
+        self.checked = 0
+        self.skipped = 0
+
+    def needs_llm_batch(self, texts):
+        decisions = [lexicon_hits(text) > 0 for text in texts]
+        if self.model is not None and texts:
+            probs = self.model.predict_proba(texts)[:, 1]
+            decisions = [
+                bool(prob >= (self.veto_threshold if hit else self.threshold))
+                for hit, prob in zip(decisions, probs)
+            ]
+
+        self.checked += len(decisions)
+        self.skipped += decisions.count(False)
+        return decisions
+
+    def filter_articles(self, articles):
+        """回傳需要送 LLM 的文章"""
+        texts = [f"{a.get('title') or ''}\n{a.get('content') or ''}" for a in articles]
+        return [a for a, keep in zip(articles, self.needs_llm_batch(texts)) if keep]
+
+    def stats(self):
+        return {"checked": self.checked, "api_calls_saved": self.skipped}
+
+
+def evaluate(prefilter, samples):
+    """以標記資料評估前置篩選：recall 為活動文章被送進 LLM 的比例，precision 為送出者中真有活動的比例"""
+    decisions = prefilter.needs_llm_batch([text for text, _ in samples])
+    labels = [label for _, label in samples]
+
+    tp = sum(1 for d, y in zip(decisions, labels) if d and y)
+    fp = sum(1 for d, y in zip(decisions, labels) if d and not y)
+    fn = sum(1 for d, y in zip(decisions, labels) if not d and y)
+    sent = tp + fp
+
+    return {
+        "samples": len(samples),
+        "recall": round(tp / (tp + fn), 4) if tp + fn else 1.0,
+        "precision": round(tp / sent, 4) if sent else 0.0,
+        "missed_promos": fn,
+        "api_calls_saved": len(samples) - sent,
+        "api_calls_saved_ratio": round((len(samples) - sent) / len(samples), 4) if samples else 0.0,
+    }
+
+
+def main(db_config):
+    """以歷史資料訓練模型，並列出不同設定下的 recall / precision / 省下的 API 呼叫數"""
+    samples = load_labelled_history(db_config)
+    print(f"標記資料: {len(samples)} 筆，其中活動 {sum(label for _, label in samples)} 筆")
+
+    # 固定亂數切出 20% 驗證集，避免以訓練資料評估而高估 recall
+    random.Random(0).shuffle(samples)
+    split = int(len(samples) * 0.8)
+    train_samples, test_samples = samples[:split], samples[split:]
+
+    print(f"[僅關鍵字] {evaluate(PromoPrefilter(), test_samples)}")
+
+    model = train_model(train_samples, path=None)
+    if model is not None:
+        for threshold in [0.05, 0.1, 0.2, 0.3, 0.5]:
+            print(f"[關鍵字 + 模型, 門檻 {threshold}] {evaluate(PromoPrefilter(model, threshold), test_samples)}")
+        for veto_threshold in [0, 0.01, 0.02, 0.05]:
+            print(f"[關鍵字 + 模型, 否決門檻 {veto_threshold}] "
+                  f"{evaluate(PromoPrefilter(model, veto_threshold=veto_threshold), test_samples)}")
+        # 以全部資料重新訓練並存檔，供 filtered_news.py 使用
+        train_model(samples)
+
+
+if __name__ == "__main__":
+    # 與 filtered_news.py 相同的資料庫設定；不直接 import filtered_news，以免為了讀設定而建立 OpenAI client、設定 log 並載入模型
+    main({
+        'host': '',
+        'user': '',
+        'password': '',
+        'database': ''
+    })
@@ -1,11 +1,49 @@
+import os
+import sys
+import multiprocessing
 import pymysql
 import re
 import jieba
+import numpy as np
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI 
 
+# 與 analyze/filtered_news.py 共用 LLM 回應快取與限流
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analyze"))
+from llm_cache import LLMCache
+from llm_rate_limit import RateLimiter, create_completion_with_retry
+from near_duplicates import NearDuplicateDetector
+# 與文字雲、詞頻圖共用的斷詞結果
+from token_store import TokenStore, tokenize
+
 # 手動設置金鑰；使用者需在此替換 API Key
 client = OpenAI(api_key="sk-.....") 
 
+# LLM 回應快取；修改 sentiment_analysis 的 prompt 時請調升版本號
+SENTIMENT_MODEL = "gpt-3.5-turbo"
+SENTIMENT_PROMPT_VERSION = "sentiment-v1"
+llm_cache = LLMCache()
+token_store = TokenStore()
+
+# ====== OpenAI 併發與限流設定（依帳號等級調整） ======
+ARTICLE_WORKERS = 4          # 同時評分的文章數
+CHUNK_WORKERS = 8            # 所有文章共用、同時送出的段落請求數上限
+REQUESTS_PER_MINUTE = 3500
+TOKENS_PER_MINUTE = 90000
+MAX_RETRIES = 5
+UPDATE_BATCH_SIZE = 50       # 每累積幾筆分數才批次 UPDATE 並提交一次
+
+rate_limiter = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
+# 段落評分的執行緒池由所有文章共用，總併發量不會隨文章數放大
+chunk_executor = ThreadPoolExecutor(max_workers=CHUNK_WORKERS)
+
+# ====== 評分引擎："gpt"（呼叫 OpenAI）或 "lexicon"（本機情感詞典，離線、免費） ======
+SCORER = "gpt"
+
+# ====== 近似重複（PTT 轉貼）只評分同 cluster 中 id 最小的一篇，其餘直接沿用分數 ======
+USE_NEAR_DUPLICATES = True
+
 # ====== 資料庫連線設定 ======
 db_config = {
     'host': '',
@@ -16,6 +54,11 @@ db_config = {
 }
 
 
+# ====== 前處理（清洗＋斷詞）平行化設定 ======
+PREPROCESS_WORKERS = os.cpu_count() or 1  # 設為 1 則不開子行程
+FETCH_CHUNK_SIZE = 500                     # 每次從資料庫取出的未評分文章數
+
+
 # ====== 分析文章內容時，遇到以下 停用詞表 ，會自行刪除該詞，可自行增減 ====== 
 STOP_WORDS = set([
     "的", "了", "是", "在", "我", "有", "這", "就", "也", "都", "嗎",
@@ -24,40 +67,141 @@ STOP_WORDS = set([
 ])
 
 
-def clean_text(text):
+def filter_tokens(tokens, stop_words=STOP_WORDS):
     """
-    先行文本清洗：移除網址、多餘標點等
+    移除停用詞並以空白串接，作為送給情感分析的文本
     """
-    # 去除 URL
-    text = re.sub(r'http[s]?://\S+', '', text)
-
-    # 只保留中英數字（其他符號一律變空白）
-    text = re.sub(r'[^A-Za-z0-9\u4e00-\u9fa5]+', ' ', text)
-
-    # 去除多餘空白
-    text = text.strip()
-    text = re.sub(r'\s+', ' ', text)
-    return text
+    return " ".join(w for w in tokens if w not in stop_words)
 
 
 def tokenize_and_filter(text):
     """
     使用 jieba 斷詞＋移除停用詞
     """
-    words = jieba.lcut(text)
-    filtered = [w for w in words if w not in STOP_WORDS]
-    # 再次處理空白 (確保前面沒有空白)
-    filtered_text = " ".join(filtered)
-    filtered_text = re.sub(r'\s+', ' ', filtered_text).strip()
-    return filtered_text
+    return filter_tokens(tokenize(text))
+
+
+def preprocess(raw_content):
+    """清洗＋斷詞＋過濾停用詞，回傳送給情感分析的文本"""
+    return tokenize_and_filter(raw_content)
+
+
+def _init_preprocess_worker():
+    # 每個子行程啟動時只載入一次 jieba 字典，避免第一篇文章才延遲載入
+    jieba.initialize()
+
+
+def create_preprocess_pool(workers=PREPROCESS_WORKERS):
+    """建立前處理用的行程池；workers 為 1 時回傳 None（於主行程處理）"""
+    if workers <= 1:
+        return None
+    return multiprocessing.Pool(workers, initializer=_init_preprocess_worker)
+
+
+def preprocess_rows(rows, pool=None, stop_words=STOP_WORDS):
+    """逐篇產出 (row, final_text)，讓評分可邊收邊做
+
+    斷詞結果取自共用的 token_store；內容未變更的文章直接讀取，其餘由行程池平行清洗與斷詞並寫回。
+    stop_words 由評分器決定（詞典評分需保留否定詞與程度副詞）。
+    """
+    for row, tokens in token_store.tokenize_rows(rows, pool):
+        yield row, filter_tokens(tokens, stop_words)
+
+
+# 同 cluster 中已有 id 較小的 articles 文章（由它評分後再複製分數）
+HAS_EARLIER_DUPLICATE = """
+    EXISTS (
+        SELECT 1
+        FROM near_duplicate_clusters c
+        INNER JOIN near_duplicate_clusters r
+            ON r.cluster_id = c.cluster_id AND r.source_table = 'articles' AND r.source_id < c.source_id
+        WHERE c.source_table = 'articles' AND c.source_id = a.id
+    )
+"""
+
+
+def iter_unscored_chunks(conn, chunk_size=FETCH_CHUNK_SIZE, skip_duplicates=False):
+    """依 id 順序分批取出 sentiment_score 為 NULL 的文章（server-side cursor，記憶體只保留一批）
+
+    skip_duplicates 為 True 時略過近似重複的文章，分數由 copy_duplicate_scores() 補上。
+    """
+    duplicate_filter = f"AND NOT {HAS_EARLIER_DUPLICATE}" if skip_duplicates else ""
+    last_id = 0
+    while True:
+        with conn.cursor(pymysql.cursors.SSDictCursor) as cursor:
+            cursor.execute(f"""
+                SELECT a.id, a.keyword, a.article_content, a.article_date
+                FROM articles a
+                WHERE a.sentiment_score IS NULL AND a.id > %s {duplicate_filter}
+                ORDER BY a.id
+                LIMIT %s
+            """, (last_id, chunk_size))
+            chunk = list(cursor)
+        if not chunk:
+            return
+        last_id = chunk[-1]['id']
+        yield chunk
+
+
+def score_chunk(chunk):
+    """對單一段落呼叫 GPT 取得 0~100 分數（clamp 後），失敗或無法解析時回傳 None"""
+    # 在 Prompt 中給出更具體規則
+    prompt_content = (
+        "請分析以下文本的情感，並給出 0 到 100 的整數分數（只輸出數字）。\n\n"
+        "如果該文本看起來都是在生氣、抱怨、負面內容，請在 0～40 之間；"
+        "若是大多負面但有一點客觀敘述，請在 41～50；若偏中立請在 51～60；"
+        "若有小部分正面請在 61～70；正面佔多數請在 71～80；非常正面請在 81～90；"
+        "極度正面請在 91～100。\n\n"
+        "請不要多做任何解釋，只能回傳整數。若無法確定，請給大約 50。\n\n"
+        f"以下是文本：{chunk}"
+    )
+
+    def call_api():
+        response = create_completion_with_retry(
+            client, rate_limiter, max_retries=MAX_RETRIES,
+            model=SENTIMENT_MODEL, # 可依照需求調整模型
+            messages=[
+                {"role": "system", "content": "你是情感分析助手。"},
+                {"role": "user", "content": prompt_content}
+            ],
+            temperature=0.0
+        )
+        return response.choices[0].message.content
+
+    try:
+        # 解析 GPT 回應（相同段落優先取用快取）
+        answer = llm_cache.get_or_call(SENTIMENT_MODEL, SENTIMENT_PROMPT_VERSION, chunk, call_api).strip()
+    except Exception as e:
+        print(f"OpenAI API 呼叫失敗：{e}")
+        return None
+
+    # 只取數字部分
+    score_str = re.sub(r'[^0-9]', '', answer)
+    if score_str == "":
+        print(f"無法解析分數：{answer}")
+        return None
+
+    try:
+        score_int = int(score_str)
+    except ValueError:
+        print(f"無法轉成整數：{answer}")
+        return None
+
+    # ============== 做 clamp 保證分數介於 0～100 ==============
+    if score_int < 0:
+        score_int = 0
+    elif score_int > 100:
+        score_int = 100
+
+    return score_int
 
 
 def sentiment_analysis(text):
     """
     呼叫 ChatGPT
     - 若超過 2000 字，做 chunk 分段
-    - 對每段文本呼叫 GPT，要求只回傳「0~100」整數分數，最後取平均
-    - 加入更詳盡的規則 + clamp(0~100) 處理
+    - 各段同時送出（共用 chunk_executor 與限流器），要求只回傳「0~100」整數分數，最後取平均
+    - 個別段落失敗時以其餘段落平均，全部失敗才回傳 None
     """
     max_chunk_length = 2000
     if len(text) > max_chunk_length:
@@ -65,119 +209,237 @@ def sentiment_analysis(text):
     else:
         chunks = [text]
 
-    total_score = 0
-    for chunk in chunks:
-        # 在 Prompt 中給出更具體規則
-        prompt_content = (
-            "請分析以下文本的情感，並給出 0 到 100 的整數分數（只輸出數字）。\n\n"
-            "如果該文本看起來都是在生氣、抱怨、負面內容，請在 0～40 之間；"
-            "若是大多負面但有一點客觀敘述，請在 41～50；若偏中立請在 51～60；"
-            "若有小部分正面請在 61～70；正面佔多數請在 71～80；非常正面請在 81～90；"
-            "極度正面請在 91～100。\n\n"
-            "請不要多做任何解釋，只能回傳整數。若無法確定，請給大約 50。\n\n"
-            f"以下是文本：{chunk}"
-        )
+    scores = [score for score in chunk_executor.map(score_chunk, chunks) if score is not None]
+    if not scores:
+        return None
+    if len(scores) < len(chunks):
+        print(f"{len(chunks) - len(scores)}/{len(chunks)} 段評分失敗，以其餘段落平均。")
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo", # 可依照需求調整模型
-            messages=[
-                {"role": "system", "content": "你是情感分析助手。"},
-                {"role": "user", "content": prompt_content}
-            ],
-            temperature=0.0
-        )
+    # 若有分段，取平均
+    final_score = sum(scores) / len(scores)
+    return final_score
 
-        # 解析 GPT 回應
-        answer = response.choices[0].message.content.strip()
-        # 只取數字部分
-        score_str = re.sub(r'[^0-9]', '', answer)
-        if score_str == "":
-            print(f"無法解析分數：{answer}")
-            return None
 
-        try:
-            score_int = int(score_str)
-        except ValueError:
-            print(f"無法轉成整數：{answer}")
-            return None
+# ====== 本機情感詞典（可於下方檔案路徑以每行一詞的方式擴充，例如 NTUSD） ======
+POSITIVE_LEXICON_PATH = os.path.expanduser("~/.sentiment/positive.txt")
+NEGATIVE_LEXICON_PATH = os.path.expanduser("~/.sentiment/negative.txt")
+
+POSITIVE_WORDS = {
+    "好", "棒", "讚", "推", "推薦", "滿意", "喜歡", "開心", "感謝", "謝謝", "優惠", "划算", "便宜",
+    "快速", "很快", "迅速", "準時", "方便", "順利", "貼心", "親切", "專業", "用心", "值得", "不錯",
+    "優質", "完美", "超值", "好用", "好吃", "實惠", "安心", "放心", "穩定", "效率",
+    "驚喜", "成功", "解決", "退款成功", "補償", "耐心", "積極", "負責", "正常", "清楚", "良好",
+}
+NEGATIVE_WORDS = {
+    "差", "爛", "糟", "糟糕", "慢", "很慢", "延遲", "延誤", "遲遲", "拖", "氣", "生氣", "火大", "傻眼",
+    "無言", "失望", "誇張", "扯", "離譜", "不爽", "不滿", "不好", "不行", "不推", "問題", "瑕疵",
+    "壞", "壞掉", "損壞", "破損", "缺貨", "取消", "退貨", "退款", "客訴", "投訴", "申訴", "詐騙",
+    "騙", "爛透", "垃圾", "敷衍", "推託", "踢皮球", "態度差", "等很久", "消失", "錯誤", "糾紛",
+    "麻煩", "困擾", "擔心", "後悔", "雷", "地雷", "可惜", "遺憾", "抱歉", "賠償", "盜刷", "被盜",
+}
+NEGATION_WORDS = {"不", "不會", "不是", "不太", "不夠", "沒", "沒有", "未", "無", "別", "非", "並非", "不再"}
+INTENSIFIER_WEIGHTS = {
+    "很": 1.5, "非常": 1.8, "超": 1.8, "超級": 2.0, "太": 1.6, "極": 2.0, "極度": 2.0, "特別": 1.5,
+    "相當": 1.5, "十分": 1.6, "最": 1.8, "真": 1.3, "真的": 1.3, "有夠": 1.8,
+    "有點": 0.6, "有些": 0.6, "稍微": 0.5, "略": 0.5, "還算": 0.7,
+}
+NEGATION_WINDOW = 2       # 否定詞影響其後幾個詞
+LEXICON_SMOOTHING = 2.0   # 情感詞很少時往中立收斂
+NEUTRAL_SCORE = 55.0      # 與 GPT prompt 的「偏中立 51～60」對齊
+SCORE_SPREAD = 45.0       # 全負面 -> 10，全正面 -> 100
 
-        # ============== 做 clamp 保證分數介於 0～100 ==============
-        if score_int < 0:
-            score_int = 0
-        elif score_int > 100:
-            score_int = 100
 
-        total_score += score_int
+def _load_words(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
 
-    # 若有分段，取平均
-    final_score = total_score / len(chunks)
-    return final_score
+
+class SentimentScorer(ABC):
+    """評分器介面：score_batch(texts) 依序回傳每篇文本 0~100 的分數，失敗時為 None
+
+    stop_words 為送進 score_batch 之前要移除的停用詞。
+    """
+
+    name = "base"
+    stop_words = STOP_WORDS
+
+    @abstractmethod
+    def score_batch(self, texts):
+        """texts 為以空白串接的斷詞結果"""
+
+
+class GPTScorer(SentimentScorer):
+    """呼叫 OpenAI 評分，多篇文章同時進行"""
+
+    name = "gpt"
+
+    def __init__(self, workers=ARTICLE_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def score_batch(self, texts):
+        # Executor.map 會立即送出所有文章，並依原順序回傳結果
+        return self.executor.map(sentiment_analysis, texts)
+
+
+class LexiconScorer(SentimentScorer):
+    """以中文情感詞典對 jieba 斷詞結果評分（離線）
+
+    - 否定詞會反轉其後 NEGATION_WINDOW 個詞內第一個情感詞的極性
+    - 程度副詞會放大 / 縮小緊接的情感詞權重
+    - 以 r = (正 - 負) / (正 + 負 + 平滑) 映射到 NEUTRAL_SCORE ± SCORE_SPREAD，
+      與 GPT prompt 的分數區間（0～40 負面、51～60 中立、81 以上非常正面）對齊
+    """
+
+    name = "lexicon"
+    # 停用詞中的「不」、「很」是否定詞與程度副詞，詞典評分需保留
+    stop_words = STOP_WORDS - NEGATION_WORDS - set(INTENSIFIER_WEIGHTS)
+
+    def __init__(self):
+        positive = POSITIVE_WORDS | _load_words(POSITIVE_LEXICON_PATH)
+        negative = NEGATIVE_WORDS | _load_words(NEGATIVE_LEXICON_PATH)
+        self.polarity = {word: 1.0 for word in positive}
+        self.polarity.update({word: -1.0 for word in negative})
+
+    def weigh(self, tokens):
+        """回傳 (正向權重總和, 負向權重總和)"""
+        positive = negative = 0.0
+        negate_left = 0
+        weight = 1.0
+        for token in tokens:
+            if token in NEGATION_WORDS:
+                negate_left = NEGATION_WINDOW
+                continue
+            if token in INTENSIFIER_WEIGHTS and token not in self.polarity:
+                weight *= INTENSIFIER_WEIGHTS[token]
+                continue
+
+            polarity = self.polarity.get(token)
+            if polarity is not None:
+                if negate_left:
+                    polarity = -polarity
+                    negate_left = 0
+                if polarity > 0:
+                    positive += weight
+                else:
+                    negative += weight
+            elif negate_left:
+                negate_left -= 1
+            weight = 1.0
+        return positive, negative
+
+    def score_batch(self, texts):
+        weights = np.array([self.weigh(text.split()) for text in texts], dtype=float).reshape(-1, 2)
+        positive, negative = weights[:, 0], weights[:, 1]
+        ratio = (positive - negative) / (positive + negative + LEXICON_SMOOTHING)
+        scores = np.clip(NEUTRAL_SCORE + SCORE_SPREAD * ratio, 0, 100)
+        return np.round(scores, 2).tolist()
+
+
+def create_scorer(name=SCORER):
+    if name == "lexicon":
+        return LexiconScorer()
+    if name == "gpt":
+        return GPTScorer()
+    raise ValueError(f"未知的評分引擎: {name}")
+
+
+def write_scores(conn, cursor, updates):
+    """批次更新 sentiment_score 並提交"""
+    if not updates:
+        return
+    cursor.executemany("UPDATE articles SET sentiment_score = %s WHERE id = %s", updates)
+    conn.commit()
+    print(f"已批次更新 {len(updates)} 筆 sentiment_score。")
+    updates.clear()
+
+
+def copy_duplicate_scores(conn, cursor):
+    """近似重複的文章沿用同 cluster 中 id 較小、已評分文章的分數"""
+    cursor.execute("""
+        UPDATE articles a
+        INNER JOIN near_duplicate_clusters c ON c.source_table = 'articles' AND c.source_id = a.id
+        INNER JOIN near_duplicate_clusters r
+            ON r.cluster_id = c.cluster_id AND r.source_table = 'articles' AND r.source_id < a.id
+        INNER JOIN articles s ON s.id = r.source_id
+        SET a.sentiment_score = s.sentiment_score
+        WHERE a.sentiment_score IS NULL AND s.sentiment_score IS NOT NULL
+    """)
+    conn.commit()
+    print(f"近似重複文章沿用分數：{cursor.rowcount} 筆。")
 
 
 def main():
-   """
-    主函數：從 articles 表中讀取文章內容，並進行情感分析。
-    1. 從資料庫中讀取以下欄位：
+    """
+    主函數：從 articles 表中讀取尚未評分的文章內容，並進行情感分析。
+    1. 只讀取 sentiment_score 為 NULL 的文章（已有分數者不再評分，確保分數一致性，並節省資源），欄位：
        - id: 文章的唯一識別碼
        - keyword: 文章的關鍵字
        - article_content: 文章的內容
        - article_date: 文章的日期
-       - sentiment_score: 文章的情感分數（若為 NULL 表示尚未分析）
-    2. 檢查 sentiment_score 是否已經有值：
-       - 若已有值，則跳過該文章，避免重複分析（確保分數一致性，並節省資源）。
-       - 若為 NULL，則進行文本清洗、分詞與情感分析，並將結果更新回資料庫。
+    2. 依 id 順序每次取 FETCH_CHUNK_SIZE 筆，記憶體用量與資料表大小無關；沒有待評分文章時立即結束。
+    3. 清洗與斷詞由多個子行程平行處理，結果串流給情感分析；多篇文章同時評分，
+       分數累積 UPDATE_BATCH_SIZE 筆後批次更新回資料庫。
+    4. SCORER 可切換為 "lexicon"，以本機情感詞典離線評分（不需網路與 API Key）。
+    5. USE_NEAR_DUPLICATES 時先替新文章指派近似重複的 cluster，轉貼文不再評分，完成後沿用原文的分數。
     """
     try:
-        # 連接到資料庫
+        # 連接到資料庫：讀取 (server-side cursor) 與寫入各用一條連線
+        read_conn = pymysql.connect(**db_config)
         conn = pymysql.connect(**db_config)
         cursor = conn.cursor(pymysql.cursors.DictCursor)
 
-        # 將 sentiment_score 一起撈出來，判斷是否為 None
-        cursor.execute("""
-            SELECT id, keyword, article_content, article_date, sentiment_score
-            FROM articles
-        """)
-        rows = cursor.fetchall()
-
-        for row in rows:
-            article_id = row['id']
-            keyword = row['keyword']
-            article_date = row['article_date'] or ""
-            raw_content = row['article_content'] or ""
-            existing_score = row['sentiment_score']  # 可能是 None 或已經有數字
-
-            # 如果已經有分數了，就跳過!避免出現每次執行AI判斷分數不同，保持已經爬取過的文章不被再次評分。
-            if existing_score is not None:
-                print(f"ID={article_id} 已經有 sentiment_score={existing_score}，跳過情感分析。")
-                print("-" * 50)
-                continue
-
-            print(f"=== 處理 ID={article_id}, Keyword={keyword}, Date={article_date} ===")
-
-            # 1) 清洗
-            cleaned_text = clean_text(raw_content)
-            # 2) 斷詞 & 過濾停用詞
-            final_text = tokenize_and_filter(cleaned_text)
+        # 讓「sentiment_score IS NULL 且 id > ?」可以直接走索引
+        cursor.execute("CREATE INDEX IF NOT EXISTS articles_score_id_idx ON articles (sentiment_score, id)")
 
-            # 3) 情感分析
-            score = sentiment_analysis(final_text)
-            if score is None:
-                print("情感分析失敗，跳過。")
-                continue
+        if USE_NEAR_DUPLICATES:
+            detector = NearDuplicateDetector(conn)
+            detector.initialize_tables()
+            print(f"近似重複偵測：新增 {detector.assign_new_rows('articles')} 篇轉貼文章。")
 
-            print(f"分析結果分數: {score:.2f}")
+        scorer = create_scorer()
+        print(f"使用評分引擎: {scorer.name}")
 
-            # 4) 更新 sentiment_score 欄位到 DB
-            update_sql = """UPDATE articles SET sentiment_score = %s WHERE id = %s"""
-            cursor.execute(update_sql, (score, article_id))
-            conn.commit()
-
-            print(f"已更新 ID={article_id} 的 sentiment_score。")
-            print("-" * 50)
+        pool = create_preprocess_pool()
+        pending_updates = []  # (score, id)
+        try:
+            for chunk in iter_unscored_chunks(read_conn, skip_duplicates=USE_NEAR_DUPLICATES):
+                # 1) 清洗 2) 斷詞 & 過濾停用詞（平行處理），邊產出邊交給評分器 3) 情感分析
+                rows = []
+
+                def texts():
+                    for row, final_text in preprocess_rows(chunk, pool, scorer.stop_words):
+                        rows.append(row)
+                        yield final_text
+
+                for row_index, score in enumerate(scorer.score_batch(texts())):
+                    row = rows[row_index]
+                    article_id = row['id']
+                    if score is None:
+                        print(f"ID={article_id} 情感分析失敗，跳過。")
+                        continue
+
+                    print(f"ID={article_id}, Keyword={row['keyword']}, Date={row['article_date'] or ''} 分析結果分數: {score:.2f}")
+
+                    # 4) 累積後批次更新 sentiment_score 欄位到 DB
+                    pending_updates.append((score, article_id))
+                    if len(pending_updates) >= UPDATE_BATCH_SIZE:
+                        write_scores(conn, cursor, pending_updates)
+
+            write_scores(conn, cursor, pending_updates)
+            if USE_NEAR_DUPLICATES:
+                copy_duplicate_scores(conn, cursor)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
 
         cursor.close()
         conn.close()
+        read_conn.close()
         print("所有資料處理完成。")
+        print(f"LLM 快取統計: {llm_cache.stats()}")
 
     except pymysql.MySQLError as e:
         print(f"資料庫錯誤: {e}")
@@ -1,6 +1,7 @@
 import pymysql
+import pandas as pd
 import matplotlib.pyplot as plt
-from collections import defaultdict
+from score_stats import score_statistics  # 與分數表、圓餅圖共用的分數統計
 from datetime import datetime
 
 # ======= 資料庫連線設定 =======
@@ -12,10 +13,9 @@ db_config = {
     'database': ''
 }
 
-# 讀取資料庫資料並根據年份進行分組
+# 讀取資料庫資料
 def read_data_from_db():
-    pchome_scores_by_year = defaultdict(list)
-    momo_scores_by_year = defaultdict(list)
+    rows = []
 
     try:
         # 連接資料庫
@@ -40,47 +40,24 @@ def read_data_from_db():
             cursor.execute(query)
             rows = cursor.fetchall()
 
-            for row in rows:
-                keyword = row['keyword']
-                sentiment_score = float(row['sentiment_score'])
-                article_date = row['article_date']
-
-                # 確保日期有效
-                if not article_date:
-                    continue
-
-                try:
-                    # 取得文章的年份
-                    year = article_date.year  # 如果 article_date 是 datetime 格式
-                except AttributeError:
-                    try:
-                        year = datetime.strptime(article_date, '%Y-%m-%d').year
-                    except ValueError:
-                        continue
-
-                # 根據 keyword 分組資料
-                if keyword.lower() == "pchome":
-                    pchome_scores_by_year[year].append(sentiment_score)
-                elif keyword.lower() == "momo":
-                    momo_scores_by_year[year].append(sentiment_score)
-
     except pymysql.MySQLError as e:
         print("資料庫連線或查詢時發生錯誤:", e)
     finally:
         if 'connection' in locals():
             connection.close()
 
-    return pchome_scores_by_year, momo_scores_by_year
+    return pd.DataFrame(rows, columns=['keyword', 'sentiment_score', 'article_date'])
 
-# 計算每年平均的情感分數
-def calculate_average_sentiment(scores_by_year):
-    avg_scores_by_year = {}
-    for year, scores in scores_by_year.items():
-        avg_scores_by_year[year] = sum(scores) / len(scores)
-    return avg_scores_by_year
+# 計算 PChome、momo 每年平均的情感分數（keyword 不分大小寫），回傳兩組 {年份: 平均分數}
+def calculate_average_sentiment(df):
+    stats = score_statistics(df['keyword'].str.lower(), df['sentiment_score'], dates=df['article_date'])
+    return (
+        stats.get('pchome', {}).get('yearly_mean', {}),
+        stats.get('momo', {}).get('yearly_mean', {}),
+    )
 
 # 畫出情感分析隨時間變化的折線圖
-def plot_line_chart(pchome_avg_scores, momo_avg_scores):
+def plot_line_chart(pchome_avg_scores, momo_avg_scores, filename=None):
     plt.figure(figsize=(10, 6))  # 設定圖形大小
 
     # 繪製 PChome 和 momo 的折線圖
@@ -96,21 +73,20 @@ def plot_line_chart(pchome_avg_scores, momo_avg_scores):
     plt.legend()
 
     # 生成動態檔案名稱，附加時間戳
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f'/home/sentiment_analysis_time_series_{timestamp}.png'  # 使用時間戳生成檔案名
+    if filename is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f'/home/sentiment_analysis_time_series_{timestamp}.png'  # 使用時間戳生成檔案名
 
     # 儲存圖像
     plt.savefig(filename)
+    plt.close()
     print(f"折線圖已儲存為 {filename}")  # 顯示成功訊息
+    return filename
 
 # 主程式執行流程
 def main():
-    # 從資料庫讀取資料
-    pchome_scores_by_year, momo_scores_by_year = read_data_from_db()
-
-    # 計算每年平均情感分數
-    pchome_avg_scores = calculate_average_sentiment(pchome_scores_by_year)
-    momo_avg_scores = calculate_average_sentiment(momo_scores_by_year)
+    # 從資料庫讀取資料，計算每年平均情感分數
+    pchome_avg_scores, momo_avg_scores = calculate_average_sentiment(read_data_from_db())
 
     # 繪製折線圖
     plot_line_chart(pchome_avg_scores, momo_avg_scores)
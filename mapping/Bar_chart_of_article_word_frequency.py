@@ -1,10 +1,8 @@
-import pymysql  # 使用 pymysql 進行資料庫連接
-from collections import Counter
-import jieba
 import matplotlib.pyplot as plt
 from matplotlib.font_manager import FontProperties
 from datetime import datetime  # 引入 datetime 模組來生成時間戳
 import os
+from token_store import TokenStore  # 與情感分析、文字雲共用的斷詞結果
 
 # 手動加載字體文件 ( 若無sudo權限下載，可下載該字體文件做引用，使圖片能正常產出中文字)
 font_path = os.path.expanduser("~/.fonts/NotoSansCJK-Regular.ttc")
@@ -29,58 +27,25 @@ db_config = {
     'database': ''   # 資料庫名稱
 }
 
-# 連接資料庫並讀取資料
+# 同步共用斷詞結果（只有新增或內容變更的文章會重新斷詞，詞頻索引同步以差量更新）
 def read_from_db():
-    # 建立資料庫連線
-    conn = pymysql.connect(**db_config)  # 使用 pymysql 連接
-    cursor = conn.cursor(pymysql.cursors.DictCursor)  # 使用 DictCursor 來支持字典型結果
+    token_store = TokenStore()
+    updated, total = token_store.sync(db_config)
+    print(f"斷詞結果已同步：更新 {updated} 篇，共 {total} 篇")
+    return token_store
 
-    # 查詢資料（表格名稱為 articles，若有異動table名稱，此處也需要更動）
-    query = "SELECT keyword, `article_title`, `article_content` FROM articles"
-    cursor.execute(query)
+# 保留至少兩個字的有效中文
+def is_valid_word(word):
+    return word not in STOP_WORDS and len(word) > 1 and word.isalpha()
 
-    data = {}
-
-    # 讀取查詢結果並分類
-    for row in cursor.fetchall():
-        keyword = row['keyword']
-        title = row['article_title']
-        article_content = row['article_content']
-
-        if keyword not in data:
-            data[keyword] = {'titles': [], 'contents': []}
-
-        data[keyword]['titles'].append(title)
-        data[keyword]['contents'].append(article_content)
-
-    # 關閉連接
-    cursor.close()
-    conn.close()
-
-    return data
-
-# 分詞並統計詞頻 (top_n=5 可以調整，目前為前五大常出現的詞彙)
-def get_top_words(contents, keyword, top_n=5):
-    words = []
-
-    # 只處理內文(原先只處理標題，但字數太少不宜以此為判斷)
-    for content in contents:
-        seg_list = jieba.lcut(content)
-        # 使用 set 來去除同一篇文章中重複的詞彙
-        filtered_words = set([
-            word for word in seg_list
-            if word not in STOP_WORDS and len(word) > 1 and word.isalpha()  # 保留至少兩個字的有效中文
-        ])
-        words.extend(filtered_words)
-
-    # 統計詞頻
-    word_count = Counter(words)
-    # 返回前 top_n 個常見詞
-    return word_count.most_common(top_n)
+# 統計詞頻 (top_n=5 可以調整，目前為前五大常出現的詞彙)
+# 只處理內文(原先只處理標題，但字數太少不宜以此為判斷)；同一篇文章重複出現的詞只算一次，即索引中的 df
+def get_top_words(token_store, keyword, top_n=5):
+    return token_store.top_terms(keyword, top_n, by="df", keep=is_valid_word)
 
 
 # 生成直條圖並保存為文件
-def plot_bar_chart(word_counts, keyword):
+def plot_bar_chart(word_counts, keyword, filename=None):
     words, counts = zip(*word_counts)
     plt.figure(figsize=(10, 6))
     bars = plt.bar(words, counts, color='skyblue')
@@ -97,21 +62,22 @@ def plot_bar_chart(word_counts, keyword):
                  str(int(yval)), ha='center', va='bottom', fontproperties=custom_font)
 
     # 生成動態檔案名稱，附加時間戳
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f'/home/{keyword}_bar_chart_{timestamp}.png' # 要儲存的PNG檔案的路徑及檔名
+    if filename is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f'/home/{keyword}_bar_chart_{timestamp}.png' # 要儲存的PNG檔案的路徑及檔名
 
     plt.savefig(filename)  # 保存為圖片文件
     plt.close()  # 關閉圖形，釋放資源
+    return filename
 
 # 主函數
 def main():
-    data = read_from_db()  # 從資料庫讀取資料
+    token_store = read_from_db()  # 從資料庫同步資料
 
-    for keyword, articles in data.items():
+    for keyword in token_store.keywords():
         print(f"關鍵字: {keyword}")
-        contents = articles['contents']
 
-        top_words = get_top_words(contents, keyword)
+        top_words = get_top_words(token_store, keyword)
         for word, count in top_words:
             print(f"{word}: {count} 次")
         print("-" * 40)
@@ -119,5 +85,7 @@ def main():
         # 生成直條圖
         plot_bar_chart(top_words, keyword)
 
+    token_store.close()
+
 if __name__ == "__main__":
     main()
@@ -1,4 +1,6 @@
 import pymysql
+import pandas as pd
+from score_stats import SCORE_LABELS, score_statistics  # 與分數表、年度平均圖共用的分數統計
 import matplotlib.pyplot as plt
 from datetime import datetime
 
@@ -14,12 +16,8 @@ db_config = {
 # ========== 從資料庫讀取分數 ==========
 def read_data_from_db():
     """
-    從 DB 讀取 keyword 和 sentiment_score，
-    並分別存入 pchome_scores、momo_scores。
+    從 DB 讀取 keyword 和 sentiment_score，回傳 DataFrame（失敗時為空表）。
     """
-    pchome_scores = []
-    momo_scores = []
-
     try:
         conn = pymysql.connect(**db_config)
         cursor = conn.cursor(pymysql.cursors.DictCursor)
@@ -29,54 +27,30 @@ def read_data_from_db():
         cursor.execute(query)
         rows = cursor.fetchall()
 
-        for row in rows:
-            keyword = row['keyword']
-            score = float(row['sentiment_score'])
-
-            # 根據關鍵字分類
-            if keyword == 'PChome':
-                pchome_scores.append(score)
-            elif keyword == 'momo':
-                momo_scores.append(score)
-
         cursor.close()
         conn.close()
 
     except pymysql.MySQLError as e:
         print(f"資料庫錯誤: {e}")
+        rows = []
 
-    return pchome_scores, momo_scores
+    return pd.DataFrame(rows, columns=['keyword', 'sentiment_score'])
 
 # ========== 計算情感分數區間的數量 ==========
-def calculate_score_ranges(scores):
+def calculate_score_ranges(df):
     """
-    將情感分數分為 5 個區間，回傳每個區間的計數。
+    將 PChome、momo 的情感分數分為 5 個區間，回傳 (pchome_ranges, momo_ranges) 兩組計數。
     """
-    ranges = {
-        '0-20': 0,
-        '21-40': 0,
-        '41-60': 0,
-        '61-80': 0,
-        '81-100': 0
-    }
-
-    for score in scores:
-        if 0 <= score <= 20:
-            ranges['0-20'] += 1
-        elif 21 <= score <= 40:
-            ranges['21-40'] += 1
-        elif 41 <= score <= 60:
-            ranges['41-60'] += 1
-        elif 61 <= score <= 80:
-            ranges['61-80'] += 1
-        elif 81 <= score <= 100:
-            ranges['81-100'] += 1
-
-    return ranges
+    stats = score_statistics(df['keyword'], df['sentiment_score'])
+    empty = dict.fromkeys(SCORE_LABELS, 0)
+    return (
+        stats.get('PChome', {}).get('buckets', empty),
+        stats.get('momo', {}).get('buckets', empty),
+    )
 
 # ========== 畫出圓餅圖 ==========
-def plot_pie_chart(pchome_ranges, momo_ranges):
-    labels = ['0-20', '21-40', '41-60', '61-80', '81-100']
+def plot_pie_chart(pchome_ranges, momo_ranges, filename=None):
+    labels = SCORE_LABELS
     pchome_data = [pchome_ranges[label] for label in labels]
     momo_data = [momo_ranges[label] for label in labels]
 
@@ -114,25 +88,25 @@ def plot_pie_chart(pchome_ranges, momo_ranges):
     ax2.axis('equal')
 
     # 儲存圖檔
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f'/home/sentiment_analysis_pie_chart_{timestamp}.png'
+    if filename is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f'/home/sentiment_analysis_pie_chart_{timestamp}.png'
 
     plt.tight_layout()  # 自動調整子圖間距
     plt.savefig(filename)
+    plt.close(fig)
     print(f"圖像已儲存為 {filename}")
+    return filename
 
 # ========== 主程式 ==========
 def main():
-    pchome_scores, momo_scores = read_data_from_db()
+    pchome_ranges, momo_ranges = calculate_score_ranges(read_data_from_db())
 
     # 如果都沒有資料，可以提示或結束
-    if not pchome_scores and not momo_scores:
+    if not sum(pchome_ranges.values()) and not sum(momo_ranges.values()):
         print("無法取得任何 PChome 或 momo 的分數資料，請檢查資料庫。")
         return
 
-    pchome_ranges = calculate_score_ranges(pchome_scores)
-    momo_ranges = calculate_score_ranges(momo_scores)
-
     plot_pie_chart(pchome_ranges, momo_ranges)
 
 if __name__ == "__main__":
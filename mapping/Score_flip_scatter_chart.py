@@ -13,10 +13,6 @@ db_config = {
 
 # 讀取資料庫中的 date, score, keyword
 def read_data_from_db():
-    article_dates = []
-    sentiment_scores = []
-    keywords = []
-
     try:
         # 連接資料庫
         conn = pymysql.connect(**db_config)
@@ -27,43 +23,53 @@ def read_data_from_db():
         cursor.execute(query)
         rows = cursor.fetchall()
 
-        for row in rows:
-            # 取得文章日期欄位
-            date_str = row['article_date']
-            if not date_str:  # 如果日期是空的，跳過
-                continue
-
-            # 將日期字串解析為 datetime 物件
-            try:
-                # 假設你的 article_date 是 "YYYY-MM-DD" 格式，若不同需調整
-                article_date = datetime.strptime(date_str, "%Y-%m-%d")
-            except ValueError:
-                print(f"警告: 無效的日期格式，跳過該筆資料 - ID: {row['id']}")
-                continue
-
-            # 取得情感分數 (若為 None 或空值，也可自行判斷是否跳過)
-            score = row.get('sentiment_score', None)
-            if score is None:
-                continue
-
-            # keyword
-            keyword = row.get('keyword', '未知')
-
-            # 加入到列表
-            article_dates.append(article_date)
-            sentiment_scores.append(float(score))
-            keywords.append(keyword)
-
         cursor.close()
         conn.close()
 
     except pymysql.MySQLError as e:
         print(f"資料庫錯誤: {e}")
+        return [], [], []
+
+    return points_from_rows(rows)
+
+# 將 id, article_date, sentiment_score, keyword 的 dict 列表整理為散佈圖的點
+def points_from_rows(rows, verbose=True):
+    article_dates = []
+    sentiment_scores = []
+    keywords = []
+
+    for row in rows:
+        # 取得文章日期欄位
+        date_str = row['article_date']
+        if not date_str:  # 如果日期是空的，跳過
+            continue
+
+        # 將日期字串解析為 datetime 物件
+        try:
+            # 假設你的 article_date 是 "YYYY-MM-DD" 格式，若不同需調整
+            article_date = datetime.strptime(date_str, "%Y-%m-%d")
+        except ValueError:
+            if verbose:
+                print(f"警告: 無效的日期格式，跳過該筆資料 - ID: {row['id']}")
+            continue
+
+        # 取得情感分數 (若為 None 或空值，也可自行判斷是否跳過)
+        score = row.get('sentiment_score', None)
+        if score is None or score != score:  # NULL / NaN
+            continue
+
+        # keyword
+        keyword = row.get('keyword', '未知')
+
+        # 加入到列表
+        article_dates.append(article_date)
+        sentiment_scores.append(float(score))
+        keywords.append(keyword)
 
     return article_dates, sentiment_scores, keywords
 
 # 繪製散佈圖
-def plot_scatter(article_dates, sentiment_scores, keywords):
+def plot_scatter(article_dates, sentiment_scores, keywords, filename=None):
     plt.figure(figsize=(10, 6))  # 設定圖形大小
 
     # 手動指定顏色
@@ -102,13 +108,16 @@ def plot_scatter(article_dates, sentiment_scores, keywords):
     plt.legend(loc='upper left')
 
     # 動態檔名
-    now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f'/home/sentiment_analysis_by_year_{now_str}.png'
+    if filename is None:
+        now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f'/home/sentiment_analysis_by_year_{now_str}.png'
 
     # 儲存圖像並顯示
     plt.tight_layout()
     plt.savefig(filename)
+    plt.close()
     print(f"圖像已儲存為 {filename}")
+    return filename
 
 # 主程式
 def main():
@@ -0,0 +1,192 @@
+"""
+搜尋準確度分析用的商品標題字元索引（yuting_{platform}_dynamique_search_accuracy）。
+
+原本以 MySQL REGEXP 計算準確度：關鍵字每個字元之間插入 `.*?`（字元依序出現即可），
+每次查詢都要回溯比對該關鍵字的所有標題。這裡改為：
+
+- 每個標題預先建立「字元 -> 出現位置 bitset」，判斷關鍵字是否為標題的子序列只需逐字取 bitset 的最低位，
+  排除詞（例如「適用」）是否出現則以 shift-and 判斷，都不必再掃描標題文字
+- 字元 -> 標題 id 的 posting list，查詢任意關鍵字時先以交集縮小候選標題
+- 依 timestamp 增量載入新寫入的搜尋結果
+
+比對不分大小寫（與 MariaDB 預設 collation 下的 REGEXP 相同），關鍵字中的字元一律視為一般字元，
+不會因為 "+"、"(" 等符號造成 REGEXP 語法錯誤。關鍵字分組與 token_store 相同，去除前後空白並轉小寫，
+與 SQL 的 keyword = %s 一樣把 "MOMO"、"momo " 視為同一個關鍵字。
+
+爬蟲現在只寫入 accuracy_snapshots 的快照，舊資料表不再新增資料；此索引只用於尚未轉成快照的舊關鍵字，
+執行 accuracy_snapshots.py 轉換後即不再需要。
+"""
+import datetime
+import threading
+
+PLATFORMS = ("momo", "pchome")
+DEFAULT_EXCLUDE_TERMS = ("適用", "專用", "配件", "支援")
+
+
+def table_name(platform):
+    return f"yuting_{platform}_dynamique_search_accuracy"
+
+
+def normalize(text):
+    return (text or "").lower()
+
+
+def keyword_key(keyword):
+    """關鍵字分組用的 key，與 token_store.normalize_keyword 相同"""
+    return normalize(keyword).strip()
+
+
+def char_positions(title):
+    """{字元: 出現位置的 bitset}，第 i 個字元對應第 i 個 bit"""
+    positions = {}
+    for i, char in enumerate(title):
+        positions[char] = positions.get(char, 0) | (1 << i)
+    return positions
+
+
+def contains_subsequence(positions, chars):
+    """chars 是否依序出現在標題中（等同 REGEXP 'a.*?b.*?c'）"""
+    allowed = -1  # 尚可使用的位置（Python 的 -1 為全部 bit 皆為 1）
+    for char in chars:
+        bits = positions.get(char, 0) & allowed
+        if not bits:
+            return False
+        lowest = bits & -bits             # 最早可用的位置
+        allowed = ~((lowest << 1) - 1)    # 下一個字元必須出現在其後
+    return True
+
+
+def contains_substring(positions, term):
+    """term 是否連續出現在標題中（等同 REGEXP 'term'）"""
+    if not term:
+        return False
+    bits = positions.get(term[0], 0)
+    for char in term[1:]:
+        bits = (bits << 1) & positions.get(char, 0)
+        if not bits:
+            return False
+    return bool(bits)
+
+
+class TitleIndex:
+    """單一平台所有搜尋結果標題的字元索引
+
+    - groups：爬蟲關鍵字（keyword_key）-> 該次搜尋結果的標題 id
+    - postings：字元 -> 含有該字元的標題 id
+    - default_excluded：各標題是否含 DEFAULT_EXCLUDE_TERMS，寫入時即計算
+    """
+
+    def __init__(self):
+        self.positions = []
+        self.groups = {}
+        self.postings = {}
+        self.default_excluded = []
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, keyword, title):
+        title_id = len(self.positions)
+        positions = char_positions(normalize(title))
+        self.positions.append(positions)
+        self.groups.setdefault(keyword_key(keyword), []).append(title_id)
+        for char in positions:
+            self.postings.setdefault(char, set()).add(title_id)
+        self.default_excluded.append(
+            any(contains_substring(positions, term) for term in DEFAULT_EXCLUDE_TERMS)
+        )
+
+    def match(self, keyword, title_ids=None):
+        """依序含有 keyword 所有字元的標題 id；title_ids 為 None 時查詢全部標題"""
+        chars = normalize(keyword)
+        if not chars:
+            return list(title_ids) if title_ids is not None else list(range(len(self)))
+
+        # 以最小的 posting list 開始取交集
+        postings = sorted((self.postings.get(char, set()) for char in set(chars)), key=len)
+        candidates = set(title_ids) if title_ids is not None else postings[0]
+        for posting in postings:
+            candidates = candidates & posting
+            if not candidates:
+                return []
+        return sorted(i for i in candidates if contains_subsequence(self.positions[i], chars))
+
+    def is_excluded(self, title_id, exclude_terms):
+        if tuple(exclude_terms) == DEFAULT_EXCLUDE_TERMS:
+            return self.default_excluded[title_id]
+        positions = self.positions[title_id]
+        return any(contains_substring(positions, normalize(term)) for term in exclude_terms)
+
+    def product_count(self, group):
+        return len(self.groups.get(keyword_key(group), ()))
+
+    def precision(self, keyword, exclude_terms=DEFAULT_EXCLUDE_TERMS, group=None):
+        """group（預設為 keyword 本身）的搜尋結果中，依序含有 keyword 所有字元且不含排除詞的比例"""
+        keyword = keyword_key(keyword)
+        title_ids = self.groups.get(keyword if group is None else keyword_key(group), [])
+        if not title_ids:
+            return 0
+        matched = [i for i in self.match(keyword, title_ids) if not self.is_excluded(i, exclude_terms)]
+        return round(len(matched) / len(title_ids), 4)
+
+
+def compute_metrics(keyword, titles, exclude_terms=DEFAULT_EXCLUDE_TERMS):
+    """一次搜尋結果的 (商品數, 符合數, 準確度)：符合為依序含有關鍵字所有字元且不含排除詞，與 API 的準確度定義相同"""
+    keyword = keyword_key(keyword)
+    index = TitleIndex()
+    for title in titles:
+        index.add(keyword, title)
+    title_ids = index.groups.get(keyword, [])
+    matched = [i for i in index.match(keyword, title_ids) if not index.is_excluded(i, exclude_terms)]
+    precision = round(len(matched) / len(title_ids), 4) if title_ids else 0
+    return len(title_ids), len(matched), precision
+
+
+class AccuracyIndex:
+    """各平台一個 TitleIndex，依 timestamp 增量載入資料庫中新寫入的搜尋結果
+
+    insert_data 每次寫入一個關鍵字的所有結果並一次提交，同一 (timestamp, keyword) 的資料不會只出現一部分；
+    因此以「timestamp >= 上次最大值」重讀，並略過已載入的 (timestamp, keyword)。多執行緒共用同一個實例是安全的。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = {platform: TitleIndex() for platform in PLATFORMS}
+        self._watermarks = {platform: (datetime.datetime.min, set()) for platform in PLATFORMS}
+
+    def refresh(self, db_connection, platform):
+        """載入新寫入的搜尋結果；回傳新增的標題數"""
+        with self._lock:
+            watermark, loaded = self._watermarks[platform]
+            with db_connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT timestamp, keyword, search_result FROM `{table_name(platform)}` "
+                    f"WHERE timestamp >= %s ORDER BY timestamp",
+                    (watermark,),
+                )
+                rows = cursor.fetchall()
+
+            index = self._indexes[platform]
+            added = 0
+            for timestamp, keyword, title in rows:
+                if timestamp == watermark and (timestamp, keyword) in loaded:
+                    continue
+                index.add(keyword, title)
+                added += 1
+            if rows:
+                latest = rows[-1][0]
+                if latest != watermark:
+                    watermark, loaded = latest, set()
+                loaded.update((timestamp, keyword) for timestamp, keyword, _ in rows if timestamp == latest)
+                self._watermarks[platform] = (watermark, loaded)
+            return added
+
+    def precision(self, db_connection, platform, keyword, exclude_terms=DEFAULT_EXCLUDE_TERMS):
+        self.refresh(db_connection, platform)
+        with self._lock:
+            return self._indexes[platform].precision(keyword, exclude_terms)
+
+    def product_count(self, db_connection, platform, keyword):
+        self.refresh(db_connection, platform)
+        with self._lock:
+            return self._indexes[platform].product_count(keyword)
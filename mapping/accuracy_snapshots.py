@@ -0,0 +1,208 @@
+"""
+搜尋結果準確度的歷史快照：每次爬取存成一筆 (platform, keyword, crawl_time) 紀錄。
+
+原本的 yuting_{platform}_dynamique_search_accuracy 每個商品標題一列，同一次爬取只靠 timestamp 串起來，
+而且關鍵字一旦有資料就不再寫入新結果，無法追蹤準確度的變化。快照資料表改為：
+
+- 每次爬取一列，version 為該平台、該關鍵字的第幾次寫入；(platform, keyword, version) 為 UNIQUE，
+  同時執行的寫入取到相同 version 時重新取號
+- 商品數、符合數與準確度在寫入時即以 accuracy_index.compute_metrics 計算，趨勢查詢只讀這幾個欄位
+  （(platform, keyword, crawl_time) 索引），不必再讀取或比對標題
+- 標題清單以 zlib 壓縮的 JSON 存在同一列，需要重新分析時再以 load_titles() 取回
+
+舊資料表中已有的爬取結果可在 mapping/ 目錄下執行以下指令轉成快照（已轉過的不會重複寫入；
+資料庫設定由環境變數讀取，見 db_env.py）：
+
+    python accuracy_snapshots.py
+"""
+import datetime
+import json
+import zlib
+
+import pymysql
+
+from accuracy_index import PLATFORMS, compute_metrics, table_name
+from db_env import db_config_from_env
+
+SNAPSHOT_TABLE = "yuting_search_accuracy_snapshots"
+NO_RESULT_TITLE = "No Relevant Item Exists"  # crawler_pchome 在查無商品時寫入的標題，不計入商品數
+METRIC_COLUMNS = "snapshot_id, platform, keyword, crawl_time, version, product_count, matched_count, precision_rate"
+SAVE_RETRIES = 5  # version 衝突時重新取號的次數
+
+
+def initialize_table(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (
+                snapshot_id INT AUTO_INCREMENT PRIMARY KEY,
+                platform VARCHAR(16) NOT NULL,
+                keyword VARCHAR(255) NOT NULL,
+                crawl_time DATETIME NOT NULL,
+                version INT NOT NULL,
+                product_count INT NOT NULL,
+                matched_count INT NOT NULL,
+                precision_rate DOUBLE NOT NULL,
+                titles MEDIUMBLOB,
+                UNIQUE KEY crawl_idx (platform, keyword, crawl_time),
+                UNIQUE KEY version_idx (platform, keyword, version)
+            )
+        """)
+        cursor.execute(f"SHOW INDEX FROM {SNAPSHOT_TABLE} WHERE Key_name = 'version_idx'")
+        if not cursor.fetchall():
+            # 舊版資料表沒有 version 的 UNIQUE KEY，先依寫入順序重新編號，排除已重複的 version
+            cursor.execute(f"""
+                UPDATE {SNAPSHOT_TABLE} s
+                INNER JOIN (
+                    SELECT snapshot_id, ROW_NUMBER() OVER (PARTITION BY platform, keyword ORDER BY snapshot_id) AS version
+                    FROM {SNAPSHOT_TABLE}
+                ) numbered ON numbered.snapshot_id = s.snapshot_id
+                SET s.version = numbered.version
+            """)
+            cursor.execute(f"ALTER TABLE {SNAPSHOT_TABLE} ADD UNIQUE KEY version_idx (platform, keyword, version)")
+    conn.commit()
+
+
+def compress_titles(titles):
+    return zlib.compress(json.dumps(titles, ensure_ascii=False).encode("utf-8"), 9)
+
+
+def decompress_titles(blob):
+    return json.loads(zlib.decompress(bytes(blob)).decode("utf-8")) if blob else []
+
+
+def _row_to_dict(row):
+    snapshot_id, platform, keyword, crawl_time, version, product_count, matched_count, precision = row
+    return {
+        "snapshot_id": snapshot_id,
+        "platform": platform,
+        "keyword": keyword,
+        "crawl_time": crawl_time,
+        "version": version,
+        "product_count": product_count,
+        "matched_count": matched_count,
+        "precision": precision,
+    }
+
+
+def save_snapshot(conn, platform, keyword, titles, crawl_time=None):
+    """寫入一次爬取的結果並提交；同一秒重複寫入同一關鍵字時以新結果覆蓋。回傳快照的指標"""
+    titles = [title for title in titles if title and title.strip() and title != NO_RESULT_TITLE]
+    crawl_time = crawl_time or datetime.datetime.now().replace(microsecond=0)
+    product_count, matched_count, precision = compute_metrics(keyword, titles)
+
+    metrics = (product_count, matched_count, precision, compress_titles(titles))
+
+    for attempt in range(SAVE_RETRIES):
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT snapshot_id FROM {SNAPSHOT_TABLE} WHERE platform = %s AND keyword = %s AND crawl_time = %s",
+                (platform, keyword, crawl_time),
+            )
+            existing = cursor.fetchone()
+            if existing is not None:
+                cursor.execute(
+                    f"UPDATE {SNAPSHOT_TABLE} SET product_count = %s, matched_count = %s, precision_rate = %s, "
+                    f"titles = %s WHERE snapshot_id = %s",
+                    (*metrics, existing[0]),
+                )
+                break
+
+            cursor.execute(
+                f"SELECT COALESCE(MAX(version), 0) + 1 FROM {SNAPSHOT_TABLE} WHERE platform = %s AND keyword = %s",
+                (platform, keyword),
+            )
+            version = cursor.fetchone()[0]
+            try:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {SNAPSHOT_TABLE}
+                        (platform, keyword, crawl_time, version, product_count, matched_count, precision_rate, titles)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    (platform, keyword, crawl_time, version, *metrics),
+                )
+                break
+            except pymysql.err.IntegrityError as e:
+                # 另一個寫入先取走了同一個 version（或同一秒的 crawl_time），結束交易後重新讀取
+                conn.rollback()
+                if e.args[0] != 1062 or attempt == SAVE_RETRIES - 1:
+                    raise
+    conn.commit()
+    return latest_snapshot(conn, platform, keyword)
+
+
+def latest_snapshot(conn, platform, keyword):
+    """最近一次爬取的指標，沒有快照時回傳 None"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {METRIC_COLUMNS} FROM {SNAPSHOT_TABLE} "
+            f"WHERE platform = %s AND keyword = %s ORDER BY crawl_time DESC LIMIT 1",
+            (platform, keyword),
+        )
+        row = cursor.fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def trend(conn, platform, keyword, start_date=None, end_date=None):
+    """依爬取時間排序的各次指標（不讀取標題）；start_date / end_date 為含頭尾的日期"""
+    conditions = ["platform = %s", "keyword = %s"]
+    params = [platform, keyword]
+    if start_date:
+        conditions.append("crawl_time >= %s")
+        params.append(start_date)
+    if end_date:
+        conditions.append("crawl_time < %s + INTERVAL 1 DAY")
+        params.append(end_date)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {METRIC_COLUMNS} FROM {SNAPSHOT_TABLE} WHERE {' AND '.join(conditions)} ORDER BY crawl_time",
+            params,
+        )
+        return [_row_to_dict(row) for row in cursor.fetchall()]
+
+
+def load_titles(conn, snapshot_id):
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT titles FROM {SNAPSHOT_TABLE} WHERE snapshot_id = %s", (snapshot_id,))
+        row = cursor.fetchone()
+    return decompress_titles(row[0]) if row else []
+
+
+def backfill(conn, platform):
+    """把舊資料表中每個 (keyword, timestamp) 轉成一筆快照；回傳新寫入的快照數"""
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT keyword, crawl_time FROM {SNAPSHOT_TABLE} WHERE platform = %s", (platform,))
+        existing = set(cursor.fetchall())
+        cursor.execute(
+            f"SELECT keyword, timestamp, search_result FROM `{table_name(platform)}` ORDER BY timestamp"
+        )
+        rows = cursor.fetchall()
+
+    crawls = {}
+    for keyword, timestamp, title in rows:
+        crawls.setdefault((keyword, timestamp), []).append(title)
+
+    created = 0
+    for (keyword, timestamp), titles in crawls.items():
+        if (keyword, timestamp) in existing:
+            continue
+        save_snapshot(conn, platform, keyword, titles, crawl_time=timestamp)
+        created += 1
+    return created
+
+
+def main(db_config):
+    conn = pymysql.connect(**db_config)
+    initialize_table(conn)
+    for platform in PLATFORMS:
+        try:
+            created = backfill(conn, platform)
+        except pymysql.err.ProgrammingError as e:  # 舊資料表不存在
+            print(f"略過 {platform}：{e}")
+            continue
+        print(f"{platform}：新增 {created} 筆快照")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main(db_config_from_env())
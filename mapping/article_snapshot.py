@@ -0,0 +1,344 @@
+"""
+將分析用的資料表增量同步為本機 Parquet 快照，讓圖表與 Dash 頁面不必對正式 MariaDB 做大範圍掃描。
+
+- 以 id 為水位線，每次只取回新增的列，寫成新的 part 檔
+- 會被回寫的欄位（例如 sentiment_score、重新清理的內文、正規化後的 keyword、filtered_news 重新產生的摘要）
+  另存為只含 id、這些欄位與其 MD5 的 overlay 檔。同步時由 DB 端計算每列的 MD5，只傳回 id 與 hash，
+  再取回 hash 有變動的列；overlay 中不存在的 id 視為已刪除
+- part 檔過多時合併為單一檔案
+
+讀取端使用 load_table()：以 memory map 開啟、只讀取需要的欄位。請定期（例如 cron）在 mapping/ 目錄下執行
+（資料庫設定由環境變數讀取，見 db_env.py）：
+
+    python article_snapshot.py
+"""
+import datetime
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pymysql
+
+from db_env import db_config_from_env
+
+# 以本檔位置為準（而非執行目錄），API_Serve.py 與 mapping/ 底下的腳本共用同一份快照
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "snapshot")
+STATE_PATH = os.path.join(SNAPSHOT_DIR, "state.json")
+FETCH_SIZE = 5000     # 每次從 server-side cursor 取回的列數
+PART_ROWS = 100000    # 每個 part 檔最多列數
+MAX_PARTS = 32        # part 檔超過此數量時合併
+OVERLAY_NAME = "overlay.parquet"
+ROW_HASH_COLUMN = "row_hash"  # overlay 中各列 mutable 欄位的 MD5（與 DB 端的 _row_hash_sql 相同）
+
+ARTICLE_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("keyword", pa.string()),
+    ("article_title", pa.string()),
+    ("article_date", pa.string()),
+    ("article_content", pa.string()),
+    ("sentiment_score", pa.float64()),
+    ("has_content", pa.bool_()),  # 只需判斷有無內文的圖表不必載入整欄內文
+])
+ARTICLE_SELECT = (
+    "id, keyword, article_title, article_date, article_content, sentiment_score, "
+    "article_content IS NOT NULL AS has_content"
+)
+# 分析流程會回寫情緒分數、清理內文並正規化 keyword；has_content 隨內文變動
+ARTICLE_MUTABLE = ["keyword", "article_content", "sentiment_score", "has_content"]
+
+# 資料表 -> SELECT 欄位、schema、會被回寫的欄位
+SNAPSHOT_TABLES = {
+    "articles": {
+        "select": ARTICLE_SELECT,
+        "schema": ARTICLE_SCHEMA,
+        "mutable": ARTICLE_MUTABLE,
+    },
+    # API_Serve.py 讀取的 PTT 文章表，結構與 articles 相同
+    "judy_db": {
+        "select": ARTICLE_SELECT,
+        "schema": ARTICLE_SCHEMA,
+        "mutable": ARTICLE_MUTABLE,
+    },
+    "wilson_search_results": {
+        "select": "id, platform, title, article_url, content, publish_date, created_at",
+        "schema": pa.schema([
+            ("id", pa.int64()),
+            ("platform", pa.string()),
+            ("title", pa.string()),
+            ("article_url", pa.string()),
+            ("content", pa.string()),
+            ("publish_date", pa.date32()),
+            ("created_at", pa.timestamp("s")),
+        ]),
+        "mutable": [],
+    },
+    "wilson_filtered_news": {
+        "select": "id, platform, title, publish_date, article_url, summary, content, created_at",
+        "schema": pa.schema([
+            ("id", pa.int64()),
+            ("platform", pa.string()),
+            ("title", pa.string()),
+            ("publish_date", pa.date32()),
+            ("article_url", pa.string()),
+            ("summary", pa.string()),
+            ("content", pa.string()),
+            ("created_at", pa.timestamp("s")),
+        ]),
+        # filtered_news.py 重新處理同一篇文章時會以 upsert 覆寫摘要與內文
+        "mutable": ["summary", "content"],
+    },
+}
+
+
+# ---------- 狀態檔 ----------
+def load_state():
+    if not os.path.exists(STATE_PATH):
+        return {}
+    with open(STATE_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state):
+    if not os.path.exists(SNAPSHOT_DIR):
+        os.makedirs(SNAPSHOT_DIR)
+    tmp_path = STATE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, STATE_PATH)
+
+
+# ---------- 寫入 ----------
+def _select_expressions(spec):
+    """SELECT 欄位字串 -> {欄位名稱: 運算式（不含別名）}，overlay 以相同的運算式重讀衍生欄位（例如 has_content）"""
+    expressions = {}
+    for expression in spec["select"].split(","):
+        expression = expression.strip()
+        if " AS " in expression:
+            expression, name = expression.rsplit(" AS ", 1)
+        else:
+            name = expression
+        expressions[name] = expression
+    return expressions
+
+
+def _row_hash_sql(spec):
+    """各列 mutable 欄位的 MD5 運算式（ISNULL 區分 NULL 與空字串）；由 DB 端計算，未變動的列不必傳回內容"""
+    expressions = _select_expressions(spec)
+    values = []
+    for column in spec["mutable"]:
+        values += [f"ISNULL({expressions[column]})", expressions[column]]
+    return f"MD5(CONCAT_WS('|', {', '.join(values)}))"
+
+
+def _to_arrow(rows, schema):
+    """pymysql 的 tuple 列轉為 Arrow table（DECIMAL -> float、0/1 -> bool）"""
+    columns = {}
+    for i, field in enumerate(schema):
+        values = [row[i] for row in rows]
+        if pa.types.is_floating(field.type):
+            values = [float(v) if v is not None else None for v in values]
+        elif pa.types.is_boolean(field.type):
+            values = [bool(v) if v is not None else None for v in values]
+        columns[field.name] = values
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+def _write_parquet(data, path):
+    """先寫入暫存檔再改名，讀取端不會看到寫到一半的檔案"""
+    table_dir = os.path.dirname(path)
+    if not os.path.exists(table_dir):
+        os.makedirs(table_dir)
+    tmp_path = path + ".tmp"
+    pq.write_table(data, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def sync_table(conn, table, state):
+    """取回 id 大於水位線的新資料寫成 part 檔，並更新 overlay 中有變動的列；回傳新增列數"""
+    spec = SNAPSHOT_TABLES[table]
+    entry = state.setdefault(table, {"watermark": 0, "parts": [], "overlay": None})
+    table_dir = os.path.join(SNAPSHOT_DIR, table)
+    old_watermark = entry["watermark"]
+    new_parts, new_hashes = [], {}
+    added = 0
+
+    def flush(rows):
+        name = f"part-{rows[0][0]:010d}-{rows[-1][0]:010d}.parquet"
+        _write_parquet(_to_arrow(rows, spec["schema"]), os.path.join(table_dir, name))  # 不寫入最後的 hash 欄位
+        entry["parts"].append(name)
+        new_parts.append(name)
+        entry["watermark"] = rows[-1][0]
+
+    # server-side cursor 逐批取回，不必把整張表載入記憶體；新資料的 overlay hash 一併取回
+    select = spec["select"] + (f", {_row_hash_sql(spec)}" if spec["mutable"] else "")
+    cursor = conn.cursor(pymysql.cursors.SSCursor)
+    cursor.execute(f"SELECT {select} FROM {table} WHERE id > %s ORDER BY id", (old_watermark,))
+    buffer = []
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        buffer.extend(rows)
+        added += len(rows)
+        if spec["mutable"]:
+            new_hashes.update((row[0], row[-1]) for row in rows)
+        if len(buffer) >= PART_ROWS:
+            flush(buffer)
+            buffer = []
+    if buffer:
+        flush(buffer)
+    cursor.close()
+
+    if spec["mutable"]:
+        _sync_overlay(conn, table, entry, old_watermark, new_parts, new_hashes)
+
+    entry["synced_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+    save_state(state)
+
+    if len(entry["parts"]) > MAX_PARTS:
+        compact_table(table, state)
+    return added
+
+
+def _sync_overlay(conn, table, entry, old_watermark, new_parts, new_hashes):
+    """更新 overlay：先只取回舊資料各列的 id 與 MD5，再取回 hash 有變動的列；本次新增的列由剛寫入的 part 檔讀取
+
+    DB 端仍需讀取各列計算 MD5，但不傳回未變動的內容。舊版 overlay（沒有 hash 欄位或欄位不同）會全部重新取回一次。
+    回傳重新取回的列數。
+    """
+    spec = SNAPSHOT_TABLES[table]
+    table_dir = os.path.join(SNAPSHOT_DIR, table)
+    schema = pa.schema(
+        [spec["schema"].field("id")] + [spec["schema"].field(c) for c in spec["mutable"]]
+        + [pa.field(ROW_HASH_COLUMN, pa.string())]
+    )
+    row_hash = _row_hash_sql(spec)
+
+    old = None
+    if entry.get("overlay"):
+        old = pq.read_table(os.path.join(table_dir, entry["overlay"]))
+        if old.schema.names != schema.names:
+            old = None
+    known = dict(zip(old["id"].to_pylist(), old[ROW_HASH_COLUMN].to_pylist())) if old is not None else {}
+
+    cursor = conn.cursor(pymysql.cursors.SSCursor)
+    cursor.execute(f"SELECT id, {row_hash} FROM {table} WHERE id <= %s", (old_watermark,))
+    remote = {}
+    while True:
+        batch = cursor.fetchmany(FETCH_SIZE * 10)
+        if not batch:
+            break
+        remote.update(batch)
+    cursor.close()
+
+    changed = [row_id for row_id, digest in remote.items() if known.get(row_id) != digest]
+    expressions = _select_expressions(spec)
+    columns = ", ".join(expressions[c] for c in spec["mutable"])
+    rows = []
+    cursor = conn.cursor()
+    for start in range(0, len(changed), FETCH_SIZE):
+        chunk = changed[start:start + FETCH_SIZE]
+        cursor.execute(
+            f"SELECT id, {columns}, {row_hash} FROM {table} WHERE id IN ({', '.join(['%s'] * len(chunk))})", chunk
+        )
+        rows.extend(cursor.fetchall())
+    cursor.close()
+
+    tables = [_to_arrow(rows, schema)]
+    if old is not None:
+        unchanged = pa.array(sorted(set(remote) - set(changed)), pa.int64())
+        tables.append(old.filter(pc.is_in(old["id"], value_set=unchanged)).cast(schema))
+    for part in new_parts:
+        data = pq.read_table(os.path.join(table_dir, part), columns=["id"] + spec["mutable"])
+        digests = pa.array([new_hashes[row_id] for row_id in data["id"].to_pylist()], pa.string())
+        tables.append(data.append_column(ROW_HASH_COLUMN, digests).cast(schema))
+
+    _write_parquet(pa.concat_tables(tables).sort_by("id"), os.path.join(table_dir, OVERLAY_NAME))
+    entry["overlay"] = OVERLAY_NAME
+    return len(rows)
+
+
+def compact_table(table, state):
+    """將所有 part 檔（套用 overlay、移除已刪除的列）合併為一個檔案"""
+    entry = state[table]
+    table_dir = os.path.join(SNAPSHOT_DIR, table)
+    data = load_table(table, as_arrow=True, state=state)
+
+    old_parts = entry["parts"]
+    name = f"part-compact-{entry['watermark']:010d}.parquet"
+    _write_parquet(data, os.path.join(table_dir, name))
+    entry["parts"] = [name]
+    save_state(state)
+
+    for part in old_parts:
+        if part != name:
+            os.remove(os.path.join(table_dir, part))
+
+
+def sync_tables(db_config, tables=None):
+    """同步指定的資料表（預設全部）；不存在的資料表略過。回傳 {資料表: 新增列數}"""
+    conn = pymysql.connect(**db_config)
+    state = load_state()
+    result = {}
+    try:
+        for table in tables or SNAPSHOT_TABLES:
+            try:
+                result[table] = sync_table(conn, table, state)
+            except pymysql.err.ProgrammingError as e:
+                print(f"略過 {table}：{e}")
+                if not state.get(table, {}).get("parts"):
+                    state.pop(table, None)  # 不留下空的快照，讀取端才會改查資料庫
+    finally:
+        conn.close()
+    return result
+
+
+# ---------- 讀取 ----------
+def load_table(table, columns=None, as_arrow=False, state=None):
+    """讀取本機快照：只讀取 columns 指定的欄位，並以 overlay 覆寫會被回寫的欄位
+
+    預設回傳 pandas DataFrame；as_arrow=True 時回傳 pyarrow.Table。
+    尚未建立快照時丟出 FileNotFoundError，呼叫端可改為直接查詢資料庫。
+    """
+    state = state if state is not None else load_state()
+    entry = state.get(table)
+    if entry is None:
+        raise FileNotFoundError(f"尚未建立 {table} 的本機快照，請先執行 article_snapshot.py")
+
+    spec = SNAPSHOT_TABLES[table]
+    table_dir = os.path.join(SNAPSHOT_DIR, table)
+    wanted = list(columns) if columns is not None else spec["schema"].names
+    overlay_columns = []
+    if entry.get("overlay"):
+        # 舊版 overlay 可能只有部分欄位（新增 mutable 欄位後尚未重新同步），缺少的欄位仍讀 part 檔
+        overlay_names = pq.read_schema(os.path.join(table_dir, entry["overlay"])).names
+        overlay_columns = [c for c in spec["mutable"] if c in wanted and c in overlay_names]
+    base_columns = [c for c in wanted if c not in overlay_columns]
+    if entry.get("overlay") and "id" not in base_columns:
+        base_columns.insert(0, "id")  # 以 id 對應 overlay
+
+    parts = [pq.read_table(os.path.join(table_dir, part), columns=base_columns, memory_map=True)
+             for part in entry["parts"]]
+    data = pa.concat_tables(parts) if parts else spec["schema"].empty_table().select(base_columns)
+
+    if entry.get("overlay"):
+        overlay = pq.read_table(os.path.join(table_dir, entry["overlay"]),
+                                columns=["id"] + overlay_columns, memory_map=True)
+        data = data.join(overlay, "id", join_type="inner").sort_by("id")
+
+    data = data.select(wanted)
+    return data if as_arrow else data.to_pandas()
+
+
+def main(db_config):
+    result = sync_tables(db_config)
+    state = load_state()
+    for table, added in result.items():
+        entry = state[table]
+        print(f"{table}: 新增 {added} 列，水位線 id={entry['watermark']}，part 檔 {len(entry['parts'])} 個")
+
+
+if __name__ == "__main__":
+    main(db_config_from_env())
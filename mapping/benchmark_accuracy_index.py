@@ -0,0 +1,107 @@
+"""
+比較搜尋準確度的兩種算法：原本的 REGEXP（關鍵字字元之間插入 `.*?`）與 accuracy_index 的標題字元索引。
+
+以合成的搜尋結果測試，不需連線資料庫（REGEXP 以 SQLite in-memory 資料表加上 Python re 實作的 REGEXP 模擬）。
+請在 mapping/ 目錄下執行：
+
+    python benchmark_accuracy_index.py
+"""
+import random
+import re
+import sqlite3
+import time
+
+from accuracy_index import DEFAULT_EXCLUDE_TERMS, TitleIndex
+
+KEYWORD_COUNT = 2000
+TITLES_PER_KEYWORD = 60
+ADHOC_QUERIES = 200   # 不限爬蟲關鍵字、對全部標題查詢的次數
+
+BRANDS = ["apple", "dyson", "sony", "samsung", "三星", "小米", "華碩", "象印", "虎牌", "飛利浦", "膳魔師", "國際牌"]
+PRODUCTS = ["吸塵器", "耳機", "手機殼", "電鍋", "保溫瓶", "螢幕", "鍵盤", "行動電源", "吹風機", "滑鼠", "電風扇", "氣炸鍋"]
+FILLERS = ["官方", "旗艦", "限定", "新款", "公司貨", "無線", "大容量", "免運", "現貨", "福利品", "白色", "黑色"]
+
+
+def build_synthetic_results(seed=0):
+    """回傳 [(keyword, title)]：約 6 成相關（字元之間可能夾雜其他字）、2 成配件、2 成無關"""
+    rng = random.Random(seed)
+    rows = []
+    for n in range(KEYWORD_COUNT):
+        brand, product = rng.choice(BRANDS), rng.choice(PRODUCTS)
+        keyword = f"{brand} {product}{n % 50}"
+        for _ in range(TITLES_PER_KEYWORD):
+            kind = rng.random()
+            extra = " ".join(rng.sample(FILLERS, 3))
+            if kind < 0.6:
+                title = f"【{brand.upper()}】{rng.choice(FILLERS)} {product}{rng.choice(FILLERS)}{n % 50} {extra}"
+            elif kind < 0.8:
+                title = f"{rng.choice(DEFAULT_EXCLUDE_TERMS)} {brand} {product}{n % 50} 濾網 {extra}"
+            else:
+                title = f"{rng.choice(BRANDS)} {rng.choice(PRODUCTS)} {extra}"
+            rows.append((keyword, title))
+    return rows
+
+
+def generate_regex_pattern(keyword):
+    return r".*?".join(keyword)
+
+
+def regexp_precision(conn, keyword, exclude_terms=DEFAULT_EXCLUDE_TERMS):
+    """API_Serve.analyze_keyword_with_spacing 的 REGEXP 版本"""
+    filtered = conn.execute(
+        "SELECT COUNT(*) FROM results WHERE keyword = ? AND search_result REGEXP ? AND search_result NOT REGEXP ?",
+        (keyword, generate_regex_pattern(keyword), "|".join(exclude_terms)),
+    ).fetchone()[0]
+    total = conn.execute("SELECT COUNT(*) FROM results WHERE keyword = ?", (keyword,)).fetchone()[0]
+    return round(filtered / total, 4) if total > 0 else 0
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    rows = build_synthetic_results()
+    keywords = list(dict.fromkeys(keyword for keyword, _ in rows))
+    rng = random.Random(1)
+    adhoc = [f"{rng.choice(BRANDS)}{rng.choice(PRODUCTS)}" for _ in range(ADHOC_QUERIES)]
+    print(f"合成搜尋結果: {len(rows)} 筆，爬蟲關鍵字 {len(keywords)} 個")
+
+    # MariaDB 的 REGEXP 在預設 collation 下不分大小寫
+    conn = sqlite3.connect(":memory:")
+    conn.create_function(
+        "REGEXP", 2, lambda pattern, value: re.search(pattern, value, re.IGNORECASE) is not None, deterministic=True
+    )
+    conn.execute("CREATE TABLE results (keyword TEXT, search_result TEXT)")
+    conn.executemany("INSERT INTO results VALUES (?, ?)", rows)
+
+    regexp_results, regexp_seconds = timed(lambda: [regexp_precision(conn, k) for k in keywords])
+    regexp_adhoc, regexp_adhoc_seconds = timed(lambda: [
+        conn.execute("SELECT COUNT(*) FROM results WHERE search_result REGEXP ?",
+                     (generate_regex_pattern(k),)).fetchone()[0]
+        for k in adhoc
+    ])
+    conn.close()
+
+    def build():
+        index = TitleIndex()
+        for keyword, title in rows:
+            index.add(keyword, title)
+        return index
+
+    index, build_seconds = timed(build)
+    index_results, index_seconds = timed(lambda: [index.precision(k) for k in keywords])
+    index_adhoc, index_adhoc_seconds = timed(lambda: [len(index.match(k)) for k in adhoc])
+
+    print(f"建立索引:                 {build_seconds:.2f} 秒（只需一次，之後增量加入）")
+    print(f"各關鍵字準確度 REGEXP:    {regexp_seconds:.2f} 秒")
+    print(f"各關鍵字準確度 索引:      {index_seconds:.2f} 秒 ({regexp_seconds / index_seconds:.1f}x)")
+    print(f"任意關鍵字查全部 REGEXP:  {regexp_adhoc_seconds:.2f} 秒")
+    print(f"任意關鍵字查全部 索引:    {index_adhoc_seconds:.2f} 秒 ({regexp_adhoc_seconds / index_adhoc_seconds:.1f}x)")
+    print(f"結果一致: 準確度 {regexp_results == index_results}，任意關鍵字 {regexp_adhoc == index_adhoc}")
+
+
+if __name__ == "__main__":
+    main()
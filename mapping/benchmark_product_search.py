@@ -0,0 +1,101 @@
+"""
+比較搜尋結果多頁爬取的幾種做法：以瀏覽器逐頁讀取 DOM（原本的做法）、以 HTTP 取得 JSON / HTML、
+並行抓取加上相關比例過低時提前停止。
+
+以 fixtures/product_search/ 中的 HTML / JSON 取代實際網站，不需連網；各頁的延遲以 HTTP_LATENCY、
+RENDER_LATENCY 模擬。請在 mapping/ 目錄下執行：
+
+    python benchmark_product_search.py
+"""
+import os
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import product_search
+from accuracy_index import compute_metrics
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "product_search")
+KEYWORD = "藍牙耳機"   # fixtures 的搜尋關鍵字
+MAX_PAGES = 8
+HTTP_LATENCY = 0.3     # 秒；HTTP 請求的模擬延遲
+RENDER_LATENCY = 1.5   # 秒；瀏覽器載入並捲動頁面的模擬延遲（原本每頁另外 sleep 3~9 秒）
+
+# 網址的主機 -> (fixture 檔名前綴, 頁碼參數, 超過最後一頁時的 fixture)
+FIXTURE_ROUTES = {
+    "ecshweb.pchome.com.tw": ("pchome_api", "page", None),
+    "24h.pchome.com.tw": ("pchome_dom", "p", "pchome_dom_empty.html"),
+    "m.momoshop.com.tw": ("momo_mobile", "curPage", "momo_empty.html"),
+    "www.momoshop.com.tw": ("momo_dom", "curPage", "momo_empty.html"),
+}
+
+
+class FixtureSite:
+    """以 fixture 檔案回應 product_search 的 fetch / render，並記錄請求次數"""
+
+    def __init__(self, block_http=False):
+        self.block_http = block_http  # 模擬 HTTP 來源被擋，必須改用瀏覽器
+        self.counts = {"http": 0, "render": 0}
+        self._lock = threading.Lock()
+
+    def _load(self, url):
+        parsed = urlparse(url)
+        prefix, page_param, empty_fixture = FIXTURE_ROUTES[parsed.netloc]
+        page = int(parse_qs(parsed.query)[page_param][0])
+        path = os.path.join(FIXTURE_DIR, f"{prefix}_{page}.{'json' if prefix == 'pchome_api' else 'html'}")
+        if not os.path.exists(path):
+            if empty_fixture is None:  # 搜尋 API 超過最後一頁時回傳空的商品清單
+                return '{"totalPage": 0, "prods": []}'
+            path = os.path.join(FIXTURE_DIR, empty_fixture)
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def fetch(self, url):
+        with self._lock:
+            self.counts["http"] += 1
+        time.sleep(HTTP_LATENCY)
+        if self.block_http:
+            raise ConnectionError("403 Forbidden")
+        return self._load(url)
+
+    def render(self, url):
+        with self._lock:
+            self.counts["render"] += 1
+        time.sleep(RENDER_LATENCY)
+        return self._load(url)
+
+
+def run(platform, name, use_http=True, block_http=False, workers=1, threshold=0):
+    site = FixtureSite(block_http=block_http)
+    start = time.perf_counter()
+    result = product_search.crawl(
+        platform, KEYWORD, MAX_PAGES, fetch=site.fetch if use_http else None, render=site.render,
+        workers=workers, threshold=threshold,
+    )
+    seconds = time.perf_counter() - start
+    product_count, _, precision = compute_metrics(KEYWORD, result["titles"])
+    print(
+        f"  {name:<20} {seconds:6.2f} 秒  HTTP {site.counts['http']:2d} 次  瀏覽器 {site.counts['render']:2d} 次  "
+        f"{len(result['pages'])} 頁 {product_count:3d} 筆  準確度 {precision:.4f}  ({result['stop_reason']})"
+    )
+    return result
+
+
+def main():
+    print(f"關鍵字「{KEYWORD}」，最多 {MAX_PAGES} 頁；HTTP 延遲 {HTTP_LATENCY} 秒，瀏覽器延遲 {RENDER_LATENCY} 秒")
+    for platform in ("pchome", "momo"):
+        print(platform)
+        browser = run(platform, "瀏覽器逐頁（原本）", use_http=False)
+        http = run(platform, "HTTP 逐頁")
+        fallback = run(platform, "HTTP 被擋改用瀏覽器", block_http=True, workers=product_search.PAGE_WORKERS)
+        early = run(platform, "HTTP 並行＋提前停止", workers=product_search.PAGE_WORKERS,
+                    threshold=product_search.RELEVANCE_THRESHOLD)
+        print(
+            f"  結果一致: HTTP 與瀏覽器 {http['titles'] == browser['titles']}，"
+            f"改用瀏覽器 {fallback['titles'] == browser['titles']}，"
+            f"提前停止為前 {len(early['pages'])} 頁 {early['titles'] == browser['titles'][:len(early['titles'])]}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+比較季度文章數統計的三種做法：原本的 iterrows + Counter、向量化 groupby、資料庫端 GROUP BY。
+
+以合成的百萬筆 articles 資料測試，不需連線資料庫（資料庫端以 SQLite in-memory 資料表模擬）。
+請在 mapping/ 目錄下執行：
+
+    python benchmark_quarterly_counting.py
+"""
+import sqlite3
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from quarter_counts import count_by_quarter, pivot_quarter_counts
+
+ROWS = 1_000_000
+KEYWORDS = ["PChome", "momo", " MOMO ", "pchome", "蝦皮"]
+CONTENT_LENGTH = 100  # 合成內文長度；原做法會連同內文一起載入（實際內文更長，差距只會更大）
+
+
+def build_synthetic_articles(rows=ROWS, seed=0):
+    """約 1% 無日期、1% 無內文，日期分布於 2020-2024"""
+    rng = np.random.default_rng(seed)
+    days = rng.integers(0, 365 * 5, rows)
+    dates = (np.datetime64("2020-01-01") + days).astype(str).astype(object)
+    dates[rng.random(rows) < 0.01] = "無日期"
+
+    contents = np.empty(rows, dtype=object)
+    contents[:] = "內" * CONTENT_LENGTH
+    contents[rng.random(rows) < 0.01] = None
+
+    return pd.DataFrame({
+        "article_title": [f"標題 {i}" for i in range(rows)],
+        "article_content": contents,
+        "article_date": dates,
+        "keyword": np.array(KEYWORDS, dtype=object)[rng.integers(0, len(KEYWORDS), rows)],
+    })
+
+
+def legacy_counts(df):
+    """原本 Quarterly_frequency_line_chart.py 的做法（只保留計數部分）"""
+    df = df.copy()
+    df['article_date'] = pd.to_datetime(df['article_date'], errors='coerce')
+    df['keyword'] = df['keyword'].str.strip().str.upper()
+    df['quarter'] = df['article_date'].dt.to_period('Q')
+    df = df.dropna(subset=['article_date'])
+
+    pchome_quarter_counts = Counter()
+    momo_quarter_counts = Counter()
+    for index, row in df.iterrows():
+        if pd.notna(row['article_content']):
+            if row['keyword'] == "PCHOME":
+                pchome_quarter_counts[row['quarter']] += 1
+            elif row['keyword'] == "MOMO":
+                momo_quarter_counts[row['quarter']] += 1
+    return pchome_quarter_counts, momo_quarter_counts
+
+
+def sql_counts(conn):
+    """資料庫端 GROUP BY（SQLite 版本的 QUARTER_COUNT_QUERY），只傳回統計結果"""
+    rows = conn.execute("""
+        SELECT UPPER(TRIM(keyword)) AS keyword,
+               substr(article_date, 1, 4) || 'Q' || ((CAST(substr(article_date, 6, 2) AS INTEGER) + 2) / 3) AS quarter,
+               COUNT(*) AS count
+        FROM articles
+        WHERE article_content IS NOT NULL AND date(article_date) IS NOT NULL
+        GROUP BY 1, 2
+    """).fetchall()
+    return pivot_quarter_counts(pd.DataFrame(rows, columns=['keyword', 'quarter', 'count']))
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    df = build_synthetic_articles()
+    print(f"合成文章數: {len(df)}")
+
+    (pchome, momo), legacy_seconds = timed(legacy_counts, df)
+
+    # 向量化版本只需要三個欄位，內文以「是否存在」代替
+    narrow = pd.DataFrame({
+        "keyword": df["keyword"],
+        "article_date": df["article_date"],
+        "has_content": df["article_content"].notna(),
+    })
+    vectorized, vectorized_seconds = timed(count_by_quarter, narrow)
+
+    conn = sqlite3.connect(":memory:")
+    df.to_sql("articles", conn, index=False)
+    database, sql_seconds = timed(sql_counts, conn)
+    conn.close()
+
+    expected = pd.DataFrame({
+        "PCHOME": {str(q): n for q, n in pchome.items()},
+        "MOMO": {str(q): n for q, n in momo.items()},
+    }).fillna(0).astype(int).sort_index()
+    expected.columns.name = vectorized.columns.name = database.columns.name = None
+    expected.index.name = vectorized.index.name = database.index.name = None
+
+    print(f"iterrows + Counter: {legacy_seconds:.2f} 秒")
+    print(f"向量化 groupby:     {vectorized_seconds:.2f} 秒 ({legacy_seconds / vectorized_seconds:.1f}x)")
+    print(f"資料庫端 GROUP BY:  {sql_seconds:.2f} 秒 ({legacy_seconds / sql_seconds:.1f}x)")
+    print(f"結果一致: 向量化 {expected.equals(vectorized)}，資料庫端 {expected.equals(database)}")
+
+
+if __name__ == "__main__":
+    main()
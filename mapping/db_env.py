@@ -0,0 +1,20 @@
+"""
+mapping/ 底下也會被 API_Serve.py 匯入的模組（accuracy_snapshots、article_snapshot、render_charts、search_index）
+以指令列執行時使用的資料庫設定。
+
+這些模組不再各自保存 db_config（未填入的 'port': , 會讓 API_Serve.py 匯入時直接 SyntaxError，
+而且每份都要分別填寫、保持一致）：函式一律由呼叫端傳入連線或設定，指令列執行時才由環境變數建立，例如：
+
+    DB_HOST=127.0.0.1 DB_PORT=3306 DB_USER=... DB_PASSWORD=... DB_DATABASE=... python article_snapshot.py
+"""
+import os
+
+
+def db_config_from_env():
+    return {
+        'host': os.environ.get('DB_HOST', ''),  # 資料庫主機
+        'port': int(os.environ.get('DB_PORT', 3306)),
+        'user': os.environ.get('DB_USER', ''),       # 資料庫用戶名
+        'password': os.environ.get('DB_PASSWORD', ''),  # 資料庫密碼
+        'database': os.environ.get('DB_DATABASE', '')   # 資料庫名稱
+    }
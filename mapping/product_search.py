@@ -0,0 +1,136 @@
+"""
+momo / PChome 商品搜尋結果的多頁爬取（搜尋結果準確度分析用）。
+
+- PChome 優先使用搜尋 JSON API，一次取得整頁商品名稱與總頁數（sort=rnk/dc，與搜尋頁預設的相關度排序相同，
+  改用瀏覽器讀取 DOM 時各頁內容才會一致）；momo 沒有公開的搜尋 JSON，
+  改抓伺服器端產生的行動版搜尋頁 HTML。兩者都不需啟動瀏覽器，失敗（逾時、被擋、改版）時才以瀏覽器讀取 DOM
+- 第一頁之後每次同時抓取 PAGE_WORKERS 頁，再依頁碼順序檢查：某頁中依序含有關鍵字所有字元且不含排除詞的比例
+  低於 RELEVANCE_THRESHOLD 時，該頁仍計入結果，但之後的頁面不再抓取也不計入
+- fetch / render 可替換成讀取本機檔案，benchmark_product_search.py 以 fixtures/product_search/ 中的
+  HTML / JSON 測試，不需連網
+"""
+import html
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import bs4
+import requests
+
+from accuracy_index import DEFAULT_EXCLUDE_TERMS, compute_metrics
+
+PCHOME_SEARCH_API = "https://ecshweb.pchome.com.tw/search/v3.3/all/results?q={keyword}&page={page}&sort=rnk/dc"
+PCHOME_SEARCH_PAGE = "https://24h.pchome.com.tw/search/?q={keyword}&p={page}"
+MOMO_MOBILE_SEARCH = "https://m.momoshop.com.tw/search.momo?searchKeyword={keyword}&curPage={page}"
+MOMO_SEARCH_PAGE = "https://www.momoshop.com.tw/search/searchShop.jsp?keyword={keyword}&curPage={page}"
+
+REQUEST_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/120.0 Safari/537.36",
+}
+REQUEST_TIMEOUT = 10        # 秒
+PAGE_WORKERS = 3            # 同時抓取的頁數
+RELEVANCE_THRESHOLD = 0.2   # 單頁相關比例低於此值即停止往後翻頁
+
+
+# ---------- 解析 ----------
+def parse_pchome_json(text):
+    """搜尋 API 的回應 -> (商品名稱, 總頁數)"""
+    data = json.loads(text)
+    titles = [html.unescape(prod.get("name") or "").strip() for prod in data.get("prods") or []]
+    return [title for title in titles if title], data.get("totalPage")
+
+
+def parse_pchome_html(text):
+    """24h.pchome.com.tw 搜尋頁（瀏覽器產生的 DOM）-> (商品名稱, None)；查無商品時回傳空清單"""
+    soup = bs4.BeautifulSoup(text, "html.parser")
+    if soup.select_one(".c-tipsBox"):
+        return [], None
+    titles = [element.get_text(" ", strip=True) for element in soup.select(".c-prodInfoV2__title")]
+    return [title for title in titles if title], None
+
+
+def parse_momo_html(text):
+    """momo 行動版或桌面版搜尋頁 -> (商品名稱, None)，兩者的商品名稱都是 .prdName"""
+    soup = bs4.BeautifulSoup(text, "html.parser")
+    titles = [element.get_text(" ", strip=True) for element in soup.select(".prdName")]
+    return [title for title in titles if title], None
+
+
+# 各平台依序嘗試的來源：(名稱, 網址, 解析函式)；名稱為 "dom" 者需以瀏覽器讀取
+SOURCES = {
+    "pchome": [("json", PCHOME_SEARCH_API, parse_pchome_json), ("dom", PCHOME_SEARCH_PAGE, parse_pchome_html)],
+    "momo": [("html", MOMO_MOBILE_SEARCH, parse_momo_html), ("dom", MOMO_SEARCH_PAGE, parse_momo_html)],
+}
+
+
+# ---------- 抓取 ----------
+def http_get(url):
+    response = requests.get(url, headers=REQUEST_HEADERS, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.text
+
+
+def fetch_page(platform, keyword, page, fetch=http_get, render=None):
+    """抓取一頁搜尋結果，回傳 {"page", "source", "titles", "total_pages"}
+
+    fetch(url) 回傳 HTTP 回應內容，render(url) 回傳瀏覽器產生的 DOM；任一為 None 時略過對應的來源。
+    HTML 來源沒有商品且無法得知總頁數時（可能是驗證頁），改用下一個來源確認。
+    """
+    errors = []
+    sources = [source for source in SOURCES[platform] if (render if source[0] == "dom" else fetch) is not None]
+    for position, (name, url_template, parse) in enumerate(sources):
+        loader = render if name == "dom" else fetch
+        try:
+            titles, total_pages = parse(loader(url_template.format(keyword=quote(keyword), page=page)))
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+            continue
+        if titles or total_pages is not None or position == len(sources) - 1:
+            return {"page": page, "source": name, "titles": titles, "total_pages": total_pages}
+    raise RuntimeError(f"{platform} 第 {page} 頁抓取失敗（{'; '.join(errors) or '沒有可用的來源'}）")
+
+
+def crawl(platform, keyword, max_pages=1, fetch=http_get, render=None,
+          workers=PAGE_WORKERS, threshold=RELEVANCE_THRESHOLD, exclude_terms=DEFAULT_EXCLUDE_TERMS):
+    """爬取最多 max_pages 頁，回傳 {"titles", "pages", "stop_reason"}
+
+    pages 為實際計入的各頁 {"page", "source", "count", "relevance"}；第一頁失敗時拋出例外，
+    之後的頁面失敗則停止並保留已取得的結果。
+    """
+    titles, pages = [], []
+
+    def accept(result):
+        """計入一頁並回傳停止原因，可以繼續翻頁時回傳 None"""
+        if not result["titles"]:
+            return "沒有更多商品"
+        relevance = compute_metrics(keyword, result["titles"], exclude_terms)[2]
+        titles.extend(result["titles"])
+        pages.append({"page": result["page"], "source": result["source"],
+                      "count": len(result["titles"]), "relevance": relevance})
+        if relevance < threshold:
+            return f"第 {result['page']} 頁相關比例 {relevance:.2f} 低於 {threshold}"
+        return None
+
+    first = fetch_page(platform, keyword, 1, fetch, render)
+    last_page = min(max_pages, first["total_pages"]) if first["total_pages"] is not None else max_pages
+    stop_reason = accept(first)
+
+    workers = max(workers, 1)
+    next_page = 2
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while stop_reason is None and next_page <= last_page:
+            batch = range(next_page, min(next_page + workers, last_page + 1))
+            futures = [executor.submit(fetch_page, platform, keyword, page, fetch, render) for page in batch]
+            for future in futures:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    stop_reason = str(e)
+                    break
+                stop_reason = accept(result)
+                if stop_reason is not None:
+                    break
+            next_page += workers
+
+    return {"titles": titles, "pages": pages, "stop_reason": stop_reason or f"已達 {last_page} 頁"}
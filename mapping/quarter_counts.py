@@ -0,0 +1,63 @@
+import pandas as pd
+
+# 預設繪製的關鍵字（已統一為大寫）；傳入 None 則統計所有關鍵字
+KEYWORDS = ("PCHOME", "MOMO")
+
+# 由資料庫端依 keyword、季度計數，只傳回統計結果，不必取回文章內容
+# article_date 為爬蟲寫入的 '%Y-%m-%d' 字串，無法解析者（如「無日期」）STR_TO_DATE 回傳 NULL 而被排除
+QUARTER_COUNT_QUERY = """
+    SELECT UPPER(TRIM(keyword)) AS keyword,
+           CONCAT(YEAR(d), 'Q', QUARTER(d)) AS quarter,
+           COUNT(*) AS count
+    FROM (
+        SELECT keyword, STR_TO_DATE(article_date, '%Y-%m-%d') AS d
+        FROM articles
+        WHERE article_content IS NOT NULL
+    ) t
+    WHERE d IS NOT NULL
+    GROUP BY UPPER(TRIM(keyword)), YEAR(d), QUARTER(d)
+"""
+
+# 同上，但近似重複的文章（PTT 轉貼，由 analyze/near_duplicates.py 指派 cluster）每個 cluster 只算一篇；
+# 尚未指派 cluster 的文章各自計數
+DEDUP_QUARTER_COUNT_QUERY = """
+    SELECT UPPER(TRIM(keyword)) AS keyword,
+           CONCAT(YEAR(d), 'Q', QUARTER(d)) AS quarter,
+           COUNT(DISTINCT COALESCE(cluster_id, -id)) AS count
+    FROM (
+        SELECT a.id, a.keyword, c.cluster_id, STR_TO_DATE(a.article_date, '%Y-%m-%d') AS d
+        FROM articles a
+        LEFT JOIN near_duplicate_clusters c ON c.source_table = 'articles' AND c.source_id = a.id
+        WHERE a.article_content IS NOT NULL
+    ) t
+    WHERE d IS NOT NULL
+    GROUP BY UPPER(TRIM(keyword)), YEAR(d), QUARTER(d)
+"""
+
+# 已有文章資料（只需 keyword、article_date 與內文是否存在）時，以向量化的 groupby 計數
+def count_by_quarter(df, keywords=KEYWORDS):
+    dates = pd.to_datetime(df['article_date'], format='%Y-%m-%d', errors='coerce')
+    if 'has_content' in df:
+        has_content = df['has_content'].astype(bool)
+    else:
+        has_content = df['article_content'].notna()
+    mask = dates.notna() & has_content
+
+    counts = (
+        pd.DataFrame({
+            'keyword': df.loc[mask, 'keyword'].str.strip().str.upper(),  # 去除多餘空格並統一為大寫
+            'quarter': dates[mask].dt.to_period('Q').astype(str),        # 提取季度（例如：2025Q1）
+        })
+        .groupby(['keyword', 'quarter'])
+        .size()
+        .reset_index(name='count')
+    )
+    return pivot_quarter_counts(counts, keywords)
+
+# 轉為 index 為季度、欄位為關鍵字的表格；缺少的季度補 0
+def pivot_quarter_counts(counts, keywords=KEYWORDS):
+    table = counts.pivot_table(index='quarter', columns='keyword', values='count', aggfunc='sum', fill_value=0)
+    if keywords is not None:
+        table = table.reindex(columns=list(keywords), fill_value=0)
+        table = table[(table != 0).any(axis=1)]
+    return table.sort_index().astype(int)
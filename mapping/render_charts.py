@@ -0,0 +1,219 @@
+"""
+一次產生 mapping/ 底下所有圖表：只讀取一次 articles 需要的欄位快照，交給各圖表腳本整理資料，
+再以行程池（Agg backend）平行繪圖。輸入資料的 hash 與上次相同且圖檔仍存在的圖表會略過。
+請在 mapping/ 目錄下執行（資料庫設定由環境變數讀取，見 db_env.py）：
+
+    python render_charts.py            # 只重畫輸入資料有變動的圖表
+    python render_charts.py --force    # 全部重畫
+"""
+import matplotlib
+matplotlib.use("Agg")  # 無視窗環境繪圖；fork 出的子行程沿用此設定
+
+import datetime
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import article_snapshot
+from db_env import db_config_from_env
+from token_store import TokenStore
+
+MAPPING_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = "./cache/chart_manifest.json"  # 記錄各圖表上次的輸入 hash 與圖檔路徑
+RENDER_WORKERS = min(4, os.cpu_count() or 1)
+RENDER_VERSION = "1"  # 修改繪圖方式時調升，所有圖表會重畫一次
+
+# 所有圖表共用的欄位；不讀取標題與內文，只保留「是否有內文」
+SNAPSHOT_COLUMNS = ["id", "keyword", "article_date", "sentiment_score", "has_content"]
+
+_modules = {}
+
+
+def load_chart_module(script):
+    """以檔名載入圖表腳本（部分檔名含空白，無法直接 import），每個行程只載入一次"""
+    if script not in _modules:
+        name = os.path.splitext(script)[0].replace(" ", "_")
+        spec = importlib.util.spec_from_file_location(name, os.path.join(MAPPING_DIR, script))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[script] = module
+    return _modules[script]
+
+
+def load_snapshot(db_config):
+    """增量同步本機 Parquet 快照後，只讀取圖表需要的欄位
+
+    同步只傳回新增與變動的列；判斷變動時 DB 端仍會逐列計算 MD5，但不傳回未變動的內文。
+    """
+    article_snapshot.sync_tables(db_config, ["articles"])
+    return article_snapshot.load_table("articles", SNAPSHOT_COLUMNS)
+
+
+# ---------- 各圖表的資料整理：回傳繪圖函式的參數，無資料時回傳 None ----------
+def prepare_score_table(df, records, token_store):
+    table_data = load_chart_module("Emotion_score_sheet.py").build_table_data(df)
+    return {"table_data": table_data} if table_data else None
+
+
+def prepare_donut_chart(df, records, token_store):
+    pchome_ranges, momo_ranges = load_chart_module("Interval_Scor_ Donut_Chart.py").calculate_score_ranges(df)
+    if not sum(pchome_ranges.values()) and not sum(momo_ranges.values()):
+        return None
+    return {"pchome_ranges": pchome_ranges, "momo_ranges": momo_ranges}
+
+
+def prepare_yearly_average(df, records, token_store):
+    pchome_avg_scores, momo_avg_scores = load_chart_module(
+        "Average_scores_per_year_line_chart.py"
+    ).calculate_average_sentiment(df)
+    return {"pchome_avg_scores": pchome_avg_scores, "momo_avg_scores": momo_avg_scores}
+
+
+def prepare_scatter(df, records, token_store):
+    article_dates, sentiment_scores, keywords = load_chart_module("Score_flip_scatter_chart.py").points_from_rows(
+        records, verbose=False
+    )
+    if not article_dates:
+        return None
+    return {"article_dates": article_dates, "sentiment_scores": sentiment_scores, "keywords": keywords}
+
+
+def prepare_quarterly(df, records, token_store):
+    table = load_chart_module("Quarterly_frequency_line_chart.py").count_by_quarter(df)
+    return {"table": table} if not table.empty else None
+
+
+def prepare_bar_chart(keyword):
+    def prepare(df, records, token_store):
+        top_words = load_chart_module("Bar_chart_of_article_word_frequency.py").get_top_words(token_store, keyword)
+        return {"word_counts": top_words, "keyword": keyword} if top_words else None
+    return prepare
+
+
+def prepare_word_cloud(keyword):
+    def prepare(df, records, token_store):
+        top_words = load_chart_module("word_cloud_of_people_vocabulary.py").get_top_word_combinations(
+            token_store, keyword
+        )
+        return {"top_words": top_words, "keyword": keyword} if top_words else None
+    return prepare
+
+
+def chart_definitions(token_store):
+    """(圖表名稱, 腳本檔名, 繪圖函式, 資料整理函式)"""
+    charts = [
+        ("score_table", "Emotion_score_sheet.py", "plot_score_table", prepare_score_table),
+        ("donut_chart", "Interval_Scor_ Donut_Chart.py", "plot_pie_chart", prepare_donut_chart),
+        ("yearly_average", "Average_scores_per_year_line_chart.py", "plot_line_chart", prepare_yearly_average),
+        ("score_scatter", "Score_flip_scatter_chart.py", "plot_scatter", prepare_scatter),
+        ("quarterly_frequency", "Quarterly_frequency_line_chart.py", "plot_quarter_counts", prepare_quarterly),
+    ]
+    for keyword in token_store.keywords():
+        charts.append((f"bar_chart:{keyword}", "Bar_chart_of_article_word_frequency.py", "plot_bar_chart",
+                       prepare_bar_chart(keyword)))
+    for keyword in ["PChome", "momo"]:
+        charts.append((f"word_cloud:{keyword}", "word_cloud_of_people_vocabulary.py", "generate_wordcloud",
+                       prepare_word_cloud(keyword)))
+    return charts
+
+
+# ---------- 變動偵測 ----------
+def _json_default(value):
+    if isinstance(value, pd.DataFrame):
+        return value.to_dict(orient="split")
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if hasattr(value, "item"):  # numpy 純量
+        return value.item()
+    return str(value)
+
+
+def data_hash(script, kwargs):
+    payload = json.dumps([RENDER_VERSION, script, kwargs], default=_json_default, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest):
+    manifest_dir = os.path.dirname(MANIFEST_PATH)
+    if manifest_dir and not os.path.exists(manifest_dir):
+        os.makedirs(manifest_dir)
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+# ---------- 繪圖（於子行程執行） ----------
+def _init_render_worker():
+    matplotlib.use("Agg")
+
+
+def render_chart(script, function_name, kwargs):
+    return getattr(load_chart_module(script), function_name)(**kwargs)
+
+
+def main(db_config, force=False):
+    token_store = TokenStore()
+    updated, total = token_store.sync(db_config)
+    print(f"斷詞結果已同步：更新 {updated} 篇，共 {total} 篇")
+
+    df = load_snapshot(db_config)
+    records = df.to_dict("records")
+    print(f"已讀取 articles 快照：{len(df)} 篇")
+
+    manifest = load_manifest()
+    jobs = []
+    for name, script, function_name, prepare in chart_definitions(token_store):
+        try:
+            kwargs = prepare(df, records, token_store)
+        except Exception as e:  # 單一圖表（例如缺少 wordcloud 套件）失敗不影響其他圖表
+            print(f"[失敗] {name}：{e}")
+            continue
+        if kwargs is None:
+            print(f"[略過] {name}：沒有可繪製的資料")
+            continue
+
+        digest = data_hash(script, kwargs)
+        previous = manifest.get(name)
+        if not force and previous and previous["hash"] == digest and os.path.exists(previous["file"]):
+            print(f"[未變動] {name}：{previous['file']}")
+            continue
+        jobs.append((name, script, function_name, kwargs, digest))
+    token_store.close()
+
+    if not jobs:
+        print("所有圖表皆為最新")
+        return
+
+    with ProcessPoolExecutor(max_workers=RENDER_WORKERS, initializer=_init_render_worker) as executor:
+        futures = {
+            executor.submit(render_chart, script, function_name, kwargs): (name, digest)
+            for name, script, function_name, kwargs, digest in jobs
+        }
+        for future in as_completed(futures):
+            name, digest = futures[future]
+            try:
+                filename = future.result()
+            except Exception as e:
+                print(f"[失敗] {name}：{e}")
+                continue
+            manifest[name] = {"hash": digest, "file": filename}
+            save_manifest(manifest)
+
+    print(f"已重畫 {len(jobs)} 張圖表")
+
+
+if __name__ == "__main__":
+    main(db_config_from_env(), force="--force" in sys.argv[1:])
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+# 情感分數區間：右閉區間，0 歸入第一個區間，即 [0,20]、(20,40]、(40,60]、(60,80]、(80,100]
+# 與舊版各圖表的差異：
+# - 圓餅圖原本以 0<=s<=20、21<=s<=40 ... 判斷，20.5 這類落在整數區間之間的小數分數不列入；現在 20.5 歸入 21-40
+# - 分數表原本以 pd.cut(right=True) 切分，分數 0 不列入；現在 0 歸入 0-20
+SCORE_BINS = [0, 20, 40, 60, 80, 100]
+SCORE_LABELS = ['0-20', '21-40', '41-60', '61-80', '81-100']
+DEFAULT_PERCENTILES = (25, 50, 75)
+
+
+def bucket_index(scores):
+    """回傳每個分數所屬的區間編號 (0-4)；NaN 或超出 0-100 者為 -1
+
+    例如 0 -> 0、20 -> 0、20.5 -> 1、100 -> 4。
+    """
+    scores = np.asarray(scores, dtype=float)
+    index = np.digitize(scores, SCORE_BINS[1:-1], right=True)
+    index[~((scores >= SCORE_BINS[0]) & (scores <= SCORE_BINS[-1]))] = -1  # NaN 比較結果為 False
+    return index
+
+
+def bucket_counts(scores):
+    """{區間標籤: 篇數}"""
+    index = bucket_index(scores)
+    counts = np.bincount(index[index >= 0], minlength=len(SCORE_LABELS))
+    return dict(zip(SCORE_LABELS, counts.tolist()))
+
+
+def parse_years(dates):
+    """'YYYY-MM-DD' 字串或 date / datetime 轉為年份（float），無法解析者為 NaN"""
+    text = pd.Series(dates, dtype=object).astype(str).str[:10]
+    return pd.to_datetime(text, format='%Y-%m-%d', errors='coerce').dt.year.to_numpy(dtype=float)
+
+
+def score_statistics(keywords, scores, ids=None, dates=None, percentiles=DEFAULT_PERCENTILES):
+    """一次計算各 keyword 的分數統計，keyword 依首次出現的順序排列
+
+    回傳 {keyword: {
+        "count": 有分數的篇數, "mean": 平均分數,
+        "buckets": {區間標籤: 篇數},
+        "bucket_ids": {區間標籤: [id, ...]}        （有傳入 ids 時）
+        "yearly_mean": {年份: 平均分數}            （有傳入 dates 時）
+        "percentiles": {百分位: 分數},
+    }}
+    keyword 為 None 或分數為 NaN 的資料不列入。
+    """
+    codes, names = pd.factorize(pd.Series(keywords, dtype=object))
+    scores = np.asarray(pd.to_numeric(pd.Series(scores), errors='coerce'), dtype=float)
+    valid = (codes >= 0) & ~np.isnan(scores)
+    codes, scores = codes[valid], scores[valid]
+    n_keywords, n_buckets = len(names), len(SCORE_LABELS)
+
+    # 每個 keyword 的篇數、總和
+    totals = np.bincount(codes, minlength=n_keywords)
+    sums = np.bincount(codes, weights=scores, minlength=n_keywords)
+
+    # (keyword, 區間) 合併成單一編號後以 bincount 計數
+    buckets = bucket_index(scores)
+    in_range = buckets >= 0
+    cell = codes[in_range] * n_buckets + buckets[in_range]
+    counts = np.bincount(cell, minlength=n_keywords * n_buckets).reshape(n_keywords, n_buckets)
+
+    # 依 keyword 排序後切段，計算百分位數
+    by_keyword = np.split(scores[np.argsort(codes, kind='stable')], np.cumsum(totals)[:-1])
+
+    result = {}
+    for i, name in enumerate(names):
+        group = by_keyword[i]
+        result[name] = {
+            "count": int(totals[i]),
+            "mean": float(sums[i] / totals[i]) if totals[i] else None,
+            "buckets": dict(zip(SCORE_LABELS, counts[i].tolist())),
+            "percentiles": (
+                dict(zip(percentiles, np.percentile(group, percentiles).tolist())) if len(group) else {}
+            ),
+        }
+
+    if ids is not None:
+        # 同一格內維持原本的 id 順序（stable sort）
+        cell_ids = np.asarray(ids)[valid][in_range]
+        ordered = cell_ids[np.argsort(cell, kind='stable')].tolist()
+        bounds = np.concatenate([[0], np.cumsum(counts.reshape(-1))])
+        for i, name in enumerate(names):
+            result[name]["bucket_ids"] = {
+                label: ordered[bounds[i * n_buckets + b]:bounds[i * n_buckets + b + 1]]
+                for b, label in enumerate(SCORE_LABELS)
+            }
+
+    if dates is not None:
+        years = parse_years(dates)[valid]
+        has_year = ~np.isnan(years)
+        unique_years, year_index = np.unique(years[has_year], return_inverse=True)
+        year_cell = codes[has_year] * len(unique_years) + year_index
+        size = n_keywords * len(unique_years)
+        year_counts = np.bincount(year_cell, minlength=size).reshape(n_keywords, len(unique_years))
+        year_sums = np.bincount(year_cell, weights=scores[has_year], minlength=size).reshape(n_keywords, len(unique_years))
+        for i, name in enumerate(names):
+            result[name]["yearly_mean"] = {
+                int(year): float(year_sums[i, j] / year_counts[i, j])
+                for j, year in enumerate(unique_years) if year_counts[i, j]
+            }
+
+    return result
@@ -0,0 +1,422 @@
+"""
+PTT / Dcard / 平台公告文章的全文檢索索引（本機 SQLite FTS5）。
+
+- 內文以 jieba（搜尋引擎模式）斷詞後以空白串接寫入 FTS5，中文詞彙即為 FTS5 的 token
+- 以各資料表的 id 為水位線，每次只斷詞、寫入新增的文章；已索引的文章以 DB 端計算的 MD5 比對，
+  內容被修改（例如 filtered_news 以 upsert 重寫摘要）者重新斷詞，資料表中已不存在的 id 從索引移除
+- 寫入端（analyze/filtered_news.py、reptile/dcard_google_search.py）提交後以 sync_sources() 同步各自的來源
+- 查詢以 FTS5 內建的 BM25 排序，標題權重高於內文，可依日期篩選並分頁
+
+API_Serve.py 的 /search 收到查詢時也會在背景做增量同步（涵蓋其他方式寫入或刪除的文章）；也可以在 mapping/ 目錄下定期（例如 cron）執行
+（資料庫設定由環境變數讀取，見 db_env.py）：
+
+    python search_index.py            # 增量同步
+    python search_index.py --rebuild  # 全部重建
+"""
+import datetime
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+
+import jieba
+import pymysql
+
+from db_env import db_config_from_env
+from token_store import clean_text
+
+# 以本檔位置為準，API_Serve.py 與 mapping/ 底下的腳本共用同一份索引
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "search_index.sqlite3")
+FETCH_SIZE = 500          # 每次從 server-side cursor 取回的文章數
+TOKENIZE_CHUNKSIZE = 16   # 每次派給子行程的文章數
+TITLE_WEIGHT = 3.0        # BM25 欄位權重：標題命中比內文命中重要
+BODY_WEIGHT = 1.0
+NEAR_DISTANCE = 5         # 被斷成多個詞的查詢詞，各詞在內文中最多相隔幾個 token
+INDEX_VERSION = "2"       # 修改斷詞或欄位時調升，下次開啟會清空並重建
+CJK_WORD = re.compile(r"[\u4e00-\u9fa5]+")
+
+# 來源名稱 -> 資料表與欄位對應
+SEARCH_SOURCES = {
+    # PTT 網購版文章（與 API 的 PttArticles 等相同，讀取 judy_db）
+    "ptt": {
+        "table": "judy_db",
+        "title": "article_title",
+        "body": ["article_content"],
+        "date": "article_date",
+        "label": "keyword",
+        "url": None,
+    },
+    # Google CSE 取得的 Dcard 文章
+    "dcard": {
+        "table": "wilson_search_results",
+        "title": "title",
+        "body": ["content"],
+        "date": "publish_date",
+        "label": "platform",
+        "url": "article_url",
+    },
+    # 平台公告（含 LLM 摘要）
+    "news": {
+        "table": "wilson_filtered_news",
+        "title": "title",
+        "body": ["summary", "content"],
+        "date": "publish_date",
+        "label": "platform",
+        "url": "article_url",
+    },
+}
+
+
+def normalize_date(value):
+    """date / datetime / 'YYYY-M-D' 字串 -> 'YYYY-MM-DD'，無法解析（如「無日期」）時回傳 None"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime("%Y-%m-%d")
+    match = re.match(r"(\d{4})[-/](\d{1,2})[-/](\d{1,2})", str(value or ""))
+    if not match:
+        return None
+    return f"{match.group(1)}-{int(match.group(2)):02d}-{int(match.group(3)):02d}"
+
+
+def index_tokens(text):
+    """寫入索引用的斷詞：搜尋引擎模式會額外切出長詞中的短詞，查「客服」也能找到「客服中心」
+
+    jieba 字典以簡體為主，繁體的長詞常整段未被拆開（如「問退貨」、「出貨快」），
+    因此三字以上的中文詞再加入其二字組，查「退貨」、「出貨」才找得到。
+    """
+    tokens = []
+    for word in jieba.lcut_for_search(clean_text(text or "")):
+        if not word.strip():
+            continue
+        word = word.lower()
+        tokens.append(word)
+        if len(word) > 2 and CJK_WORD.fullmatch(word):
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def query_tokens(text):
+    """查詢用的斷詞：使用一般模式，避免查詢詞被拆成過多碎片"""
+    return [w.lower() for w in jieba.lcut(clean_text(text or "")) if w.strip()]
+
+
+def _quote(token):
+    return '"' + token.replace('"', '""') + '"'
+
+
+def build_match_query(query, mode="and"):
+    """將使用者輸入轉為 FTS5 MATCH 語法
+
+    以空白分隔的每個查詢詞各自斷詞：單一詞直接比對，被斷成多個詞者需在內文中鄰近出現（NEAR）。
+    mode="and" 時所有查詢詞都需命中，"or" 時任一命中即可。沒有可查詢的詞時回傳 None。
+    """
+    clauses = []
+    for term in query.split():
+        tokens = query_tokens(term)
+        if not tokens:
+            continue
+        if len(tokens) == 1:
+            clauses.append(_quote(tokens[0]))
+        else:
+            clauses.append(f"NEAR({' '.join(_quote(t) for t in tokens)}, {NEAR_DISTANCE})")
+    if not clauses:
+        return None
+    return f" {'OR' if mode == 'or' else 'AND'} ".join(clauses)
+
+
+def _init_worker():
+    # 每個子行程啟動時只載入一次 jieba 字典
+    jieba.initialize()
+
+
+def _tokenize_document(document):
+    return document, " ".join(index_tokens(document["title"])), " ".join(index_tokens(document["body"]))
+
+
+class SearchIndex:
+    """以 (來源, 文章 id) 為 key 的全文檢索索引
+
+    - documents：來源、文章 id、標題、日期、標籤（PTT keyword / 平台）與網址
+    - documents_fts：斷詞後的標題與內文（FTS5），rowid 與 documents 相同
+    - meta：各來源的 id 水位線與索引版本
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        index_dir = os.path.dirname(path)
+        if index_dir and not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+
+        self.path = path
+        # API 以多執行緒處理請求，呼叫端需自行以 lock 確保同一時間只有一個執行緒使用
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS documents (
+                rowid INTEGER PRIMARY KEY,
+                source TEXT NOT NULL,
+                doc_id INTEGER NOT NULL,
+                title TEXT,
+                doc_date TEXT,
+                label TEXT,
+                url TEXT,
+                content_hash TEXT,
+                UNIQUE (source, doc_id)
+            );
+            CREATE INDEX IF NOT EXISTS documents_date_idx ON documents (doc_date);
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                title, body, tokenize = 'unicode61 remove_diacritics 0'
+            );
+        """)
+        self._conn.commit()
+
+        version = self._get_meta("index_version")
+        if version != INDEX_VERSION:
+            if "content_hash" not in [row[1] for row in self._conn.execute("PRAGMA table_info(documents)")]:
+                self._conn.execute("ALTER TABLE documents ADD COLUMN content_hash TEXT")
+            self.clear()
+
+    # ---------- meta ----------
+    def _get_meta(self, key, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def watermark(self, source):
+        return int(self._get_meta(f"watermark:{source}", 0))
+
+    def clear(self, source=None):
+        """清空索引（或單一來源）；下次同步會從頭建立"""
+        if source is None:
+            self._conn.executescript("DELETE FROM documents; DELETE FROM documents_fts; DELETE FROM meta;")
+            self._set_meta("index_version", INDEX_VERSION)
+        else:
+            self._conn.execute(
+                "DELETE FROM documents_fts WHERE rowid IN (SELECT rowid FROM documents WHERE source = ?)", (source,)
+            )
+            self._conn.execute("DELETE FROM documents WHERE source = ?", (source,))
+            self._conn.execute("DELETE FROM meta WHERE key = ?", (f"watermark:{source}",))
+        self._conn.commit()
+
+    # ---------- 寫入 ----------
+    def put(self, source, document, title_tokens, body_tokens):
+        """寫入（或覆寫）一篇已斷詞的文章；document 需含 id、title、date、label、url，hash 可省略"""
+        self.delete(source, document["id"])
+        cursor = self._conn.execute(
+            "INSERT INTO documents (source, doc_id, title, doc_date, label, url, content_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (source, document["id"], document["title"], normalize_date(document["date"]),
+             document["label"], document["url"], document.get("hash")),
+        )
+        self._conn.execute(
+            "INSERT INTO documents_fts (rowid, title, body) VALUES (?, ?, ?)",
+            (cursor.lastrowid, title_tokens, body_tokens),
+        )
+
+    def delete(self, source, doc_id):
+        row = self._conn.execute(
+            "SELECT rowid FROM documents WHERE source = ? AND doc_id = ?", (source, doc_id)
+        ).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (row[0],))
+            self._conn.execute("DELETE FROM documents WHERE rowid = ?", (row[0],))
+
+    def add_documents(self, source, documents, pool=None):
+        """斷詞並寫入多篇文章，水位線推進到其中最大的 id；回傳寫入篇數"""
+        if pool is None:
+            jieba.initialize()
+            tokenized = map(_tokenize_document, documents)
+        else:
+            tokenized = pool.imap(_tokenize_document, documents, chunksize=TOKENIZE_CHUNKSIZE)
+
+        count = 0
+        watermark = self.watermark(source)
+        for document, title_tokens, body_tokens in tokenized:
+            self.put(source, document, title_tokens, body_tokens)
+            watermark = max(watermark, document["id"])
+            count += 1
+        self._set_meta(f"watermark:{source}", watermark)
+        self._conn.commit()
+        return count
+
+    def indexed_ids(self, source):
+        return {row[0] for row in self._conn.execute("SELECT doc_id FROM documents WHERE source = ?", (source,))}
+
+    def indexed_hashes(self, source):
+        """{文章 id: 寫入時的內容 MD5}"""
+        return dict(self._conn.execute("SELECT doc_id, content_hash FROM documents WHERE source = ?", (source,)))
+
+    # ---------- 與 MariaDB 同步 ----------
+    @staticmethod
+    def _fields(spec):
+        return [spec["title"], spec["date"], spec["label"], spec["url"] or "NULL"] + spec["body"]
+
+    @classmethod
+    def _hash_sql(cls, spec):
+        """索引欄位的 MD5（ISNULL 區分 NULL 與空字串）；由 DB 端計算，未修改的文章不必傳回內文"""
+        values = []
+        for field in cls._fields(spec):
+            values += [f"ISNULL({field})", field]
+        return f"MD5(CONCAT_WS('|', {', '.join(values)}))"
+
+    @classmethod
+    def _select_sql(cls, spec, condition):
+        columns = ["id"] + cls._fields(spec) + [cls._hash_sql(spec)]
+        return f"SELECT {', '.join(columns)} FROM {spec['table']} WHERE {condition} ORDER BY id"
+
+    @staticmethod
+    def _to_document(row):
+        return {
+            "id": row[0],
+            "title": row[1] or "",
+            "date": row[2],
+            "label": row[3],
+            "url": row[4],
+            "body": "\n".join(part for part in row[5:-1] if part),
+            "hash": row[-1],
+        }
+
+    def sync_source(self, conn, source, pool=None):
+        """寫入 id 大於水位線的新文章、重新斷詞內容被修改的文章，並移除資料表中已刪除的文章
+
+        回傳 (新增篇數, 更新篇數, 移除篇數)。
+        """
+        spec = SEARCH_SOURCES[source]
+
+        # 修改與刪除偵測只需比對 id 與 MD5，不必傳回內文
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT id, {self._hash_sql(spec)} FROM {spec['table']}")
+        remote = dict(cursor.fetchall())
+        cursor.close()
+        known = self.indexed_hashes(source)
+        removed = known.keys() - remote.keys()
+        for doc_id in removed:
+            self.delete(source, doc_id)
+        self._conn.commit()
+
+        watermark = self.watermark(source)
+        changed = [doc_id for doc_id, digest in remote.items() if doc_id <= watermark and known.get(doc_id) != digest]
+        cursor = conn.cursor()
+        for start in range(0, len(changed), FETCH_SIZE):
+            chunk = changed[start:start + FETCH_SIZE]
+            cursor.execute(self._select_sql(spec, f"id IN ({', '.join(['%s'] * len(chunk))})"), chunk)
+            self.add_documents(source, [self._to_document(row) for row in cursor.fetchall()], pool)
+        cursor.close()
+
+        added = 0
+        cursor = conn.cursor(pymysql.cursors.SSCursor)
+        cursor.execute(self._select_sql(spec, "id > %s"), (watermark,))
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            added += self.add_documents(source, [self._to_document(row) for row in rows], pool)
+        cursor.close()
+        return added, len(changed), len(removed)
+
+    def sync(self, db_config, sources=None, workers=1):
+        """同步指定的來源（預設全部）；不存在的資料表略過。回傳 {來源: (新增篇數, 更新篇數, 移除篇數)}"""
+        conn = pymysql.connect(**db_config)
+        pool = multiprocessing.Pool(workers, initializer=_init_worker) if workers > 1 else None
+        result = {}
+        try:
+            for source in sources or SEARCH_SOURCES:
+                try:
+                    result[source] = self.sync_source(conn, source, pool)
+                except pymysql.err.ProgrammingError as e:
+                    print(f"略過 {source}：{e}")
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            conn.close()
+        return result
+
+    # ---------- 查詢 ----------
+    def search(self, query, sources=None, start_date=None, end_date=None, mode="and", page=1, per_page=20):
+        """BM25 排序的全文檢索；回傳 (總筆數, 該頁結果)，score 越高越相關"""
+        match = build_match_query(query, mode)
+        if match is None:
+            return 0, []
+
+        conditions = ["documents_fts MATCH ?"]
+        params = [match]
+        if sources:
+            conditions.append(f"d.source IN ({','.join('?' * len(sources))})")
+            params.extend(sources)
+        if start_date:
+            conditions.append("d.doc_date >= ?")
+            params.append(normalize_date(start_date))
+        if end_date:
+            conditions.append("d.doc_date <= ?")
+            params.append(normalize_date(end_date))
+        where = " AND ".join(conditions)
+
+        total = self._conn.execute(
+            f"SELECT COUNT(*) FROM documents_fts JOIN documents d ON d.rowid = documents_fts.rowid WHERE {where}",
+            params,
+        ).fetchone()[0]
+        rows = self._conn.execute(
+            f"""
+            SELECT d.source, d.doc_id, d.title, d.doc_date, d.label, d.url,
+                   bm25(documents_fts, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS rank
+            FROM documents_fts JOIN documents d ON d.rowid = documents_fts.rowid
+            WHERE {where}
+            ORDER BY rank
+            LIMIT ? OFFSET ?
+            """,
+            params + [per_page, (page - 1) * per_page],
+        ).fetchall()
+
+        results = [
+            {
+                "source": source,
+                "id": doc_id,
+                "title": title,
+                "date": doc_date,
+                "label": label,
+                "url": url,
+                "score": round(-rank, 6),  # FTS5 的 bm25() 越小越相關，轉為越大越相關
+            }
+            for source, doc_id, title, doc_date, label, url, rank in rows
+        ]
+        return total, results
+
+    def count(self, source=None):
+        if source is None:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return self._conn.execute("SELECT COUNT(*) FROM documents WHERE source = ?", (source,)).fetchone()[0]
+
+    def optimize(self):
+        """合併 FTS5 內部的 b-tree 片段（大量寫入後執行可加快查詢）"""
+        self._conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def sync_sources(db_config, sources, path=DEFAULT_INDEX_PATH):
+    """供寫入端在提交後呼叫：只同步剛寫入的來源，回傳 {來源: (新增篇數, 更新篇數, 移除篇數)}"""
+    index = SearchIndex(path)
+    try:
+        return index.sync(db_config, sources)
+    finally:
+        index.close()
+
+
+def main(db_config, rebuild=False):
+    index = SearchIndex()
+    if rebuild:
+        index.clear()
+    result = index.sync(db_config, workers=os.cpu_count() or 1)
+    index.optimize()
+    for source, (added, updated, removed) in result.items():
+        print(f"{source}: 新增 {added} 篇，更新 {updated} 篇，移除 {removed} 篇，索引共 {index.count(source)} 篇")
+    index.close()
+
+
+if __name__ == "__main__":
+    main(db_config_from_env(), rebuild="--rebuild" in sys.argv[1:])
@@ -0,0 +1,30 @@
+import numpy as np
+
+from score_stats import SCORE_LABELS, bucket_counts, bucket_index, score_statistics
+
+
+def test_bucket_boundaries():
+    scores = [0, 20, 20.5, 40, 40.1, 80.5, 100]
+    assert bucket_index(scores).tolist() == [0, 0, 1, 1, 2, 4, 4]
+
+
+def test_out_of_range_and_nan_are_excluded():
+    assert bucket_index([-0.5, 100.5, np.nan]).tolist() == [-1, -1, -1]
+    assert bucket_counts([0, 20, 20.5, 100, np.nan, 101]) == {
+        '0-20': 2, '21-40': 1, '41-60': 0, '61-80': 0, '81-100': 1,
+    }
+
+
+def test_score_statistics_buckets_and_ids():
+    result = score_statistics(
+        keywords=['a', 'a', 'a', 'a', 'b'],
+        scores=[0, 20, 20.5, 100, 55],
+        ids=[1, 2, 3, 4, 5],
+    )
+    assert list(result) == ['a', 'b']
+    assert result['a']['count'] == 4
+    assert result['a']['buckets'] == dict(zip(SCORE_LABELS, [2, 1, 0, 0, 1]))
+    assert result['a']['bucket_ids']['0-20'] == [1, 2]
+    assert result['a']['bucket_ids']['21-40'] == [3]
+    assert result['a']['bucket_ids']['81-100'] == [4]
+    assert result['b']['buckets']['41-60'] == 1
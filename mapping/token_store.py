@@ -0,0 +1,402 @@
+import hashlib
+import multiprocessing
+import os
+import re
+import sqlite3
+from collections import Counter
+import jieba
+import numpy as np
+import pymysql
+
+# 斷詞結果保存位置（相對於執行目錄，與 ./cache/llm_cache.sqlite3 相同慣例）
+DEFAULT_STORE_PATH = "./cache/token_store.sqlite3"
+SYNC_FETCH_SIZE = 500    # 同步時每次從 DB 取回內文的文章數
+TOKENIZE_CHUNKSIZE = 16  # 每次派給子行程的文章數
+TOKEN_DTYPE = np.uint32
+
+# 詞頻索引：文字雲以這些錨點詞前後 CONTEXT_WINDOW 個詞計算搭配詞
+CONTEXT_ANCHORS = ("有人",)
+CONTEXT_WINDOW = 3
+INDEX_VERSION = "2"  # 修改索引計算方式時調升，下次開啟會自動重建（2：keyword 正規化）
+
+
+def clean_text(text):
+    """
+    先行文本清洗：移除網址、多餘標點等
+    """
+    # 去除 URL
+    text = re.sub(r'http[s]?://\S+', '', text)
+
+    # 只保留中英數字（其他符號一律變空白）
+    text = re.sub(r'[^A-Za-z0-9\u4e00-\u9fa5]+', ' ', text)
+
+    # 去除多餘空白
+    text = text.strip()
+    text = re.sub(r'\s+', ' ', text)
+    return text
+
+
+def tokenize(raw_content):
+    """所有文字探勘腳本共用的斷詞：清洗後以 jieba 斷詞，去除空白 token（停用詞由各腳本自行過濾）"""
+    return [w for w in jieba.lcut(clean_text(raw_content or "")) if w.strip()]
+
+
+def normalize_keyword(keyword):
+    """去除前後空白並轉小寫，與 MariaDB 預設 collation 下 keyword = 'momo' 的比對結果一致（"MOMO"、"momo " 視為同一個）"""
+    return keyword.strip().lower() if keyword is not None else None
+
+
+def content_hash(raw_content):
+    """與 MariaDB 的 MD5(article_content) 相同，可直接在 SQL 端比對內容是否變更"""
+    return hashlib.md5((raw_content or "").encode("utf-8")).hexdigest()
+
+
+def to_quarter(article_date):
+    """'2024-05-01' -> '2024Q2'，無法解析時回傳空字串"""
+    match = re.match(r"(\d{4})-(\d{1,2})", str(article_date or ""))
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        return ""
+    return f"{match.group(1)}Q{(int(match.group(2)) - 1) // 3 + 1}"
+
+
+def _init_worker():
+    # 每個子行程啟動時只載入一次 jieba 字典
+    jieba.initialize()
+
+
+def _tokenize_row(row):
+    return row, tokenize(row['article_content'])
+
+
+class TokenStore:
+    """以文章 id 為 key 保存斷詞結果的本機 SQLite 檔
+
+    - vocab：詞 -> 整數 id
+    - article_tokens：每篇文章的 content hash、keyword（以 normalize_keyword 正規化）、日期與 uint32 陣列形式的 token id 序列
+    - keyword_terms / quarter_terms：各 keyword（及季度）的文件頻率 df 與詞頻 tf
+    - context_terms：各 keyword 中錨點詞（如「有人」）前後視窗內的搭配詞次數
+    內容 hash 不變的文章不會重新斷詞；文章新增、變更或刪除時，索引以差量同步更新。
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        store_dir = os.path.dirname(path)
+        if store_dir and not os.path.exists(store_dir):
+            os.makedirs(store_dir)
+
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vocab (id INTEGER PRIMARY KEY, word TEXT NOT NULL UNIQUE)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS article_tokens (
+                article_id INTEGER PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                keyword TEXT,
+                article_date TEXT,
+                tokens BLOB NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS article_tokens_keyword_idx ON article_tokens (keyword)")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS keyword_terms (
+                keyword TEXT NOT NULL, word_id INTEGER NOT NULL,
+                df INTEGER NOT NULL, tf INTEGER NOT NULL,
+                PRIMARY KEY (keyword, word_id)
+            );
+            CREATE INDEX IF NOT EXISTS keyword_terms_df_idx ON keyword_terms (keyword, df DESC);
+            CREATE TABLE IF NOT EXISTS quarter_terms (
+                keyword TEXT NOT NULL, quarter TEXT NOT NULL, word_id INTEGER NOT NULL,
+                df INTEGER NOT NULL, tf INTEGER NOT NULL,
+                PRIMARY KEY (keyword, quarter, word_id)
+            );
+            CREATE INDEX IF NOT EXISTS quarter_terms_df_idx ON quarter_terms (keyword, quarter, df DESC);
+            CREATE TABLE IF NOT EXISTS context_terms (
+                keyword TEXT NOT NULL, anchor TEXT NOT NULL, word_id INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (keyword, anchor, word_id)
+            );
+            CREATE INDEX IF NOT EXISTS context_terms_count_idx ON context_terms (keyword, anchor, count DESC);
+        """)
+        self._conn.commit()
+
+        self.words = [None]  # id 從 1 開始，0 保留
+        self.word_ids = {}
+        for word_id, word in self._conn.execute("SELECT id, word FROM vocab ORDER BY id"):
+            while len(self.words) < word_id:
+                self.words.append(None)
+            self.words.append(word)
+            self.word_ids[word] = word_id
+
+        # 舊版未正規化的 keyword
+        for (keyword,) in self._conn.execute("SELECT DISTINCT keyword FROM article_tokens").fetchall():
+            if keyword != normalize_keyword(keyword):
+                self._conn.execute(
+                    "UPDATE article_tokens SET keyword = ? WHERE keyword = ?", (normalize_keyword(keyword), keyword)
+                )
+        self._conn.commit()
+
+        version = self._conn.execute("SELECT value FROM meta WHERE key = 'index_version'").fetchone()
+        if version is None or version[0] != INDEX_VERSION:
+            self.rebuild_index()
+
+    # ---------- 編碼 / 解碼 ----------
+    def encode(self, tokens):
+        ids = []
+        for token in tokens:
+            word_id = self.word_ids.get(token)
+            if word_id is None:
+                word_id = len(self.words)
+                self.words.append(token)
+                self.word_ids[token] = word_id
+                self._conn.execute("INSERT INTO vocab (id, word) VALUES (?, ?)", (word_id, token))
+            ids.append(word_id)
+        return np.array(ids, dtype=TOKEN_DTYPE)
+
+    def decode(self, token_ids):
+        words = self.words
+        return [words[i] for i in token_ids]
+
+    # ---------- 詞頻索引 ----------
+    def _index_apply(self, keyword, article_date, token_ids, sign):
+        """將一篇文章的貢獻加入 (sign=1) 或扣除 (sign=-1) 詞頻索引"""
+        keyword = normalize_keyword(keyword) or ""
+        quarter = to_quarter(article_date)
+        tf = Counter(int(i) for i in token_ids)
+        term_rows = [(keyword, word_id, sign, sign * count) for word_id, count in tf.items()]
+        self._conn.executemany("""
+            INSERT INTO keyword_terms (keyword, word_id, df, tf) VALUES (?, ?, ?, ?)
+            ON CONFLICT (keyword, word_id) DO UPDATE SET df = df + excluded.df, tf = tf + excluded.tf
+        """, term_rows)
+        self._conn.executemany("""
+            INSERT INTO quarter_terms (keyword, quarter, word_id, df, tf) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (keyword, quarter, word_id) DO UPDATE SET df = df + excluded.df, tf = tf + excluded.tf
+        """, [(keyword, quarter, word_id, df, count) for keyword, word_id, df, count in term_rows])
+
+        words = self.decode(token_ids)
+        for anchor in CONTEXT_ANCHORS:
+            if anchor not in words:
+                continue
+            # 與文字雲相同：只取第一次出現的位置
+            index = words.index(anchor)
+            window = token_ids[max(0, index - CONTEXT_WINDOW):index + CONTEXT_WINDOW + 1]
+            self._conn.executemany("""
+                INSERT INTO context_terms (keyword, anchor, word_id, count) VALUES (?, ?, ?, ?)
+                ON CONFLICT (keyword, anchor, word_id) DO UPDATE SET count = count + excluded.count
+            """, [(keyword, anchor, word_id, sign * count)
+                  for word_id, count in Counter(int(i) for i in window).items()])
+
+    def _index_remove(self, article_id):
+        row = self._conn.execute(
+            "SELECT keyword, article_date, tokens FROM article_tokens WHERE article_id = ?", (article_id,)
+        ).fetchone()
+        if row is not None:
+            self._index_apply(row[0], row[1], np.frombuffer(row[2], dtype=TOKEN_DTYPE), -1)
+
+    def rebuild_index(self):
+        """由 article_tokens 全量重建詞頻索引"""
+        self._conn.executescript("DELETE FROM keyword_terms; DELETE FROM quarter_terms; DELETE FROM context_terms;")
+        for _, keyword, article_date, token_ids in list(self.iter_token_ids()):
+            self._index_apply(keyword, article_date, token_ids, 1)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('index_version', ?)", (INDEX_VERSION,)
+        )
+        self.commit()
+
+    # ---------- 寫入 ----------
+    def put(self, article_id, raw_content, tokens, keyword=None, article_date=None, digest=None):
+        keyword = normalize_keyword(keyword)
+        article_date = str(article_date) if article_date is not None else None
+        token_ids = self.encode(tokens)
+        self._index_remove(article_id)
+        self._conn.execute(
+            """
+            INSERT OR REPLACE INTO article_tokens (article_id, content_hash, keyword, article_date, tokens)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (article_id, digest or content_hash(raw_content), keyword, article_date, token_ids.tobytes()),
+        )
+        self._index_apply(keyword, article_date, token_ids, 1)
+
+    def update_metadata(self, article_id, keyword, article_date):
+        """內容未變、只有 keyword 或日期改變時，搬移該文章在索引中的位置"""
+        keyword = normalize_keyword(keyword)
+        article_date = str(article_date) if article_date is not None else None
+        self._index_remove(article_id)
+        self._conn.execute(
+            "UPDATE article_tokens SET keyword = ?, article_date = ? WHERE article_id = ?",
+            (keyword, article_date, article_id),
+        )
+        row = self._conn.execute("SELECT tokens FROM article_tokens WHERE article_id = ?", (article_id,)).fetchone()
+        self._index_apply(keyword, article_date, np.frombuffer(row[0], dtype=TOKEN_DTYPE), 1)
+
+    def delete(self, article_id):
+        self._index_remove(article_id)
+        self._conn.execute("DELETE FROM article_tokens WHERE article_id = ?", (article_id,))
+
+    def commit(self):
+        # 扣除後歸零的索引列直接移除
+        self._conn.executescript("""
+            DELETE FROM keyword_terms WHERE df <= 0;
+            DELETE FROM quarter_terms WHERE df <= 0;
+            DELETE FROM context_terms WHERE count <= 0;
+        """)
+        self._conn.commit()
+
+    # ---------- 讀取 ----------
+    def known_articles(self):
+        """{article_id: (content_hash, keyword, article_date)}"""
+        return {
+            article_id: (digest, keyword, article_date)
+            for article_id, digest, keyword, article_date in self._conn.execute(
+                "SELECT article_id, content_hash, keyword, article_date FROM article_tokens"
+            )
+        }
+
+    def lookup(self, rows):
+        """rows 需含 id 與 article_content；回傳內容未變更者的 {id: tokens}"""
+        found = {}
+        ids = [row['id'] for row in rows]
+        for start in range(0, len(ids), 900):
+            part = ids[start:start + 900]
+            placeholders = ",".join("?" * len(part))
+            for article_id, digest, blob in self._conn.execute(
+                f"SELECT article_id, content_hash, tokens FROM article_tokens WHERE article_id IN ({placeholders})",
+                part,
+            ):
+                found[article_id] = (digest, blob)
+
+        result = {}
+        for row in rows:
+            entry = found.get(row['id'])
+            if entry and entry[0] == content_hash(row['article_content']):
+                result[row['id']] = self.decode(np.frombuffer(entry[1], dtype=TOKEN_DTYPE))
+        return result
+
+    def keywords(self):
+        return [row[0] for row in self._conn.execute("SELECT DISTINCT keyword FROM article_tokens ORDER BY keyword")]
+
+    def iter_token_ids(self, keyword=None):
+        """逐篇產出 (article_id, keyword, article_date, token id 陣列)；keyword 不分大小寫、忽略前後空白"""
+        query = "SELECT article_id, keyword, article_date, tokens FROM article_tokens"
+        params = ()
+        if keyword is not None:
+            query += " WHERE keyword = ?"
+            params = (normalize_keyword(keyword),)
+        for article_id, kw, article_date, blob in self._conn.execute(query + " ORDER BY article_id", params):
+            yield article_id, kw, article_date, np.frombuffer(blob, dtype=TOKEN_DTYPE)
+
+    def iter_tokens(self, keyword=None):
+        """逐篇產出 (article_id, keyword, article_date, token 列表)"""
+        for article_id, kw, article_date, token_ids in self.iter_token_ids(keyword):
+            yield article_id, kw, article_date, self.decode(token_ids)
+
+    # ---------- 與 articles 資料表同步 ----------
+    def tokenize_rows(self, rows, pool=None):
+        """對 rows 斷詞並寫入；內容未變更者直接取用既有結果。依完成順序產出 (row, tokens)"""
+        cached = self.lookup(rows)
+        missing = []
+        for row in rows:
+            if row['id'] in cached:
+                yield row, cached[row['id']]
+            else:
+                missing.append(row)
+
+        if pool is None:
+            jieba.initialize()
+            tokenized = map(_tokenize_row, missing)
+        else:
+            tokenized = pool.imap(_tokenize_row, missing, chunksize=TOKENIZE_CHUNKSIZE)
+
+        for row, tokens in tokenized:
+            self.put(row['id'], row['article_content'], tokens, row.get('keyword'), row.get('article_date'))
+            yield row, tokens
+        self.commit()
+
+    def sync(self, db_config, workers=os.cpu_count() or 1):
+        """只對 articles 中新增或內容變更的文章斷詞，並移除已刪除的文章；回傳 (更新篇數, 總篇數)"""
+        conn = pymysql.connect(**db_config)
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+        # 由 DB 端計算 MD5，未變更的文章不必傳回內文
+        cursor.execute("SELECT id, keyword, article_date, MD5(article_content) AS digest FROM articles")
+        remote = cursor.fetchall()
+        known = self.known_articles()
+        changed = [row for row in remote
+                   if row['id'] not in known or known[row['id']][0] != (row['digest'] or content_hash(""))]
+
+        # keyword / 日期可能被修改，內容未變者只搬移索引位置
+        for row in remote:
+            entry = known.get(row['id'])
+            if entry is None or entry[0] != (row['digest'] or content_hash("")):
+                continue
+            article_date = str(row['article_date']) if row['article_date'] is not None else None
+            if (entry[1], entry[2]) != (normalize_keyword(row['keyword']), article_date):
+                self.update_metadata(row['id'], row['keyword'], article_date)
+
+        removed = set(known) - {row['id'] for row in remote}
+        for article_id in removed:
+            self.delete(article_id)
+        self.commit()
+
+        pool = multiprocessing.Pool(workers, initializer=_init_worker) if workers > 1 and changed else None
+        try:
+            for start in range(0, len(changed), SYNC_FETCH_SIZE):
+                part = changed[start:start + SYNC_FETCH_SIZE]
+                placeholders = ",".join(["%s"] * len(part))
+                cursor.execute(
+                    f"SELECT id, keyword, article_date, article_content FROM articles WHERE id IN ({placeholders})",
+                    [row['id'] for row in part],
+                )
+                rows = cursor.fetchall()
+                tokenized = pool.imap(_tokenize_row, rows, chunksize=TOKENIZE_CHUNKSIZE) if pool else map(_tokenize_row, rows)
+                for row, tokens in tokenized:
+                    self.put(row['id'], row['article_content'], tokens, row['keyword'], row['article_date'])
+                self.commit()
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            cursor.close()
+            conn.close()
+
+        self.commit()
+        return len(changed), len(remote)
+
+    # ---------- Top-N 查詢 ----------
+    def top_terms(self, keyword, top_n=5, quarter=None, by="df", keep=None):
+        """依 df（出現文章數）或 tf（總次數）取得前 top_n 個詞；keep(word) 為 False 的詞略過"""
+        order = "df" if by == "df" else "tf"
+        keyword = normalize_keyword(keyword)
+        if quarter is None:
+            cursor = self._conn.execute(
+                f"SELECT word_id, {order} FROM keyword_terms WHERE keyword = ? ORDER BY {order} DESC",
+                (keyword or "",),
+            )
+        else:
+            cursor = self._conn.execute(
+                f"SELECT word_id, {order} FROM quarter_terms WHERE keyword = ? AND quarter = ? ORDER BY {order} DESC",
+                (keyword or "", quarter),
+            )
+        return self._take(cursor, top_n, keep)
+
+    def top_context_terms(self, keyword, anchor=CONTEXT_ANCHORS[0], top_n=50, keep=None):
+        """取得錨點詞前後 CONTEXT_WINDOW 個詞內最常出現的搭配詞"""
+        cursor = self._conn.execute(
+            "SELECT word_id, count FROM context_terms WHERE keyword = ? AND anchor = ? ORDER BY count DESC",
+            (normalize_keyword(keyword) or "", anchor),
+        )
+        return self._take(cursor, top_n, keep)
+
+    def _take(self, cursor, top_n, keep):
+        result = []
+        for word_id, count in cursor:
+            word = self.words[word_id]
+            if keep is None or keep(word):
+                result.append((word, count))
+                if len(result) >= top_n:
+                    break
+        return result
+
+    def close(self):
+        self._conn.close()
@@ -1,11 +1,9 @@
-import pymysql
-import jieba
-from collections import Counter
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
 from matplotlib.font_manager import FontProperties
 from datetime import datetime
 import os
+from token_store import TokenStore  # 與情感分析、詞頻圖共用的斷詞結果
 
 # 資料庫連接設定
 db_config = {
@@ -30,58 +28,27 @@ STOP_WORDS = set([
 font_path = os.path.expanduser("~/.fonts/NotoSansCJK-Regular.ttc")
 custom_font = FontProperties(fname=font_path)
 
-# 連接資料庫並讀取資料，按照momo pchome做過濾
-def read_from_db(keyword=None):
-    conn = pymysql.connect(**db_config)
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-    
-    # 若提供了關鍵字，則過濾資料
-    if keyword:
-        query = f"SELECT `article_content` FROM articles WHERE `keyword` = '{keyword}'"
-    else:
-        query = "SELECT `article_content` FROM articles"
-    
-    cursor.execute(query)
-    data = [row['article_content'] for row in cursor.fetchall()]
-    cursor.close()
-    conn.close()
-    return data
-
-# 提取上下文
-def extract_contexts(contents, keyword="有人", window=3):
-    contexts = []
-    
-    for content in contents:
-        words = jieba.lcut(content)  # 分詞
-        if keyword in words:
-            index = words.index(keyword)
-            # 抓取前後的詞作為上下文
-            start = max(0, index - window)
-            end = min(len(words), index + window + 1)
-            context = words[start:end]
-            contexts.append(" ".join(context))
-    
-    return contexts
+# 同步共用斷詞結果（只有新增或內容變更的文章會重新斷詞，搭配詞索引同步以差量更新）
+def read_from_db():
+    token_store = TokenStore()
+    token_store.sync(db_config)
+    return token_store
 
-# 找出和 "有人" 常搭配的詞
-def get_top_word_combinations(contexts):
-    word_combinations = Counter()
-    
-    for context in contexts:
-        words = jieba.lcut(context)
-        for word in words:
-            if word not in STOP_WORDS and len(word) > 1:  # 過濾停用詞
-                word_combinations[word] += 1
-    
-    return word_combinations.most_common(50)
+# 找出和 "有人" 常搭配的詞：直接查詢 token_store 維護的上下文索引（前後各 CONTEXT_WINDOW 個詞）
+def get_top_word_combinations(token_store, keyword, anchor="有人"):
+    return token_store.top_context_terms(
+        keyword, anchor, top_n=50,
+        keep=lambda word: word not in STOP_WORDS and len(word) > 1  # 過濾停用詞
+    )
 
 # 生成並保存詞雲圖像
-def generate_wordcloud(top_words, keyword="有人"):
+def generate_wordcloud(top_words, keyword="有人", filename=None):
     wordcloud = WordCloud(font_path=font_path, width=800, height=400).generate_from_frequencies(dict(top_words))
     
     # 生成動態檔案名稱，附加時間戳
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f'/home/judy/one_stop/picture/{keyword}_{timestamp}.png' 
+    if filename is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f'/home/judy/one_stop/picture/{keyword}_{timestamp}.png'
     
     # 保存為圖片文件
     plt.figure(figsize=(10, 6))
@@ -94,17 +61,12 @@ def generate_wordcloud(top_words, keyword="有人"):
 
 # 主函數
 def main():
-    # 分別處理 PChome 和 momo 平台的資料
-    pchome_data = read_from_db("PChome")  # 讀取 PChome 平台的文章
-    momo_data = read_from_db("momo")  # 讀取 momo 平台的文章
-    
-    # 提取包含「有人」的上下文
-    pchome_contexts = extract_contexts(pchome_data)
-    momo_contexts = extract_contexts(momo_data)
-    
-    # 找出常見搭配詞
-    pchome_top_words = get_top_word_combinations(pchome_contexts)
-    momo_top_words = get_top_word_combinations(momo_contexts)
+    token_store = read_from_db()
+
+    # 分別處理 PChome 和 momo 平台的資料，找出和「有人」常見的搭配詞
+    pchome_top_words = get_top_word_combinations(token_store, "PChome")
+    momo_top_words = get_top_word_combinations(token_store, "momo")
+    token_store.close()
     
     # 生成並保存 PChome 的詞雲圖像
     pchome_image_path = generate_wordcloud(pchome_top_words, keyword="PChome")
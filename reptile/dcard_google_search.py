@@ -1,13 +1,25 @@
 import os
 import re
+import sys
 import logging
 import httpx
 import pandas as pd
 import mysql.connector
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from datetime import datetime, timedelta, date
 import calendar
 
+# 近似重複偵測（與 analyze/filtered_news.py 共用）
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analyze"))
+from near_duplicates import NearDuplicateDetector
+
+# 全文檢索索引（mapping/search_index.py，需 jieba）；寫入新文章後同步 dcard 來源
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mapping"))
+try:
+    import search_index
+except ImportError:
+    search_index = None
+
 # --------------------- Logging 設定 ---------------------
 log_dir = './log'  # 設定 log 存放目錄
 if not os.path.exists(log_dir):
@@ -405,6 +417,9 @@ class GoogleCustomSearch:
                 )
             """)
             
+            # 近似重複偵測的 cluster 表格
+            NearDuplicateDetector(conn).initialize_tables()
+
             # 創建搜尋進度追蹤表格
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS wilson_search_progress (
@@ -425,11 +440,19 @@ class GoogleCustomSearch:
         except Exception as e:
             logging.error(f"資料庫初始化錯誤: {e}")
 
-    def save_to_database(self, results: List[Dict]) -> None:
-        """將搜尋結果保存到 MySQL 資料庫。
+    def save_to_database(self, results: List[Dict], batch_size: int = 500) -> Tuple[int, int]:
+        """將搜尋結果以批次方式保存到 MySQL 資料庫。
+
+        使用 executemany 搭配 INSERT ... ON DUPLICATE KEY UPDATE id = id，重複的 article_url 由資料庫直接略過，
+        不再逐筆捕捉 1062 例外；其他錯誤（欄位過長、NOT NULL 等）仍會拋出，不會像 INSERT IGNORE 一樣被轉成警告。
+        每 batch_size 筆提交一次。
         
         Args:
             results (List[Dict]): 處理後的搜尋結果
+            batch_size (int): 每次 executemany 與 commit 的筆數
+            
+        Returns:
+            Tuple[int, int]: (新增筆數, 略過的重複筆數)
         """
         # 先過濾結果
         filtered_results = [
@@ -439,37 +462,65 @@ class GoogleCustomSearch:
         
         if not filtered_results:
             logging.info(f"沒有包含平台關鍵字的結果需要保存到資料庫")
-            return
+            return 0, 0
+
+        batch_size = max(1, batch_size)
+        inserted = 0
+        skipped = 0
+        conn = None
             
         try:
             conn = mysql.connector.connect(**self.db_config)
             cursor = conn.cursor()
             
-            for result in filtered_results:
-                try:
-                    cursor.execute("""
-                        INSERT INTO wilson_search_results 
-                        (platform, title, article_url, content, publish_date)
-                        VALUES (%s, %s, %s, %s, %s)
-                    """, (
-                        result['platform'],
-                        result['title'],
-                        result['article_url'],
-                        result['content'],
-                        result['publish_date']
-                    ))
-                except mysql.connector.IntegrityError as e:
-                    if e.errno == 1062:  # 重複條目錯誤
-                        continue  # 跳過此記錄
-                    raise
-            
-            conn.commit()
+            for i in range(0, len(filtered_results), batch_size):
+                batch = filtered_results[i:i + batch_size]
+                cursor.executemany("""
+                    INSERT INTO wilson_search_results 
+                    (platform, title, article_url, content, publish_date)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE id = id
+                """, [(
+                    result['platform'],
+                    result['title'],
+                    result['article_url'],
+                    result['content'],
+                    result['publish_date']
+                ) for result in batch])
+                conn.commit()
+
+                # 重複的資料只執行 id = id，值未改變，不計入 affected rows
+                affected = max(cursor.rowcount, 0)
+                inserted += affected
+                skipped += len(batch) - affected
+
             cursor.close()
-            conn.close()
-            logging.info(f"數據成功保存到資料庫。總記錄數: {len(filtered_results)}")
-            
+            logging.info(f"數據成功保存到資料庫。總記錄數: {len(filtered_results)}，"
+                         f"新增: {inserted}，重複略過: {skipped}")
         except Exception as e:
             logging.error(f"保存到資料庫時發生錯誤: {e}")
+            if conn is not None:
+                conn.close()
+                conn = None
+
+        # 同一篇 Dcard 文章可能以不同網址被寫入，替新文章指派近似重複的 cluster；
+        # 文章已提交，指派失敗只記錄，下次執行 assign_new_rows 會補上
+        if conn is not None:
+            try:
+                duplicates = NearDuplicateDetector(conn).assign_new_rows("wilson_search_results")
+                logging.info(f"近似重複: {duplicates}")
+            except Exception as e:
+                logging.error(f"指派近似重複 cluster 時發生錯誤: {e}")
+            finally:
+                conn.close()
+
+        if inserted and search_index is not None:
+            try:
+                logging.info(f"全文檢索索引同步: {search_index.sync_sources(self.db_config, ['dcard'])}")
+            except Exception as e:
+                logging.error(f"全文檢索索引同步失敗: {e}")
+
+        return inserted, skipped
         
     def save_to_csv(self, results: List[Dict], platform: str) -> None:
         """將搜尋結果保存到 CSV 文件。